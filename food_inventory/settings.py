@@ -81,6 +81,8 @@ else:
     }
 
 MIDDLEWARE = [
+    # First, so its timings include every other middleware
+    'inventory.latency.LatencyHistogramMiddleware',
     'corsheaders.middleware.CorsMiddleware', 
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -127,6 +129,53 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Caches
+# The 'inventory' alias backs the read-through DynamoDB cache. By default it is
+# a per-process LocMemCache, which evicts least-recently-used entries
+# (CULL_FREQUENCY=10 drops the oldest 10%) once MAX_ENTRIES is reached.
+# Invalidation on write only reaches the writing process: with several
+# workers, the others keep serving the pre-write batch for up to
+# INVENTORY_CACHE_BATCH_TTL seconds and listings for up to
+# INVENTORY_CACHE_LIST_TTL. Multi-worker deployments that need
+# read-your-writes across workers set INVENTORY_CACHE_URL to a shared Redis
+# (redis://...) or Memcached (host:port) server, which every worker
+# invalidates together; that needs the redis or pymemcache package installed.
+INVENTORY_CACHE_URL = os.getenv('INVENTORY_CACHE_URL', '')
+if INVENTORY_CACHE_URL.startswith(('redis://', 'rediss://')):
+    INVENTORY_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': INVENTORY_CACHE_URL,
+        'KEY_PREFIX': 'inventory',
+    }
+elif INVENTORY_CACHE_URL:
+    INVENTORY_CACHE = {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': INVENTORY_CACHE_URL,
+        'KEY_PREFIX': 'inventory',
+    }
+else:
+    INVENTORY_CACHE = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'inventory',
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('INVENTORY_CACHE_MAX_ENTRIES', '5000')),
+            'CULL_FREQUENCY': 10,
+        },
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'inventory': INVENTORY_CACHE,
+}
+
+# Per-kind TTLs (seconds) for the inventory cache
+INVENTORY_CACHE_TIMEOUTS = {
+    'batch': int(os.getenv('INVENTORY_CACHE_BATCH_TTL', '60')),
+    'list': int(os.getenv('INVENTORY_CACHE_LIST_TTL', '15')),
+}
+
 # Internationalization
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -168,3 +217,101 @@ else:
 
 # AWS SQS Configuration
 SQS_QUEUE_URL = os.getenv('SQS_QUEUE_URL')
+# Start the in-process SQS consumer on a web process's first request; turn off
+# when process_sqs_messages runs as its own service
+SQS_PROCESSOR_AUTOSTART = os.getenv('SQS_PROCESSOR_AUTOSTART', 'True') == 'True'
+
+# Pre-signed image URLs: lifetime, and a bounded LRU that reuses each URL until
+# PRESIGNED_URL_CACHE_MARGIN seconds before it expires
+PRESIGNED_URL_EXPIRES_IN = int(os.getenv('PRESIGNED_URL_EXPIRES_IN', '3600'))
+PRESIGNED_URL_CACHE_MARGIN = int(os.getenv('PRESIGNED_URL_CACHE_MARGIN', '300'))
+PRESIGNED_URL_CACHE_MAX_ENTRIES = int(os.getenv('PRESIGNED_URL_CACHE_MAX_ENTRIES', '10000'))
+
+# Product image derivatives (inventory/image_derivatives.py): longest-edge sizes in
+# pixels and the formats each size is encoded in, next to the original upload
+PRODUCT_IMAGE_SIZES = [int(size) for size in os.getenv('PRODUCT_IMAGE_SIZES', '64,256,1024').split(',')]
+PRODUCT_IMAGE_FORMATS = os.getenv('PRODUCT_IMAGE_FORMATS', 'webp,jpeg').split(',')
+PRODUCT_IMAGE_QUALITY = int(os.getenv('PRODUCT_IMAGE_QUALITY', '80'))
+# Product image uploads (inventory/direct_uploads.py): largest accepted image, for
+# both presigned browser uploads and files posted with the batch form, and how
+# long a presigned POST policy stays usable
+PRODUCT_IMAGE_MAX_BYTES = int(os.getenv('PRODUCT_IMAGE_MAX_BYTES', str(10 * 1024 * 1024)))
+PRODUCT_IMAGE_UPLOAD_EXPIRES_IN = int(os.getenv('PRODUCT_IMAGE_UPLOAD_EXPIRES_IN', '600'))
+# Background image jobs (inventory/media_jobs.py): threads for S3 I/O, processes for
+# thumbnail rendering (0 renders on the I/O threads), queue bound and retries per job.
+# Jobs only hold S3 keys; run `manage.py requeue_pending_images` periodically to
+# pick up images whose job was lost with its process
+MEDIA_IO_WORKERS = int(os.getenv('MEDIA_IO_WORKERS', '4'))
+MEDIA_CPU_WORKERS = int(os.getenv('MEDIA_CPU_WORKERS', '2'))
+MEDIA_MAX_PENDING_JOBS = int(os.getenv('MEDIA_MAX_PENDING_JOBS', '100'))
+MEDIA_JOB_RETRIES = int(os.getenv('MEDIA_JOB_RETRIES', '3'))
+
+# CloudWatch Logs events are queued and shipped in batches by a background thread
+# (inventory/log_shipper.py). CLOUDWATCH_LOG_OVERFLOW picks what happens when the
+# queue is full: 'drop_newest', 'drop_oldest' or 'block' (up to a second)
+CLOUDWATCH_LOG_FLUSH_INTERVAL = float(os.getenv('CLOUDWATCH_LOG_FLUSH_INTERVAL', '5'))
+CLOUDWATCH_LOG_MAX_QUEUE = int(os.getenv('CLOUDWATCH_LOG_MAX_QUEUE', '10000'))
+CLOUDWATCH_LOG_OVERFLOW = os.getenv('CLOUDWATCH_LOG_OVERFLOW', 'drop_newest')
+
+# Metric points are aggregated per series and minute and published in batches
+# (inventory/metrics_buffer.py) every CLOUDWATCH_METRICS_FLUSH_INTERVAL seconds
+CLOUDWATCH_METRICS_FLUSH_INTERVAL = float(os.getenv('CLOUDWATCH_METRICS_FLUSH_INTERVAL', '60'))
+CLOUDWATCH_METRICS_MAX_SERIES = int(os.getenv('CLOUDWATCH_METRICS_MAX_SERIES', '10000'))
+# Where custom metrics go (inventory/metric_sinks.py): 'api' (PutMetricData via the
+# buffer above), 'emf' (Embedded Metric Format lines on stdout, or appended to
+# CLOUDWATCH_EMF_PATH for the CloudWatch agent to ship) or 'none'
+CLOUDWATCH_METRICS_SINK = os.getenv('CLOUDWATCH_METRICS_SINK', 'api')
+CLOUDWATCH_EMF_PATH = os.getenv('CLOUDWATCH_EMF_PATH', '')
+
+# The CloudWatch dashboard's GetMetricData results are reused for DASHBOARD_METRICS_TTL
+# seconds, then served stale (while one background refresh runs) up to the stale TTL
+DASHBOARD_METRICS_TTL = int(os.getenv('DASHBOARD_METRICS_TTL', '60'))
+DASHBOARD_METRICS_STALE_TTL = int(os.getenv('DASHBOARD_METRICS_STALE_TTL', '600'))
+
+# Per-view request latency histograms (inventory/latency.py) are published as a
+# RequestLatency distribution this often; 0 keeps them local (/api/metrics/latency/ only)
+LATENCY_PUBLISH_INTERVAL = float(os.getenv('LATENCY_PUBLISH_INTERVAL', '60'))
+
+# botocore tuning for the shared AWS clients (inventory/aws_clients.py); 'default'
+# applies to every service and the per-service entries override it
+AWS_CLIENT_CONFIG = {
+    'default': {
+        'max_pool_connections': int(os.getenv('AWS_MAX_POOL_CONNECTIONS', '10')),
+        'connect_timeout': float(os.getenv('AWS_CONNECT_TIMEOUT', '5')),
+        'read_timeout': float(os.getenv('AWS_READ_TIMEOUT', '30')),
+        'tcp_keepalive': os.getenv('AWS_TCP_KEEPALIVE', 'True') == 'True',
+        'retries': {'max_attempts': int(os.getenv('AWS_MAX_ATTEMPTS', '5')), 'mode': 'standard'},
+    },
+    # Parallel scans and batch reads/writes each hold a connection per worker
+    'dynamodb': {
+        'max_pool_connections': int(os.getenv('DYNAMODB_MAX_POOL_CONNECTIONS', '50')),
+        'read_timeout': float(os.getenv('DYNAMODB_READ_TIMEOUT', '10')),
+    },
+    's3': {
+        # SigV4 query auth for pre-signed URLs (S3BatchPresigner produces the same URLs)
+        'signature_version': 's3v4',
+        'max_pool_connections': int(os.getenv('S3_MAX_POOL_CONNECTIONS', '25')),
+        'read_timeout': float(os.getenv('S3_READ_TIMEOUT', '60')),
+    },
+    # Long polling waits up to 20 seconds, so reads must outlast it
+    'sqs': {
+        'read_timeout': float(os.getenv('SQS_READ_TIMEOUT', '30')),
+    },
+}
+
+# Inventory storage: 'dynamodb' (default), or 'memory' / 'sqlite' to run offline without AWS
+INVENTORY_STORAGE_BACKEND = os.getenv('INVENTORY_STORAGE_BACKEND', 'dynamodb')
+INVENTORY_SQLITE_PATH = os.getenv('INVENTORY_SQLITE_PATH', str(BASE_DIR / 'inventory_local.sqlite3'))
+DYNAMODB_TABLE_NAME = os.getenv('DYNAMODB_TABLE_NAME', 'InventoryBatches')
+# Single-item table of batch counters maintained on write (see inventory/aggregates.py)
+DYNAMODB_AGGREGATES_TABLE_NAME = os.getenv('DYNAMODB_AGGREGATES_TABLE_NAME', 'InventoryAggregates')
+
+# Point at DynamoDB Local (e.g. http://localhost:8000) for offline development
+DYNAMODB_ENDPOINT_URL = os.getenv('DYNAMODB_ENDPOINT_URL') or None
+
+# DynamoDB full-table scans are split into this many parallel segments
+DYNAMODB_SCAN_SEGMENTS = int(os.getenv('DYNAMODB_SCAN_SEGMENTS', '4'))
+DYNAMODB_SCAN_WORKERS = int(os.getenv('DYNAMODB_SCAN_WORKERS', '4'))
+# Long-lived threads shared by scans and batch reads/writes; each keeps its own
+# boto3 resource, so the pool bounds how many the process ever builds
+DYNAMODB_POOL_THREADS = int(os.getenv('DYNAMODB_POOL_THREADS', '16'))
@@ -0,0 +1,98 @@
+from collections import Counter
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+
+# Batch statuses that get their own counter
+STATUSES = ('Safe', 'Expiring Soon', 'Expired')
+
+# The aggregates table holds a single item with every counter on it
+AGGREGATE_ID = 'inventory'
+
+
+def _status_attribute(status):
+    return f'status_count:{status}'
+
+
+def item_delta(old=None, new=None):
+    """Counter changes for replacing batch item `old` with `new` (None means absent)"""
+    delta = Counter()
+    for item, sign in ((old, -1), (new, 1)):
+        if not item:
+            continue
+        delta['total_batches'] += sign
+        delta['total_quantity'] += sign * int(item.get('quantity') or 0)
+        if item.get('status') in STATUSES:
+            delta[_status_attribute(item['status'])] += sign
+    return delta
+
+
+def summary_from_item(item):
+    """Turn the stored aggregate item into the summarize_batches() shape"""
+    return {
+        'total_batches': int(item.get('total_batches', 0)),
+        'total_quantity': int(item.get('total_quantity', 0)),
+        'status_counts': {status: int(item.get(_status_attribute(status), 0)) for status in STATUSES},
+    }
+
+
+class InventoryAggregates:
+    """Materialized batch counters kept next to the inventory table.
+
+    Writers apply deltas with UpdateItem ADD, which is atomic per item, so
+    readers get the totals with one GetItem instead of a table scan. Counters
+    can drift if a process dies between the batch write and the ADD; the
+    reconcile_aggregates command rebuilds them from a scan.
+
+    Only replace() (i.e. reconcile_aggregates) creates the counter item.
+    Deltas applied before that are dropped: starting from nothing they would
+    count just the writes since, and readers would trust the partial totals.
+    """
+
+    def __init__(self, table):
+        self.table = table
+
+    def apply(self, delta):
+        """ADD every non-zero counter in delta to the aggregate item, if the counters have been built"""
+        changes = [(attribute, value) for attribute, value in delta.items() if value]
+        if not changes:
+            return
+
+        expr_names, expr_values, clauses = {}, {}, []
+        for index, (attribute, value) in enumerate(changes):
+            clauses.append(f"#a{index} :v{index}")
+            expr_names[f"#a{index}"] = attribute
+            expr_values[f":v{index}"] = value
+
+        try:
+            self.table.update_item(
+                Key={'aggregate_id': AGGREGATE_ID},
+                UpdateExpression="ADD " + ", ".join(clauses),
+                ConditionExpression=Attr('aggregate_id').exists(),
+                ExpressionAttributeNames=expr_names,
+                ExpressionAttributeValues=expr_values
+            )
+        except ClientError as e:
+            # No counters (or no aggregates table) yet: the next reconcile scan counts this write
+            if e.response['Error']['Code'] not in ('ConditionalCheckFailedException', 'ResourceNotFoundException'):
+                raise
+
+    def read(self):
+        """Return the current summary, or None if the counters (or their table) were never built"""
+        try:
+            item = self.table.get_item(Key={'aggregate_id': AGGREGATE_ID}, ConsistentRead=True).get('Item')
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ResourceNotFoundException':
+                raise
+            return None
+        return summary_from_item(item) if item else None
+
+    def replace(self, summary):
+        """Overwrite the counters with a freshly computed summary"""
+        item = {
+            'aggregate_id': AGGREGATE_ID,
+            'total_batches': summary['total_batches'],
+            'total_quantity': summary['total_quantity'],
+        }
+        for status in STATUSES:
+            item[_status_attribute(status)] = summary['status_counts'].get(status, 0)
+        self.table.put_item(Item=item)
@@ -2,32 +2,92 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 import json
-from .dynamodb_models import DynamoDBInventory
+from .dynamodb_models import (
+    MAX_PAGE_SIZE, UPDATABLE_BATCH_FIELDS, BatchNotFound, RetriesExhausted, VersionConflict, batch_from_record,
+    clamp_page_size, parse_fields
+)
+from .image_derivatives import variant_paths
+from .inventory_cache import CachedDynamoDBInventory
+from .latency import latency_recorder
+from .log_shipper import log_shipper
+from .metric_sinks import get_metric_sink
+from .media_jobs import queue_delete
+from .presigned_urls import presigned_url_cache
 from datetime import datetime
-import boto3
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
 import uuid
 
-# Initialize DynamoDB
-db = DynamoDBInventory()
+# Built on first use so importing the URLconf has no side effects
+db = SimpleLazyObject(CachedDynamoDBInventory)
 
-def get_s3_client():
-    return boto3.client('s3',
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-        aws_session_token=settings.AWS_SESSION_TOKEN,
-        region_name=settings.AWS_S3_REGION_NAME
-    )
+def wants_presigned_urls(fields):
+    """Whether a response with these ?fields= includes presigned_url (all fields do)"""
+    return not fields or 'presigned_url' in fields
+
+def throttled_response(error):
+    """503 for batch reads DynamoDB kept throttling; the client should retry later"""
+    response = JsonResponse({
+        'status': 'error',
+        'message': str(error)
+    }, status=503)
+    response['Retry-After'] = '1'
+    return response
 
 @csrf_exempt
 @require_http_methods(["GET"])
 def api_batch_list(request):
-    """API endpoint to list all batches"""
+    """API endpoint to list batches one page at a time (?cursor=&limit=&status=) or fetch several by ?ids=a,b,c
+
+    ?fields=a,b limits each returned batch to those attributes.
+    """
     try:
-        batches = db.list_batches()
+        try:
+            fields = parse_fields(request.GET.get('fields'))
+        except ValueError as e:
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e)
+            }, status=400)
+
+        if 'ids' in request.GET:
+            batch_ids = [batch_id.strip() for batch_id in request.GET['ids'].split(',') if batch_id.strip()]
+            if not batch_ids or len(batch_ids) > MAX_PAGE_SIZE:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': f'ids must list between 1 and {MAX_PAGE_SIZE} batch IDs'
+                }, status=400)
+            try:
+                found = db.get_batches(batch_ids, fields=fields)
+            except RetriesExhausted as e:
+                return throttled_response(e)
+            if wants_presigned_urls(fields):
+                db.sign_image_urls(list(found.values()))
+            return JsonResponse({
+                'status': 'success',
+                'data': [batch.to_dict() for batch in found.values()],
+                'missing': [batch_id for batch_id in batch_ids if batch_id not in found]
+            })
+
+        try:
+            limit = clamp_page_size(request.GET.get('limit'))
+            batches, next_cursor = db.list_batches_page(
+                limit=limit,
+                cursor=request.GET.get('cursor') or None,
+                status=request.GET.get('status') or None,
+                fields=fields
+            )
+        except ValueError as e:
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e)
+            }, status=400)
+        if wants_presigned_urls(fields):
+            db.sign_image_urls(batches)
         return JsonResponse({
             'status': 'success',
-            'data': batches
+            'data': [batch.to_dict() for batch in batches],
+            'next_cursor': next_cursor
         })
     except Exception as e:
         return JsonResponse({
@@ -38,13 +98,22 @@ def api_batch_list(request):
 @csrf_exempt
 @require_http_methods(["GET"])
 def api_batch_detail(request, batch_id):
-    """API endpoint to get a single batch"""
+    """API endpoint to get a single batch (?fields=a,b limits the attributes returned)"""
     try:
-        batch = db.get_batch(batch_id)
+        try:
+            fields = parse_fields(request.GET.get('fields'))
+        except ValueError as e:
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e)
+            }, status=400)
+        batch = db.get_batch(batch_id, fields=fields)
         if batch:
+            if wants_presigned_urls(fields):
+                db.sign_image_urls([batch])
             return JsonResponse({
                 'status': 'success',
-                'data': batch
+                'data': batch.to_dict()
             })
         return JsonResponse({
             'status': 'error',
@@ -113,43 +182,114 @@ def api_batch_create(request):
             'message': str(e)
         }, status=500)
 
+MAX_BULK_BATCHES = 5000
+
 @csrf_exempt
-@require_http_methods(["PUT", "PATCH"])
-def api_batch_update(request, batch_id):
-    """API endpoint to update a batch"""
+@require_http_methods(["POST"])
+def api_batch_bulk_create(request):
+    """API endpoint to create many batches at once (JSON list or {"batches": [...]})"""
     try:
-        # Check if batch exists
-        existing_batch = db.get_batch(batch_id)
-        if not existing_batch:
+        data = json.loads(request.body)
+        records = data.get('batches') if isinstance(data, dict) else data
+        if not isinstance(records, list) or not records:
             return JsonResponse({
                 'status': 'error',
-                'message': 'Batch not found'
-            }, status=404)
+                'message': 'Expected a non-empty list of batches'
+            }, status=400)
+        if len(records) > MAX_BULK_BATCHES:
+            return JsonResponse({
+                'status': 'error',
+                'message': f'At most {MAX_BULK_BATCHES} batches per request'
+            }, status=400)
         
-        # Get update data
-        data = json.loads(request.body)
+        # Validate every record before writing anything
+        batches = []
+        for index, record in enumerate(records):
+            try:
+                if not isinstance(record, dict):
+                    raise ValueError('Each batch must be a JSON object')
+                batches.append(batch_from_record(record))
+            except ValueError as e:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': f'Batch {index}: {str(e)}'
+                }, status=400)
         
-        # Update only provided fields
-        update_data = existing_batch.copy()
-        update_data.update(data)
+        try:
+            result = db.bulk_create_batches(batches)
+        except RetriesExhausted as e:
+            # Reading the batches being replaced failed, so nothing was written
+            return throttled_response(e)
         
-        # Recalculate status if expiry_date is updated
-        if 'expiry_date' in data:
-            expiry_date = datetime.strptime(data['expiry_date'], '%Y-%m-%d').date()
-            days_to_expiry = (expiry_date - datetime.now().date()).days
-            if days_to_expiry < 0:
-                update_data['status'] = 'Expired'
-            elif days_to_expiry <= 7:
-                update_data['status'] = 'Expiring Soon'
-            else:
-                update_data['status'] = 'Safe'
+        return JsonResponse({
+            'status': 'success' if not result['failed'] else 'partial',
+            'data': result
+        }, status=201 if not result['failed'] else 207)
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Invalid JSON data'
+        }, status=400)
+    except Exception as e:
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status=500)
+
+@csrf_exempt
+@require_http_methods(["PUT", "PATCH"])
+def api_batch_update(request, batch_id):
+    """API endpoint to update the provided fields of a batch in one conditional write"""
+    try:
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Expected a JSON object'
+            }, status=400)
         
-        # Update batch
-        db.update_batch(batch_id, update_data)
+        # Validate the fields that will be written
+        fields = {key: value for key, value in data.items() if key in UPDATABLE_BATCH_FIELDS}
+        try:
+            for key in ('production_date', 'expiry_date'):
+                if key in fields:
+                    fields[key] = datetime.strptime(fields[key], '%Y-%m-%d').date()
+            if 'quantity' in fields:
+                fields['quantity'] = int(fields['quantity'])
+        except (TypeError, ValueError):
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Dates must use YYYY-MM-DD and quantity must be an integer'
+            }, status=400)
+        
+        # A "version" in the body makes the update conditional on it (optimistic concurrency)
+        expected_version = data.get('version')
+        if expected_version is not None:
+            try:
+                if isinstance(expected_version, (bool, float)):
+                    raise ValueError(expected_version)
+                expected_version = int(expected_version)
+            except (TypeError, ValueError):
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'version must be an integer'
+                }, status=400)
+        try:
+            batch = db.patch_batch(batch_id, fields, expected_version=expected_version)
+        except BatchNotFound:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Batch not found'
+            }, status=404)
+        except VersionConflict as e:
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e)
+            }, status=409)
         
         return JsonResponse({
             'status': 'success',
-            'data': update_data
+            'data': batch.to_dict()
         })
     except json.JSONDecodeError:
         return JsonResponse({
@@ -168,27 +308,23 @@ def api_batch_delete(request, batch_id):
     """API endpoint to delete a batch"""
     try:
         # Check if batch exists
-        batch = db.get_batch(batch_id)
+        batch = db.get_batch(batch_id, fields=['image_url', 'image_variants'])
         if not batch:
             return JsonResponse({
                 'status': 'error',
                 'message': 'Batch not found'
             }, status=404)
         
-        # Delete associated image if exists
-        if 'image_url' in batch:
+        # Delete batch
+        db.delete_batch(batch_id)
+
+        # Delete associated image and its thumbnails in the background
+        if batch.image_url:
             try:
-                s3_client = get_s3_client()
-                s3_client.delete_object(
-                    Bucket=settings.AWS_STORAGE_BUCKET_NAME,
-                    Key=f"media/{batch['image_url']}"
-                )
+                queue_delete(batch.image_url, *variant_paths(batch.image_variants))
             except Exception as e:
                 print(f"Error deleting S3 image: {str(e)}")
         
-        # Delete batch
-        db.delete_batch(batch_id)
-        
         return JsonResponse({
             'status': 'success',
             'message': 'Batch deleted successfully'
@@ -204,23 +340,17 @@ def api_batch_delete(request, batch_id):
 def api_metrics(request):
     """API endpoint to get batch metrics"""
     try:
-        batches = db.list_batches()
-        
-        # Calculate metrics
-        total_batches = len(batches)
-        status_counts = {'Safe': 0, 'Expiring Soon': 0, 'Expired': 0}
-        total_quantity = 0
-        
-        for batch in batches:
-            status = batch.get('status', 'Unknown')
-            if status in status_counts:
-                status_counts[status] += 1
-            total_quantity += int(batch.get('quantity', 0))
+        # Read the materialized counters; summarize_batches falls back to a parallel scan without them
+        summary = db.summarize_batches()
         
         metrics = {
-            'total_batches': total_batches,
-            'status_distribution': status_counts,
-            'total_quantity': total_quantity,
+            'total_batches': summary['total_batches'],
+            'status_distribution': summary['status_counts'],
+            'total_quantity': summary['total_quantity'],
+            'cache': db.cache_stats(),
+            'presigned_urls': presigned_url_cache.stats(),
+            'cloudwatch_logs': log_shipper.stats(),
+            'cloudwatch_metrics': get_metric_sink().stats(),
             'timestamp': datetime.now().isoformat()
         }
         
@@ -232,4 +362,13 @@ def api_metrics(request):
         return JsonResponse({
             'status': 'error',
             'message': str(e)
-        }, status=500) 
\ No newline at end of file
+        }, status=500) 
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def api_latency(request):
+    """API endpoint with per-view request latency percentiles recorded by this process"""
+    return JsonResponse({
+        'status': 'success',
+        'data': latency_recorder.summary()
+    })
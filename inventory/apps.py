@@ -1,4 +1,13 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
+
+
+def start_sqs_processor(**kwargs):
+    """Start the SQS processor once this process serves its first request"""
+    request_started.disconnect(dispatch_uid='inventory.start_sqs_processor')
+    from .sqs_processor import start_processor
+    start_processor()
 
 
 class InventoryConfig(AppConfig):
@@ -6,7 +15,10 @@ class InventoryConfig(AppConfig):
     name = 'inventory'
     
     def ready(self):
-        """Start background tasks when Django starts"""
-        # Import and start SQS processor
-        from .sqs_processor import start_processor
-        start_processor()
+        """Arrange background tasks without starting them.
+
+        migrate, shell and other management commands never serve a request, so
+        they no longer spawn the SQS thread; web workers start it lazily.
+        """
+        if settings.SQS_PROCESSOR_AUTOSTART and settings.SQS_QUEUE_URL:
+            request_started.connect(start_sqs_processor, dispatch_uid='inventory.start_sqs_processor')
@@ -0,0 +1,95 @@
+import threading
+from django.conf import settings
+
+# Creating a client costs tens of milliseconds and its first request a TLS
+# handshake, so every module shares these instead of building its own.
+_clients = {}
+_lock = threading.Lock()
+# Resources are not thread-safe, so each thread gets its own (see get_thread_resource)
+_thread_resources = threading.local()
+_session = None
+
+
+def client_config(service):
+    """botocore Config for `service`: AWS_CLIENT_CONFIG['default'] overlaid with the service's own entry"""
+    options = dict(settings.AWS_CLIENT_CONFIG.get('default', {}))
+    options.update(settings.AWS_CLIENT_CONFIG.get(service, {}))
+    from botocore.config import Config
+    return Config(**options)
+
+
+def _get_session():
+    """The process-wide boto3 Session; credentials are resolved once and shared by every client.
+
+    Sessions are not safe to create clients from concurrently, so callers hold _lock.
+    """
+    global _session
+    if _session is None:
+        # boto3 takes ~100 ms to import; processes that never call AWS skip it
+        import boto3
+        # Credentials are only configured outside DEBUG; None falls back to boto3's default chain
+        _session = boto3.Session(
+            aws_access_key_id=getattr(settings, 'AWS_ACCESS_KEY_ID', None),
+            aws_secret_access_key=getattr(settings, 'AWS_SECRET_ACCESS_KEY', None),
+            aws_session_token=getattr(settings, 'AWS_SESSION_TOKEN', None),
+            region_name=getattr(settings, 'AWS_S3_REGION_NAME', None)
+        )
+    return _session
+
+
+def _get_or_create(key, factory):
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = factory()
+    return client
+
+
+def get_client(service, endpoint_url=None):
+    """Return the shared, lazily created boto3 client for `service` (clients are thread-safe)"""
+    return _get_or_create(('client', service, endpoint_url), lambda: _get_session().client(
+        service, endpoint_url=endpoint_url, config=client_config(service)
+    ))
+
+
+def get_resource(service, endpoint_url=None):
+    """Return the shared, lazily created boto3 resource for `service`.
+
+    Resources must not be used from several threads at once; code that runs
+    on request or worker threads should use get_thread_resource instead.
+    """
+    return _get_or_create(('resource', service, endpoint_url), lambda: _get_session().resource(
+        service, endpoint_url=endpoint_url, config=client_config(service)
+    ))
+
+
+def get_thread_resource(service, endpoint_url=None):
+    """Return the calling thread's own boto3 resource for `service`, created on first use"""
+    resources = getattr(_thread_resources, 'resources', None)
+    if resources is None or getattr(_thread_resources, 'session', None) is not _session:
+        # First use on this thread, or reset_clients() replaced the session since
+        resources = _thread_resources.resources = {}
+    key = (service, endpoint_url)
+    resource = resources.get(key)
+    if resource is None:
+        with _lock:
+            resource = _get_session().resource(service, endpoint_url=endpoint_url, config=client_config(service))
+            _thread_resources.session = _session
+        resources[key] = resource
+    return resource
+
+
+def get_credentials():
+    """The shared session's credentials (refreshable ones renew themselves on use)"""
+    with _lock:
+        return _get_session().get_credentials()
+
+
+def reset_clients():
+    """Drop every cached client and the shared session, e.g. after credentials or AWS_CLIENT_CONFIG change"""
+    global _session
+    with _lock:
+        _clients.clear()
+        _session = None
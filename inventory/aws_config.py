@@ -1,28 +1,16 @@
-import boto3
 import os
 from django.conf import settings
+from .aws_clients import get_client, get_resource
 
-# Initialize AWS services
+# AWS services (shared process-wide, see aws_clients)
 def get_s3_client():
-    return boto3.client('s3',
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-        region_name=settings.AWS_S3_REGION_NAME
-    )
+    return get_client('s3')
 
 def get_dynamodb_resource():
-    return boto3.resource('dynamodb',
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-        region_name=settings.AWS_S3_REGION_NAME
-    )
+    return get_resource('dynamodb')
 
 def get_cloudwatch_client():
-    return boto3.client('cloudwatch',
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-        region_name=settings.AWS_S3_REGION_NAME
-    )
+    return get_client('cloudwatch')
 
 # S3 functions
 def upload_file_to_s3(file, filename):
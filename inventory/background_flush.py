@@ -0,0 +1,58 @@
+import atexit
+import threading
+
+
+class BackgroundFlusher:
+    """Base for in-memory buffers that a daemon thread flushes to AWS.
+
+    Subclasses guard their buffer with self._cond, call self._started() after
+    adding to it, and implement flush(). The thread starts with the first
+    addition, flushes every `flush_interval` seconds or as soon as
+    _flush_due() is true, and shutdown() (also run at exit) flushes what is
+    left.
+    """
+
+    thread_name = 'background-flush'
+
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def _flush_due(self):
+        """Called with _cond held; True wakes the thread before the interval is up"""
+        return False
+
+    def _started(self):
+        """Called with _cond held after adding to the buffer"""
+        if self._flush_due():
+            self._cond.notify_all()
+        if self._thread is None and not self._closed:
+            self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._flush_due() or self._closed, timeout=self.flush_interval)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error in {self.thread_name} flush: {str(e)}")
+
+    def flush(self):
+        raise NotImplementedError
+
+    def shutdown(self, timeout=5.0):
+        """Stop the background thread and flush whatever is still buffered"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        self.flush()
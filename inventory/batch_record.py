@@ -0,0 +1,131 @@
+from datetime import date
+from decimal import Decimal
+
+# ISO date string -> ordinal. Batches share a small set of dates, so this stays tiny;
+# it is cleared if it ever grows past the cap.
+_DATE_ORDINALS = {}
+_DATE_ORDINALS_CAP = 8192
+
+
+def date_ordinal(value):
+    """Decode a 'YYYY-MM-DD' string (or date) into a proleptic ordinal, memoized per date"""
+    if value is None:
+        return None
+    if isinstance(value, date):
+        return value.toordinal()
+    ordinal = _DATE_ORDINALS.get(value)
+    if ordinal is None:
+        ordinal = date.fromisoformat(value).toordinal()
+        if len(_DATE_ORDINALS) >= _DATE_ORDINALS_CAP:
+            _DATE_ORDINALS.clear()
+        _DATE_ORDINALS[value] = ordinal
+    return ordinal
+
+
+def _int(value):
+    return int(value) if isinstance(value, Decimal) else value
+
+
+class BatchRecord:
+    """Compact, read-only view of an InventoryBatches item.
+
+    Dates are kept as ordinals and numbers as ints; attributes that were not
+    read (projections) or not stored are None.
+    """
+
+    __slots__ = (
+        'batch_id', 'product_name', 'production_ordinal', 'expiry_ordinal', 'quantity', 'status',
+        'image_url', 'image_variants', 'image_state', 'presigned_url', 'created_at', 'updated_at', 'version',
+    )
+
+    # Order used when serializing, matching the stored attribute names
+    FIELDS = (
+        'batch_id', 'product_name', 'production_date', 'expiry_date', 'quantity', 'status',
+        'image_url', 'image_variants', 'image_state', 'presigned_url', 'created_at', 'updated_at', 'version',
+    )
+
+    def __init__(self, batch_id, product_name=None, production_ordinal=None, expiry_ordinal=None,
+                 quantity=None, status=None, image_url=None, image_variants=None, image_state=None,
+                 presigned_url=None, created_at=None, updated_at=None, version=None):
+        self.batch_id = batch_id
+        self.product_name = product_name
+        self.production_ordinal = production_ordinal
+        self.expiry_ordinal = expiry_ordinal
+        self.quantity = quantity
+        self.status = status
+        self.image_url = image_url
+        self.image_variants = image_variants
+        self.image_state = image_state
+        self.presigned_url = presigned_url
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.version = version
+
+    @classmethod
+    def from_item(cls, item):
+        """Build a record from a boto3 item dict"""
+        return cls(
+            item['batch_id'],
+            item.get('product_name'),
+            date_ordinal(item.get('production_date')),
+            date_ordinal(item.get('expiry_date')),
+            _int(item.get('quantity')),
+            item.get('status'),
+            # Older batch_update writes stored the key under 'image'
+            item.get('image_url') or item.get('image'),
+            item.get('image_variants'),
+            item.get('image_state'),
+            item.get('presigned_url'),
+            item.get('created_at'),
+            item.get('updated_at'),
+            _int(item.get('version')),
+        )
+
+    @property
+    def production_date(self):
+        return date.fromordinal(self.production_ordinal) if self.production_ordinal is not None else None
+
+    @property
+    def expiry_date(self):
+        return date.fromordinal(self.expiry_ordinal) if self.expiry_ordinal is not None else None
+
+    def days_to_expiry(self, today=None):
+        if self.expiry_ordinal is None:
+            return None
+        return self.expiry_ordinal - (today or date.today()).toordinal()
+
+    def only(self, fields):
+        """Copy keeping batch_id and `fields`; everything else becomes None"""
+        if not fields:
+            return self
+        record = BatchRecord(self.batch_id)
+        for field in fields:
+            slot = {'production_date': 'production_ordinal', 'expiry_date': 'expiry_ordinal'}.get(field, field)
+            setattr(record, slot, getattr(self, slot))
+        if 'presigned_url' in fields:
+            # The URL is signed from image_url, which projections read in its place
+            record.image_url = self.image_url
+        return record
+
+    def to_dict(self):
+        """JSON-ready dict with ISO dates, omitting attributes that are None"""
+        data = {}
+        for field in self.FIELDS:
+            value = getattr(self, field)
+            if value is None:
+                continue
+            data[field] = value.isoformat() if isinstance(value, date) else value
+        return data
+
+    def __getstate__(self):
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __setstate__(self, state):
+        for slot, value in zip(self.__slots__, state):
+            setattr(self, slot, value)
+
+    def __eq__(self, other):
+        return isinstance(other, BatchRecord) and self.__getstate__() == other.__getstate__()
+
+    def __repr__(self):
+        return f"BatchRecord({self.batch_id!r}, {self.product_name!r}, status={self.status!r})"
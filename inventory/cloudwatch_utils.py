@@ -1,45 +1,22 @@
-import boto3
 import json
 from datetime import datetime, timedelta
-from django.conf import settings
+from .aws_clients import get_client
+from .log_shipper import log_shipper
+from .metric_sinks import get_metric_sink
 
 class CloudWatchManager:
-    def __init__(self):
-        self.cloudwatch = boto3.client('cloudwatch',
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            aws_session_token=settings.AWS_SESSION_TOKEN,
-            region_name=settings.AWS_S3_REGION_NAME
-        )
-        
-        self.logs_client = boto3.client('logs',
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            aws_session_token=settings.AWS_SESSION_TOKEN,
-            region_name=settings.AWS_S3_REGION_NAME
-        )
+    # Clients come from the shared registry on first use rather than at import
+    @property
+    def cloudwatch(self):
+        return get_client('cloudwatch')
 
-    def put_metric(self, metric_name, value, unit='Count', namespace='FoodInventory', dimensions=None):
-        """Put a custom metric to CloudWatch"""
-        try:
-            metric_data = {
-                'MetricName': metric_name,
-                'Value': value,
-                'Unit': unit,
-                'Timestamp': datetime.utcnow()
-            }
-            
-            if dimensions:
-                metric_data['Dimensions'] = dimensions
+    @property
+    def logs_client(self):
+        return get_client('logs')
 
-            response = self.cloudwatch.put_metric_data(
-                Namespace=namespace,
-                MetricData=[metric_data]
-            )
-            return True
-        except Exception as e:
-            print(f"Error putting metric {metric_name}: {str(e)}")
-            return False
+    def put_metric(self, metric_name, value, unit='Count', namespace='FoodInventory', dimensions=None, count=1):
+        """Record `count` observations of a custom metric with the configured sink (see CLOUDWATCH_METRICS_SINK)"""
+        return get_metric_sink().put(metric_name, value, unit, namespace, dimensions, count)
 
     def update_batch_status_metrics(self, batches):
         """Update batch status metrics with current counts"""
@@ -51,8 +28,14 @@ class CloudWatchManager:
                 if status in status_counts:
                     status_counts[status] += 1
 
-            # Update metrics with current counts
-            timestamp = datetime.utcnow()
+            return self.put_status_count_metrics(status_counts)
+        except Exception as e:
+            print(f"Error updating batch status metrics: {str(e)}")
+            return False
+
+    def put_status_count_metrics(self, status_counts):
+        """Publish pre-computed per-status batch counts"""
+        try:
             for status, count in status_counts.items():
                 self.put_metric(
                     f'Total{status.replace(" ", "")}Batches',
@@ -84,55 +67,8 @@ class CloudWatchManager:
             return False
 
     def log_event(self, log_group_name, log_stream_name, message, level='INFO'):
-        """Send log event to CloudWatch Logs"""
-        try:
-            # Create log group if it doesn't exist
-            try:
-                self.logs_client.create_log_group(logGroupName=log_group_name)
-            except self.logs_client.exceptions.ResourceAlreadyExistsException:
-                pass
-            
-            # Create log stream if it doesn't exist
-            try:
-                self.logs_client.create_log_stream(
-                    logGroupName=log_group_name,
-                    logStreamName=log_stream_name
-                )
-            except self.logs_client.exceptions.ResourceAlreadyExistsException:
-                pass
-            
-            # Get sequence token
-            response = self.logs_client.describe_log_streams(
-                logGroupName=log_group_name,
-                logStreamNamePrefix=log_stream_name
-            )
-            
-            sequence_token = None
-            if response['logStreams']:
-                sequence_token = response['logStreams'][0].get('uploadSequenceToken')
-            
-            # Prepare log event
-            log_event = {
-                'timestamp': int(datetime.utcnow().timestamp() * 1000),
-                'message': f"[{level}] {datetime.utcnow().isoformat()} - {message}"
-            }
-            
-            # Put log event
-            put_log_params = {
-                'logGroupName': log_group_name,
-                'logStreamName': log_stream_name,
-                'logEvents': [log_event]
-            }
-            
-            if sequence_token:
-                put_log_params['sequenceToken'] = sequence_token
-            
-            self.logs_client.put_log_events(**put_log_params)
-            return True
-            
-        except Exception as e:
-            print(f"Error logging to CloudWatch: {str(e)}")
-            return False
+        """Queue a log event for CloudWatch Logs; it is sent in the background by log_shipper"""
+        return log_shipper.emit(log_group_name, log_stream_name, message, level)
 
     def create_alarm(self, alarm_name, metric_name, threshold, comparison_operator='GreaterThanThreshold'):
         """Create a CloudWatch alarm"""
@@ -0,0 +1,120 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from django.conf import settings
+from .aws_clients import get_client
+from .inventory_cache import SingleFlight
+
+NAMESPACE = 'FoodInventory'
+CURRENT_COUNT = [{'Name': 'Type', 'Value': 'CurrentCount'}]
+
+# GetMetricData query id -> (metric name, dimensions, statistic, period in seconds)
+DASHBOARD_QUERIES = {
+    'total_safe_batches': ('TotalSafeBatches', CURRENT_COUNT, 'Maximum', 300),
+    'total_expiring_soon_batches': ('TotalExpiringSoonBatches', CURRENT_COUNT, 'Maximum', 300),
+    'total_expired_batches': ('TotalExpiredBatches', CURRENT_COUNT, 'Maximum', 300),
+    'page_views': ('PageViews', None, 'Sum', 3600),
+    'batch_created': ('BatchCreated', None, 'Sum', 3600),
+}
+# Status counts are gauges (show the latest value); the rest are totals over the window
+GAUGES = ('total_safe_batches', 'total_expiring_soon_batches', 'total_expired_batches')
+
+
+def fetch_dashboard_metrics(client, end_time=None, hours=24):
+    """Every dashboard series from one GetMetricData request (following NextToken pages).
+
+    Returns the latest value of each gauge and the sum of each activity
+    series over the last `hours`, plus the time window.
+    """
+    end_time = end_time or datetime.utcnow()
+    start_time = end_time - timedelta(hours=hours)
+    queries = []
+    for query_id, (metric_name, dimensions, stat, period) in DASHBOARD_QUERIES.items():
+        metric = {'Namespace': NAMESPACE, 'MetricName': metric_name}
+        if dimensions:
+            metric['Dimensions'] = dimensions
+        queries.append({
+            'Id': query_id,
+            'MetricStat': {'Metric': metric, 'Period': period, 'Stat': stat},
+            'ReturnData': True,
+        })
+
+    values = {query_id: [] for query_id in DASHBOARD_QUERIES}
+    params = {
+        'MetricDataQueries': queries,
+        'StartTime': start_time,
+        'EndTime': end_time,
+        'ScanBy': 'TimestampDescending',
+    }
+    while True:
+        response = client.get_metric_data(**params)
+        for result in response['MetricDataResults']:
+            values[result['Id']].extend(zip(result['Timestamps'], result['Values']))
+        if not response.get('NextToken'):
+            break
+        params['NextToken'] = response['NextToken']
+
+    metrics = {'start_time': start_time, 'end_time': end_time}
+    for query_id, points in values.items():
+        if query_id in GAUGES:
+            metrics[query_id] = max(points)[1] if points else 0
+        else:
+            metrics[query_id] = sum(value for _, value in points)
+    return metrics
+
+
+class DashboardMetrics:
+    """Process-wide cache of the dashboard's CloudWatch data.
+
+    Results younger than `ttl` seconds are served as they are. Older ones,
+    up to `stale_ttl`, are still served while a single background thread
+    fetches fresh data; only a cold or expired cache makes a viewer wait,
+    and then concurrent viewers share one GetMetricData request.
+    """
+
+    def __init__(self, ttl=60, stale_ttl=600, clock=time.time, client_factory=None):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.clock = clock
+        self.client_factory = client_factory or (lambda: get_client('cloudwatch'))
+        self._entry = (None, 0)
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def get(self):
+        value, loaded_at = self._entry
+        age = self.clock() - loaded_at
+        if value is not None and age < self.ttl:
+            return value
+        if value is not None and age < self.stale_ttl:
+            self._refresh_in_background()
+            return value
+        return self._flight.do('dashboard', self._load)
+
+    def _load(self):
+        value = fetch_dashboard_metrics(self.client_factory())
+        self._entry = (value, self.clock())
+        return value
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, name='dashboard-refresh', daemon=True).start()
+
+    def _refresh(self):
+        try:
+            self._flight.do('dashboard', self._load)
+        except Exception as e:
+            print(f"Error refreshing dashboard metrics: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+
+dashboard_metrics = DashboardMetrics(
+    ttl=settings.DASHBOARD_METRICS_TTL,
+    stale_ttl=settings.DASHBOARD_METRICS_STALE_TTL
+)
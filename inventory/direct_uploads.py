@@ -0,0 +1,69 @@
+import re
+from django.conf import settings
+from .aws_clients import get_client
+
+# Content types a browser may upload as a product image, with the extension the key gets
+IMAGE_TYPES = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+    'image/gif': '.gif',
+}
+
+# Batch IDs become part of the object key, so they may not contain '/' or other key syntax
+_SAFE_BATCH_ID = re.compile(r'[A-Za-z0-9_-][A-Za-z0-9_.-]*')
+
+
+def upload_path(batch_id, content_type):
+    """product_images/<batch_id>.<ext> for an upload; raises ValueError for unusable input"""
+    if not _SAFE_BATCH_ID.fullmatch(batch_id or ''):
+        raise ValueError('Batch ID may only contain letters, digits, ".", "_" and "-"')
+    if content_type not in IMAGE_TYPES:
+        raise ValueError(f'Unsupported image type: {content_type}')
+    return f'product_images/{batch_id}{IMAGE_TYPES[content_type]}'
+
+
+def presigned_upload(batch_id, content_type):
+    """Presigned POST letting the browser upload one image straight to S3.
+
+    The policy pins the object key, the Content-Type and a size range, so the
+    form can only write media/product_images/<batch_id>.<ext>. Returns
+    {'url', 'fields', 'key'}; the browser posts `fields` plus the file to
+    `url` and then submits `key` with the batch form.
+    """
+    key = f'media/{upload_path(batch_id, content_type)}'
+    post = get_client('s3').generate_presigned_post(
+        Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+        Key=key,
+        Fields={'Content-Type': content_type},
+        Conditions=[
+            {'Content-Type': content_type},
+            ['content-length-range', 1, settings.PRODUCT_IMAGE_MAX_BYTES],
+        ],
+        ExpiresIn=settings.PRODUCT_IMAGE_UPLOAD_EXPIRES_IN
+    )
+    return dict(post, key=key)
+
+
+def verify_upload(batch_id, key):
+    """Check that a browser upload for `batch_id` landed where its policy allowed.
+
+    Returns the image path stored on the batch (the key without 'media/');
+    raises ValueError if the key is outside the batch's scope, the object is
+    missing, or its size or type break the limits.
+    """
+    for content_type in IMAGE_TYPES:
+        if key == f'media/{upload_path(batch_id, content_type)}':
+            break
+    else:
+        raise ValueError('Upload key does not belong to this batch')
+
+    try:
+        head = get_client('s3').head_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key)
+    except Exception as e:
+        raise ValueError(f'Uploaded image not found: {str(e)}')
+    if not 0 < head['ContentLength'] <= settings.PRODUCT_IMAGE_MAX_BYTES:
+        raise ValueError('Uploaded image is empty or too large')
+    if head.get('ContentType') not in IMAGE_TYPES:
+        raise ValueError(f"Unsupported image type: {head.get('ContentType')}")
+    return key[len('media/'):]
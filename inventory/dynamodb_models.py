@@ -1,103 +1,590 @@
-import boto3
+import base64
+import json
+import random
+import time
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
 from django.conf import settings
-from datetime import datetime, date
+from .aggregates import InventoryAggregates, item_delta
+from .aws_clients import get_client
+from .batch_record import BatchRecord
+from .expiry_tracker import calculate_status
+from .parallel_scan import ParallelScanner, run_bounded
+from .presigned_urls import presigned_media_url, presigned_media_urls
+from .storage_backends import STATUS_EXPIRY_INDEX, get_storage_backend
+from datetime import datetime, date, timedelta
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# BatchWriteItem accepts at most 25 put/delete requests per call, BatchGetItem 100 keys
+BATCH_WRITE_SIZE = 25
+BATCH_GET_SIZE = 100
+REQUIRED_BATCH_FIELDS = ['batch_id', 'product_name', 'production_date', 'expiry_date', 'quantity']
+# Fields clients may change through patch_batch; status is derived from expiry_date
+UPDATABLE_BATCH_FIELDS = ['product_name', 'production_date', 'expiry_date', 'quantity']
+
+
+# Attributes a batch item can carry; presigned_url is derived from image_url by sign_image_urls
+BATCH_ATTRIBUTES = [
+    'batch_id', 'product_name', 'production_date', 'expiry_date', 'quantity', 'status',
+    'image_url', 'image_variants', 'image_state', 'presigned_url', 'created_at', 'updated_at', 'version',
+]
+
+
+class BatchNotFound(Exception):
+    pass
+
+
+class VersionConflict(Exception):
+    pass
+
+
+class RetriesExhausted(Exception):
+    """DynamoDB still returned unprocessed keys after every retry (sustained throttling)"""
+
+
+def encode_cursor(last_evaluated_key):
+    """Encode a LastEvaluatedKey as an opaque, URL-safe continuation cursor"""
+    if not last_evaluated_key:
+        return None
+    raw = json.dumps(last_evaluated_key, sort_keys=True, separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor back into an ExclusiveStartKey"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError, UnicodeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(key, dict) or not key:
+        raise ValueError('Invalid cursor')
+    return key
+
+
+def clamp_page_size(value, default=DEFAULT_PAGE_SIZE):
+    """Parse a ?limit= value into a page size between 1 and MAX_PAGE_SIZE"""
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid limit')
+    if limit < 1:
+        raise ValueError('Invalid limit')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def projection_kwargs(fields):
+    """ProjectionExpression arguments that read only `fields` (plus batch_id); None reads whole items"""
+    if not fields:
+        return {}
+    attributes = ['batch_id']
+    for field in fields:
+        attributes.append('image_url' if field == 'presigned_url' else field)
+    names = {f'#p{index}': name for index, name in enumerate(dict.fromkeys(attributes))}
+    return {
+        'ProjectionExpression': ', '.join(names),
+        'ExpressionAttributeNames': names,
+    }
+
+
+def parse_fields(value):
+    """Parse a ?fields=a,b value into a list of batch attributes (None when absent)"""
+    if not value:
+        return None
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in BATCH_ATTRIBUTES]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def _date_string(value):
+    return value.strftime('%Y-%m-%d') if isinstance(value, (datetime, date)) else value
+
+
+def batch_from_record(record):
+    """Validate a raw batch record (API JSON, CSV row) and return batch_data for create_batch.
+
+    Raises ValueError describing the first problem found.
+    """
+    for field in REQUIRED_BATCH_FIELDS:
+        if record.get(field) in (None, ''):
+            raise ValueError(f'Missing required field: {field}')
+
+    try:
+        production_date = datetime.strptime(str(record['production_date']), '%Y-%m-%d').date()
+        expiry_date = datetime.strptime(str(record['expiry_date']), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('Dates must use the YYYY-MM-DD format')
+    try:
+        quantity = int(record['quantity'])
+    except (TypeError, ValueError):
+        raise ValueError('Quantity must be an integer')
+
+    batch_data = {
+        'batch_id': str(record['batch_id']),
+        'product_name': record['product_name'],
+        'production_date': production_date,
+        'expiry_date': expiry_date,
+        'quantity': quantity,
+        'status': calculate_status(expiry_date),
+    }
+    if record.get('image'):
+        batch_data['image'] = record['image']
+    return batch_data
+
 
 class DynamoDBInventory:
-    def __init__(self):
-        self.dynamodb = boto3.resource('dynamodb',
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            aws_session_token=settings.AWS_SESSION_TOKEN,
-            region_name=settings.AWS_S3_REGION_NAME
-        )
-        self.table = self.dynamodb.Table('InventoryBatches')
-        self.s3_client = boto3.client('s3',
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            aws_session_token=settings.AWS_SESSION_TOKEN,
-            region_name=settings.AWS_S3_REGION_NAME
+    def __init__(self, backend=None):
+        # The storage backend (DynamoDB, in-memory or SQLite) comes from
+        # INVENTORY_STORAGE_BACKEND unless one is passed in explicitly
+        self.backend = backend if backend is not None else get_storage_backend()
+        # Scan workers look the table up on their own thread
+        self.scanner = ParallelScanner(
+            lambda: self.backend.table,
+            total_segments=settings.DYNAMODB_SCAN_SEGMENTS,
+            max_workers=settings.DYNAMODB_SCAN_WORKERS
         )
 
+    @property
+    def table(self):
+        # Resolved per call: the DynamoDB backend hands each thread its own Table
+        return self.backend.table
+
+    @property
+    def aggregates(self):
+        return InventoryAggregates(self.backend.aggregates_table)
+
+    @property
+    def s3_client(self):
+        return get_client('s3')
+
     def get_presigned_url(self, image_path):
-        """Generate a pre-signed URL for the image"""
-        if image_path:
-            try:
-                url = self.s3_client.generate_presigned_url(
-                    'get_object',
-                    Params={
-                        'Bucket': settings.AWS_STORAGE_BUCKET_NAME,
-                        'Key': f'media/{image_path}'
-                    },
-                    ExpiresIn=3600  # URL valid for 1 hour
-                )
-                return url
-            except Exception as e:
-                print(f"Error generating pre-signed URL: {str(e)}")
-                return None
-        return None
+        """Get a pre-signed URL for the image, reusing a cached one while it is still fresh"""
+        return presigned_media_url(image_path)
 
-    def create_batch(self, batch_data):
-        """Create a new batch in DynamoDB"""
+    def presign_image_urls(self, image_paths):
+        """Pre-sign many images at once, returning {image_path: url} (see presigned_media_urls)"""
+        return presigned_media_urls(image_paths)
+
+    def _build_item(self, batch_data):
+        """Turn batch_data into the stored DynamoDB item"""
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         item = {
             'batch_id': batch_data['batch_id'],
             'product_name': batch_data['product_name'],
-            'production_date': batch_data['production_date'].strftime('%Y-%m-%d'),
-            'expiry_date': batch_data['expiry_date'].strftime('%Y-%m-%d'),
+            'production_date': _date_string(batch_data['production_date']),
+            'expiry_date': _date_string(batch_data['expiry_date']),
             'quantity': batch_data['quantity'],
             'status': batch_data['status'],
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            'created_at': now,
+            'updated_at': now,
+            'version': 1
         }
         if batch_data.get('image'):
             item['image_url'] = batch_data['image']
-        
-        return self.table.put_item(Item=item)
+        if batch_data.get('image_variants'):
+            item['image_variants'] = batch_data['image_variants']
+        if batch_data.get('image_state'):
+            item['image_state'] = batch_data['image_state']
+        return item
+
+    def _update_aggregates(self, delta):
+        """Apply a counter delta; the batch write already happened, so failures are only logged"""
+        try:
+            self.aggregates.apply(delta)
+        except Exception as e:
+            print(f"Error updating inventory aggregates (run reconcile_aggregates): {str(e)}")
+
+    def create_batch(self, batch_data):
+        """Create a new batch in DynamoDB"""
+        item = self._build_item(batch_data)
+        response = self.table.put_item(Item=item, ReturnValues='ALL_OLD')
+        self._update_aggregates(item_delta(response.get('Attributes'), item))
+        return response
+
+    def _write_chunk(self, requests, max_retries):
+        """Send one BatchWriteItem chunk, retrying UnprocessedItems with jittered backoff.
+
+        Returns the put requests that were still unprocessed after max_retries.
+        """
+        table_name = self.table.name
+        for attempt in range(max_retries + 1):
+            response = self.backend.batch_write_item(RequestItems={table_name: requests})
+            requests = response.get('UnprocessedItems', {}).get(table_name, [])
+            if not requests:
+                return []
+            if attempt < max_retries:
+                time.sleep(random.uniform(0, min(5.0, 0.05 * (2 ** attempt))))
+        return requests
+
+    def bulk_create_batches(self, batches, max_workers=4, max_retries=8):
+        """Create many batches with concurrent 25-item BatchWriteItem calls.
+
+        Later records win when a batch_id repeats. Returns
+        {'written': int, 'failed': [batch_id, ...]} where failed lists the
+        items still unprocessed (or whose chunk errored) after retries.
+        """
+        items = {}
+        for batch_data in batches:
+            item = self._build_item(batch_data)
+            items[item['batch_id']] = item
+        requests = [{'PutRequest': {'Item': item}} for item in items.values()]
+        chunks = [requests[i:i + BATCH_WRITE_SIZE] for i in range(0, len(requests), BATCH_WRITE_SIZE)]
 
-    def get_batch(self, batch_id):
-        """Get a batch by ID"""
-        response = self.table.get_item(Key={'batch_id': batch_id})
+        # BatchWriteItem cannot return overwritten items, so read what is there first
+        # to keep the aggregate counters exact when an import replaces batches
+        keys = [{'batch_id': batch_id} for batch_id in items]
+        key_chunks = [keys[i:i + BATCH_GET_SIZE] for i in range(0, len(keys), BATCH_GET_SIZE)]
+
+        existing, failed = {}, []
+        for found in run_bounded(lambda chunk: self._get_chunk(chunk, max_retries, ['status', 'quantity']),
+                                 key_chunks, max_workers):
+            existing.update((item['batch_id'], item) for item in found)
+
+        def write(chunk):
+            try:
+                return self._write_chunk(chunk, max_retries)
+            except Exception as e:
+                print(f"Error writing batch chunk: {str(e)}")
+                return chunk
+
+        for unprocessed in run_bounded(write, chunks, max_workers):
+            failed.extend(request['PutRequest']['Item']['batch_id'] for request in unprocessed)
+
+        delta = item_delta()
+        failed_ids = set(failed)
+        for batch_id, item in items.items():
+            if batch_id not in failed_ids:
+                delta.update(item_delta(existing.get(batch_id), item))
+        self._update_aggregates(delta)
+
+        return {'written': len(requests) - len(failed), 'failed': failed}
+
+    def get_batch(self, batch_id, fields=None, consistent=False):
+        """Get a batch by ID, optionally reading only `fields` (consistent=True sees every committed write)"""
+        response = self.table.get_item(Key={'batch_id': batch_id}, ConsistentRead=consistent,
+                                       **projection_kwargs(fields))
         item = response.get('Item')
-        if item and item.get('image_url'):
-            item['presigned_url'] = self.get_presigned_url(item['image_url'])
-        return item
+        return self._to_records([item])[0] if item else None
+
+    def _get_chunk(self, keys, max_retries, fields=None):
+        """Fetch one BatchGetItem chunk, retrying UnprocessedKeys with jittered backoff"""
+        table_name = self.table.name
+        request = dict({'Keys': keys}, **projection_kwargs(fields))
+        items = []
+        for attempt in range(max_retries + 1):
+            response = self.backend.batch_get_item(RequestItems={table_name: request})
+            items.extend(response.get('Responses', {}).get(table_name, []))
+            request = response.get('UnprocessedKeys', {}).get(table_name)
+            if not request:
+                return items
+            if attempt < max_retries:
+                time.sleep(random.uniform(0, min(5.0, 0.05 * (2 ** attempt))))
+        raise RetriesExhausted(f"{len(request['Keys'])} keys still unprocessed after {max_retries} retries")
+
+    def get_batches(self, batch_ids, max_workers=4, max_retries=8, fields=None):
+        """Get many batches with 100-key BatchGetItem calls.
+
+        Returns a dict of batch_id -> item in request order; ids that do not
+        exist are left out.
+        """
+        batch_ids = list(dict.fromkeys(batch_ids))
+        keys = [{'batch_id': batch_id} for batch_id in batch_ids]
+        chunks = [keys[i:i + BATCH_GET_SIZE] for i in range(0, len(keys), BATCH_GET_SIZE)]
+
+        found = {}
+        for items in run_bounded(lambda chunk: self._get_chunk(chunk, max_retries, fields), chunks, max_workers):
+            for item in items:
+                found[item['batch_id']] = item
 
-    def update_batch(self, batch_id, update_data):
-        """Update a batch"""
+        return {
+            batch_id: self._to_records([found[batch_id]])[0]
+            for batch_id in batch_ids if batch_id in found
+        }
+
+    def update_batch(self, batch_id, update_data, expected_version=None):
+        """Update a batch, bumping its `version` like patch_batch does.
+
+        With expected_version the write only succeeds if the batch is still at
+        that version; otherwise VersionConflict is raised.
+        """
         update_expr = "SET "
         expr_values = {}
         expr_names = {}
         
         # Build update expression
         for key, value in update_data.items():
-            if key != 'batch_id':  # Skip primary key
+            # Forms pass the image path as 'image'; it is stored as image_url like in create_batch
+            key = 'image_url' if key == 'image' else key
+            if key not in ('batch_id', 'version'):  # Skip primary key and the managed version
                 update_expr += f"#{key} = :{key}, "
                 expr_names[f"#{key}"] = key
                 expr_values[f":{key}"] = value if not isinstance(value, (datetime, date)) else value.isoformat()
         
-        # Add updated_at timestamp
-        update_expr += "#updated_at = :updated_at"
+        # Add updated_at timestamp and bump the version patch_batch checks
+        update_expr += "#updated_at = :updated_at, #version = if_not_exists(#version, :zero) + :one"
         expr_names["#updated_at"] = "updated_at"
+        expr_names["#version"] = "version"
         expr_values[":updated_at"] = datetime.now().isoformat()
+        expr_values[":zero"] = 0
+        expr_values[":one"] = 1
+
+        condition_kwargs = {}
+        if expected_version is not None:
+            condition_kwargs['ConditionExpression'] = Attr('version').eq(int(expected_version))
+        try:
+            response = self.table.update_item(
+                Key={'batch_id': batch_id},
+                UpdateExpression=update_expr,
+                ExpressionAttributeNames=expr_names,
+                ExpressionAttributeValues=expr_values,
+                ReturnValues='ALL_OLD',
+                **condition_kwargs
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            raise VersionConflict(f'Batch {batch_id} was modified by someone else')
+        old = response.get('Attributes')
+        self._update_aggregates(item_delta(old, dict(old or {'batch_id': batch_id}, **update_data)))
+        return response
+
+    def patch_batch(self, batch_id, fields, expected_version=None):
+        """Set only the given fields with one conditional UpdateItem and return the updated item.
+
+        Fields outside UPDATABLE_BATCH_FIELDS are ignored. Changing expiry_date
+        recomputes status in the same update. Every patch bumps `version`; when
+        expected_version is given the write only succeeds if it still matches.
+        Raises BatchNotFound or VersionConflict.
+        """
+        fields = {key: _date_string(value) for key, value in fields.items() if key in UPDATABLE_BATCH_FIELDS}
+        if 'expiry_date' in fields:
+            fields['status'] = calculate_status(fields['expiry_date'])
+
+        assignments = []
+        expr_names = {'#updated_at': 'updated_at', '#version': 'version'}
+        expr_values = {
+            ':updated_at': datetime.now().isoformat(),
+            ':zero': 0,
+            ':one': 1,
+        }
+        for index, (key, value) in enumerate(fields.items()):
+            assignments.append(f"#f{index} = :f{index}")
+            expr_names[f"#f{index}"] = key
+            expr_values[f":f{index}"] = value
+        assignments.append("#updated_at = :updated_at")
+        assignments.append("#version = if_not_exists(#version, :zero) + :one")
+
+        condition = Attr('batch_id').exists()
+        if expected_version is not None:
+            condition = condition & Attr('version').eq(int(expected_version))
+
+        try:
+            response = self.table.update_item(
+                Key={'batch_id': batch_id},
+                UpdateExpression="SET " + ", ".join(assignments),
+                ConditionExpression=condition,
+                ExpressionAttributeNames=expr_names,
+                ExpressionAttributeValues=expr_values,
+                # The old image tells the counters what changed; the new one follows from it
+                ReturnValues='ALL_OLD'
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            # Only the failure path pays for a read to tell the two conditions apart
+            if expected_version is not None and self.table.get_item(Key={'batch_id': batch_id}).get('Item'):
+                raise VersionConflict(f'Batch {batch_id} was modified by someone else')
+            raise BatchNotFound(batch_id)
+
+        old = response['Attributes']
+        item = dict(old, **fields)
+        item['updated_at'] = expr_values[':updated_at']
+        item['version'] = old.get('version', 0) + 1
+        self._update_aggregates(item_delta(old, item))
+        return self._to_records([item])[0]
+
+    def set_image_state(self, batch_id, image_path, state, image_variants=None):
+        """Record the outcome of background image processing for `image_path`.
+
+        The write is conditional on the batch still pointing at that image, so a
+        job that finishes after the batch was deleted or given a newer image
+        changes nothing. Returns whether the batch was updated.
+        """
+        update_expr = "SET image_state = :state, updated_at = :updated_at"
+        expr_values = {':state': state, ':updated_at': datetime.now().isoformat()}
+        if image_variants is not None:
+            update_expr += ", image_variants = :variants"
+            expr_values[':variants'] = image_variants
+        try:
+            self.table.update_item(
+                Key={'batch_id': batch_id},
+                UpdateExpression=update_expr,
+                ConditionExpression=Attr('image_url').eq(image_path),
+                ExpressionAttributeValues=expr_values
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return False
+        return True
 
-        return self.table.update_item(
-            Key={'batch_id': batch_id},
-            UpdateExpression=update_expr,
-            ExpressionAttributeNames=expr_names,
-            ExpressionAttributeValues=expr_values
+    def stale_pending_images(self, older_than):
+        """[(batch_id, image_path)] of batches whose image has been 'pending' for over `older_than` seconds"""
+        cutoff = datetime.now() - timedelta(seconds=older_than)
+        items = self.scanner.scan(
+            FilterExpression=Attr('image_state').eq('pending'),
+            **projection_kwargs(['batch_id', 'image_url', 'updated_at'])
         )
+        # updated_at is ISO 8601 with either a 'T' or a space separator; both parse
+        return [
+            (item['batch_id'], item['image_url']) for item in items
+            if item.get('image_url')
+            and (not item.get('updated_at') or datetime.fromisoformat(item['updated_at']) < cutoff)
+        ]
 
     def delete_batch(self, batch_id):
         """Delete a batch"""
-        return self.table.delete_item(Key={'batch_id': batch_id})
+        response = self.table.delete_item(Key={'batch_id': batch_id}, ReturnValues='ALL_OLD')
+        self._update_aggregates(item_delta(response.get('Attributes'), None))
+        return response
 
-    def list_batches(self):
-        """List all batches"""
-        response = self.table.scan()
+    def _to_records(self, items):
+        """Convert raw items into BatchRecords (image URLs are signed later, see sign_image_urls)"""
+        return [BatchRecord.from_item(item) for item in items]
+
+    def sign_image_urls(self, records):
+        """Set presigned_url on the records that have an image, signing them in one batch.
+
+        Reads never sign; call this at the rendering boundary for just the
+        records that are about to be returned.
+        """
+        urls = self.presign_image_urls(record.image_url for record in records)
+        for record in records:
+            if record.image_url:
+                record.presigned_url = urls.get(record.image_url)
+        return records
+
+    def _scan_kwargs(self, status=None, fields=None):
+        scan_kwargs = projection_kwargs(fields)
+        if status:
+            scan_kwargs['FilterExpression'] = Attr('status').eq(status)
+        return scan_kwargs
+
+    def iter_batch_pages(self, status=None, start_key=None, fields=None):
+        """Yield raw scan pages, following LastEvaluatedKey until the table is exhausted"""
+        scan_kwargs = self._scan_kwargs(status, fields)
+        while True:
+            if start_key:
+                scan_kwargs['ExclusiveStartKey'] = start_key
+            response = self.table.scan(**scan_kwargs)
+            yield response.get('Items', [])
+            start_key = response.get('LastEvaluatedKey')
+            if not start_key:
+                return
+
+    def iter_batches(self, status=None, fields=None):
+        """Stream every batch one item at a time without pre-signed URLs"""
+        for items in self.iter_batch_pages(status=status, fields=fields):
+            yield from items
+
+    def query_by_status(self, status, limit=DEFAULT_PAGE_SIZE, cursor=None,
+                        expiring_before=None, ascending=True, fields=None):
+        """Return one page of batches with the given status, ordered by expiry date.
+
+        Reads only matching items from the status/expiry index, so the cost is
+        proportional to the page size rather than the table size.
+        """
+        key_condition = Key('status').eq(status)
+        if expiring_before:
+            key_condition = key_condition & Key('expiry_date').lte(
+                expiring_before.isoformat() if isinstance(expiring_before, date) else expiring_before
+            )
+
+        query_kwargs = dict(projection_kwargs(fields), **{
+            'IndexName': STATUS_EXPIRY_INDEX,
+            'KeyConditionExpression': key_condition,
+            'ScanIndexForward': ascending,
+            'Limit': limit,
+        })
+        start_key = decode_cursor(cursor)
+        if start_key:
+            query_kwargs['ExclusiveStartKey'] = start_key
+
+        response = self.table.query(**query_kwargs)
         items = response.get('Items', [])
-        
-        # Add pre-signed URLs for images
-        for item in items:
-            if item.get('image_url'):
-                item['presigned_url'] = self.get_presigned_url(item['image_url'])
-        
-        return items 
+        return self._to_records(items), encode_cursor(response.get('LastEvaluatedKey'))
+
+    def list_batches_page(self, limit=DEFAULT_PAGE_SIZE, cursor=None, status=None, fields=None):
+        """Return up to `limit` batches and the cursor for the next page (None when done)"""
+        if status:
+            return self.query_by_status(status, limit=limit, cursor=cursor, fields=fields)
+
+        items = []
+        start_key = decode_cursor(cursor)
+        scan_kwargs = projection_kwargs(fields)
+        while True:
+            # A scan can stop short of Limit at the 1 MB response cap, so keep
+            # reading until the page is full; Limit never lets it overshoot
+            scan_kwargs['Limit'] = limit - len(items)
+            if start_key:
+                scan_kwargs['ExclusiveStartKey'] = start_key
+            response = self.table.scan(**scan_kwargs)
+            items.extend(response.get('Items', []))
+            start_key = response.get('LastEvaluatedKey')
+            if not start_key or len(items) >= limit:
+                break
+
+        return self._to_records(items), encode_cursor(start_key)
+
+    def parallel_scan(self, callback=None, status=None, fields=None):
+        """Scan the whole table with a segmented parallel scan (see ParallelScanner.scan)"""
+        return self.scanner.scan(callback, **self._scan_kwargs(status, fields))
+
+    def summarize_batches(self):
+        """Batch count, total quantity and per-status counts from the materialized counters.
+
+        Falls back to a full scan until reconcile_aggregates has built the counters.
+        """
+        summary = self.aggregates.read()
+        return summary if summary is not None else self.scan_summary()
+
+    def scan_summary(self):
+        """Count batches per status and total quantity without materializing the table"""
+        totals = [
+            {'count': 0, 'quantity': 0, 'status_counts': {'Safe': 0, 'Expiring Soon': 0, 'Expired': 0}}
+            for _ in range(self.scanner.total_segments)
+        ]
+
+        # Each segment only touches its own accumulator, so no locking is needed
+        def accumulate(segment, items):
+            total = totals[segment]
+            for item in items:
+                total['count'] += 1
+                total['quantity'] += int(item.get('quantity', 0))
+                status = item.get('status', 'Unknown')
+                if status in total['status_counts']:
+                    total['status_counts'][status] += 1
+
+        self.parallel_scan(accumulate, fields=['status', 'quantity'])
+
+        summary = {
+            'total_batches': sum(t['count'] for t in totals),
+            'total_quantity': sum(t['quantity'] for t in totals),
+            'status_counts': {'Safe': 0, 'Expiring Soon': 0, 'Expired': 0},
+        }
+        for total in totals:
+            for status, count in total['status_counts'].items():
+                summary['status_counts'][status] += count
+        return summary
+
+    def list_batches(self, fields=None):
+        """List all batches"""
+        return self._to_records(self.parallel_scan(fields=fields))
@@ -17,4 +17,15 @@ class ExpiryTracker:
             return "Expired"
         elif days <= 7:
             return "Expiring Soon"
-        return "Safe" 
\ No newline at end of file
+        return "Safe" 
+
+def calculate_status(expiry_date, today=None):
+    """Status for an expiry date (a date or 'YYYY-MM-DD' string), matching the batch views"""
+    if isinstance(expiry_date, str):
+        expiry_date = datetime.strptime(expiry_date, "%Y-%m-%d").date()
+    days = (expiry_date - (today or datetime.now().date())).days
+    if days < 0:
+        return "Expired"
+    elif days <= 7:
+        return "Expiring Soon"
+    return "Safe"
@@ -0,0 +1,98 @@
+import hashlib
+import os
+from io import BytesIO
+from django.conf import settings
+from .aws_clients import get_client
+
+# Pillow format name -> (file extension, Content-Type)
+FORMATS = {
+    'webp': ('webp', 'image/webp'),
+    'jpeg': ('jpg', 'image/jpeg'),
+}
+
+
+def upload_token(image_path, data):
+    """Short digest of an original's key and bytes that keeps its thumbnail keys apart from other uploads'"""
+    return hashlib.sha256(image_path.encode() + b'\0' + data).hexdigest()[:12]
+
+
+def derivative_path(image_path, size, fmt, token):
+    """product_images/B1.png -> product_images/B1_<token>_256.webp, next to the original"""
+    stem = os.path.splitext(image_path)[0]
+    return f'{stem}_{token}_{size}.{FORMATS[fmt][0]}'
+
+
+def render_derivatives(file, sizes=None, formats=None, quality=None):
+    """Resize an uploaded image to each size bucket and encode it in each format.
+
+    Returns [(size, fmt, bytes)]. The image is decoded once, rotated upright
+    from its EXIF orientation and then re-encoded without EXIF or other
+    metadata. Each bucket bounds the longest edge; images are never upscaled.
+    """
+    from PIL import Image, ImageOps
+
+    sizes = sorted(sizes or settings.PRODUCT_IMAGE_SIZES, reverse=True)
+    formats = formats or settings.PRODUCT_IMAGE_FORMATS
+    quality = quality or settings.PRODUCT_IMAGE_QUALITY
+
+    file.seek(0)
+    with Image.open(file) as original:
+        # JPEG can decode straight to a reduced scale, far cheaper than a full decode and resize
+        original.draft('RGB', (sizes[0], sizes[0]))
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+    derivatives = []
+    # Largest first, each bucket resized from the previous one
+    for size in sizes:
+        image.thumbnail((size, size), Image.LANCZOS)
+        for fmt in formats:
+            frame = image
+            if fmt == 'jpeg' and image.mode == 'RGBA':
+                frame = Image.new('RGB', image.size, 'white')
+                frame.paste(image, mask=image.getchannel('A'))
+            buffer = BytesIO()
+            frame.save(buffer, format=fmt.upper(), quality=quality, optimize=True)
+            derivatives.append((size, fmt, buffer.getvalue()))
+    return derivatives
+
+
+def render_image_bytes(data, sizes, formats, quality):
+    """render_derivatives for raw image bytes; a plain top-level function so worker processes can run it"""
+    return render_derivatives(BytesIO(data), sizes, formats, quality)
+
+
+def upload_derivatives(image_path, token, derivatives):
+    """Upload rendered derivatives next to media/<image_path>, keyed by the upload's token.
+
+    Returns the image_variants map stored on the batch, {'<size>': {fmt: path}}.
+    """
+    s3_client = get_client('s3')
+    variants = {}
+    for size, fmt, data in derivatives:
+        path = derivative_path(image_path, size, fmt, token)
+        s3_client.put_object(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+            Key=f'media/{path}',
+            Body=data,
+            ContentType=FORMATS[fmt][1]
+        )
+        variants.setdefault(str(size), {})[fmt] = path
+    return variants
+
+
+def pick_variant(variants, size, accept_webp=True):
+    """Path of the smallest derivative at least `size` pixels (else the largest); None if there are none"""
+    if not variants:
+        return None
+    sizes = sorted(int(bucket) for bucket in variants)
+    bucket = next((candidate for candidate in sizes if candidate >= size), sizes[-1])
+    formats = variants[str(bucket)]
+    if accept_webp and 'webp' in formats:
+        return formats['webp']
+    return formats.get('jpeg') or next(iter(formats.values()), None)
+
+
+def variant_paths(variants):
+    """Every derivative path in an image_variants map"""
+    return [path for formats in (variants or {}).values() for path in formats.values()]
@@ -0,0 +1,230 @@
+import copy
+import hashlib
+import threading
+from django.conf import settings
+from django.core.cache import caches
+from .dynamodb_models import DynamoDBInventory, DEFAULT_PAGE_SIZE
+
+_MISSING = object()
+
+
+def trim_fields(record, fields):
+    """Reduce a cached whole BatchRecord to the requested fields (None keeps everything)"""
+    if record is None or not fields:
+        return record
+    return record.only(fields)
+
+
+class SingleFlight:
+    """Collapse concurrent loads of the same key into one call (per process)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, loader):
+        """Run loader() once for all threads asking for `key` at the same time"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'done': threading.Event(), 'value': None, 'error': None}
+
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['value']
+
+        try:
+            call['value'] = loader()
+            return call['value']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+
+class InventoryCache:
+    """Read-through cache on top of a Django cache alias with hit/miss counters.
+
+    Eviction is left to the backend; the default 'inventory' alias is a
+    LocMemCache, which evicts least-recently-used entries once MAX_ENTRIES is
+    reached. A LocMemCache is private to its process, so invalidations do not
+    reach other workers before the TTLs run out; point INVENTORY_CACHE_URL at
+    Redis or Memcached to share one cache between them.
+    """
+
+    LIST_VERSION_KEY = 'inventory:list-version'
+
+    def __init__(self, alias='inventory', timeouts=None):
+        self.alias = alias
+        self.timeouts = timeouts or settings.INVENTORY_CACHE_TIMEOUTS
+        self.flight = SingleFlight()
+        self._stats_lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    @property
+    def cache(self):
+        # Django cache handles are per-thread, so look the alias up on each use
+        return caches[self.alias]
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        """Return hit/miss/invalidation counters and the hit ratio for this process"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+    def get_or_load(self, key, loader, kind):
+        """Return the cached value for key, loading and storing it with the `kind` TTL on a miss"""
+        value = self.cache.get(key, _MISSING)
+        if value is not _MISSING:
+            self._count('hits')
+            return value
+
+        self._count('misses')
+
+        def load():
+            # Another flight may have filled the key while we were queued
+            cached = self.cache.get(key, _MISSING)
+            if cached is not _MISSING:
+                return cached
+            loaded = loader()
+            self.cache.set(key, loaded, self.timeouts[kind])
+            return loaded
+
+        # Callers mutate what they get back, so never hand out the shared result
+        return copy.deepcopy(self.flight.do(key, load))
+
+    def get_many_counted(self, keys):
+        """Bulk cache lookup that counts one hit or miss per key"""
+        found = self.cache.get_many(list(keys))
+        with self._stats_lock:
+            self._stats['hits'] += len(found)
+            self._stats['misses'] += len(keys) - len(found)
+        return found
+
+    def set_many(self, values, kind):
+        self.cache.set_many(values, self.timeouts[kind])
+
+    def batch_key(self, batch_id):
+        return f'inventory:batch:{batch_id}'
+
+    def list_key(self, *parts):
+        version = self.cache.get_or_set(self.LIST_VERSION_KEY, 1, None)
+        digest = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+        return f'inventory:list:{version}:{digest}'
+
+    def invalidate_batch(self, batch_id):
+        """Drop a batch and every cached listing that could contain it"""
+        self.invalidate_batches([batch_id])
+
+    def invalidate_batches(self, batch_ids):
+        """Drop several batches with a single listing invalidation"""
+        self._count('invalidations')
+        self.cache.delete_many([self.batch_key(batch_id) for batch_id in batch_ids])
+        try:
+            self.cache.incr(self.LIST_VERSION_KEY)
+        except ValueError:
+            self.cache.set(self.LIST_VERSION_KEY, 2, None)
+
+
+# Shared by every CachedDynamoDBInventory so the counters cover the whole process
+inventory_cache = InventoryCache()
+
+
+class CachedDynamoDBInventory(DynamoDBInventory):
+    """DynamoDBInventory with read-through caching of batch reads and listings"""
+
+    def __init__(self, backend=None, cache=None):
+        super().__init__(backend=backend)
+        self.cache = cache or inventory_cache
+
+    def get_batch(self, batch_id, fields=None, consistent=False):
+        if consistent:
+            # Callers that act on what they read (e.g. its version) must not see another worker's stale entry
+            return super().get_batch(batch_id, fields, consistent=True)
+        # Whole items are cached once and trimmed per request
+        item = self.cache.get_or_load(
+            self.cache.batch_key(batch_id),
+            lambda: super(CachedDynamoDBInventory, self).get_batch(batch_id),
+            'batch'
+        )
+        return trim_fields(item, fields)
+
+    def get_batches(self, batch_ids, max_workers=4, max_retries=8, fields=None):
+        batch_ids = list(dict.fromkeys(batch_ids))
+        keys = {self.cache.batch_key(batch_id): batch_id for batch_id in batch_ids}
+        cached = self.cache.get_many_counted(keys)
+
+        found = {keys[key]: item for key, item in cached.items() if item is not None}
+        missing = [batch_id for batch_id in batch_ids if self.cache.batch_key(batch_id) not in cached]
+        if missing:
+            loaded = super().get_batches(missing, max_workers, max_retries)
+            self.cache.set_many({self.cache.batch_key(batch_id): loaded.get(batch_id) for batch_id in missing}, 'batch')
+            found.update(loaded)
+
+        return {batch_id: trim_fields(found[batch_id], fields) for batch_id in batch_ids if batch_id in found}
+
+    def list_batches(self, fields=None):
+        return self.cache.get_or_load(
+            self.cache.list_key('all', fields),
+            lambda: super(CachedDynamoDBInventory, self).list_batches(fields),
+            'list'
+        )
+
+    def list_batches_page(self, limit=DEFAULT_PAGE_SIZE, cursor=None, status=None, fields=None):
+        return self.cache.get_or_load(
+            self.cache.list_key('page', limit, cursor, status, fields),
+            lambda: super(CachedDynamoDBInventory, self).list_batches_page(limit, cursor, status, fields),
+            'list'
+        )
+
+    def create_batch(self, batch_data):
+        try:
+            return super().create_batch(batch_data)
+        finally:
+            self.cache.invalidate_batch(batch_data['batch_id'])
+
+    def bulk_create_batches(self, batches, max_workers=4, max_retries=8):
+        batches = list(batches)
+        try:
+            return super().bulk_create_batches(batches, max_workers, max_retries)
+        finally:
+            self.cache.invalidate_batches([batch_data['batch_id'] for batch_data in batches])
+
+    def update_batch(self, batch_id, update_data, expected_version=None):
+        try:
+            return super().update_batch(batch_id, update_data, expected_version)
+        finally:
+            self.cache.invalidate_batch(batch_id)
+
+    def patch_batch(self, batch_id, fields, expected_version=None):
+        try:
+            return super().patch_batch(batch_id, fields, expected_version)
+        finally:
+            self.cache.invalidate_batch(batch_id)
+
+    def set_image_state(self, batch_id, image_path, state, image_variants=None):
+        try:
+            return super().set_image_state(batch_id, image_path, state, image_variants)
+        finally:
+            self.cache.invalidate_batch(batch_id)
+
+    def delete_batch(self, batch_id):
+        try:
+            return super().delete_batch(batch_id)
+        finally:
+            self.cache.invalidate_batch(batch_id)
+
+    def cache_stats(self):
+        return self.cache.stats()
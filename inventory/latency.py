@@ -0,0 +1,196 @@
+import threading
+import time
+import weakref
+from django.conf import settings
+from .background_flush import BackgroundFlusher
+
+# Log-linear buckets over microseconds, as in HDR histograms: values below
+# 2 * SUB_BUCKETS are exact, above that every power of two is split into
+# SUB_BUCKETS equal buckets, so any value is known to within 1/SUB_BUCKETS
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+LINEAR_LIMIT = 2 * SUB_BUCKETS
+
+
+def bucket_index(micros):
+    """Bucket holding a latency of `micros` microseconds"""
+    if micros < LINEAR_LIMIT:
+        return max(micros, 0)
+    shift = micros.bit_length() - SUB_BUCKET_BITS - 1
+    return LINEAR_LIMIT + (shift - 1) * SUB_BUCKETS + (micros >> shift) - SUB_BUCKETS
+
+
+def bucket_bounds(index):
+    """(lowest, highest) microsecond value that lands in bucket `index`"""
+    if index < LINEAR_LIMIT:
+        return index, index
+    shift, offset = divmod(index - LINEAR_LIMIT, SUB_BUCKETS)
+    shift += 1
+    low = (SUB_BUCKETS + offset) << shift
+    return low, low + (1 << shift) - 1
+
+
+def bucket_midpoint_ms(index):
+    """The latency, in milliseconds, that stands for every value in bucket `index`"""
+    low, high = bucket_bounds(index)
+    return round((low + high) / 2000, 3)
+
+
+def percentiles(counts, quantiles=(50, 95, 99)):
+    """{q: milliseconds} for a {bucket index: count} histogram, taking each bucket's midpoint"""
+    total = sum(counts.values())
+    if not total:
+        return {q: None for q in quantiles}
+    results = {}
+    ordered = sorted(counts.items())
+    for q in quantiles:
+        rank = max(1, -(-total * q // 100))
+        seen = 0
+        for index, count in ordered:
+            seen += count
+            if seen >= rank:
+                results[q] = bucket_midpoint_ms(index)
+                break
+    return results
+
+
+def merge(into, counts):
+    for index, count in counts.items():
+        into[index] = into.get(index, 0) + count
+    return into
+
+
+class LatencyRecorder(BackgroundFlusher):
+    """Per-view request latency histograms with lock-free recording.
+
+    Every thread counts into its own {(view, method, status): {bucket: count}}
+    map, so record() takes no lock; readers merge the maps of all threads.
+    Maps of threads that have exited are folded into one shared map and
+    dropped, so servers that start a thread per request do not accumulate
+    one map per request.
+    Every `flush_interval` seconds the histograms of requests seen since the
+    previous flush are published through cloudwatch_manager (and hence the
+    configured metric sink) as one RequestLatency distribution, each bucket's
+    midpoint with its count, plus a RequestCount. CloudWatch merges these
+    across workers and periods, so its percentile statistics (p50, p99, ...)
+    cover the whole fleet; summary() is this process's own view.
+    """
+
+    thread_name = 'latency-metrics'
+
+    def __init__(self, flush_interval=60.0, publish=True):
+        super().__init__(flush_interval)
+        self.publish = publish
+        self._local = threading.local()
+        # [(weak reference to the owning thread, its map)]; dead threads' counts live on in _retired
+        self._stores = []
+        self._retired = {}
+        self._prune_at = 64
+        self._published = {}
+
+    def record(self, view, method, status, seconds):
+        store = getattr(self._local, 'store', None)
+        if store is None:
+            store = self._local.store = {}
+            with self._cond:
+                # Registered once per thread; also starts the publisher with the first request
+                self._stores.append((weakref.ref(threading.current_thread()), store))
+                if len(self._stores) >= self._prune_at:
+                    self._prune()
+                    self._prune_at = max(64, 2 * len(self._stores))
+                if self.publish:
+                    self._started()
+        counts = store.get((view, method, status))
+        if counts is None:
+            counts = store[(view, method, status)] = {}
+        index = bucket_index(int(seconds * 1000000))
+        counts[index] = counts.get(index, 0) + 1
+
+    def _prune(self):
+        """Fold the maps of exited threads into _retired and forget them (called with _cond held)"""
+        live = []
+        for ref, store in self._stores:
+            thread = ref()
+            if thread is not None and thread.is_alive():
+                live.append((ref, store))
+            else:
+                # The owner is gone, so nothing writes to this map any more
+                for key, counts in store.items():
+                    merge(self._retired.setdefault(key, {}), counts)
+        self._stores = live
+
+    def snapshot(self):
+        """Merged {(view, method, status): {bucket: count}} across all threads since startup"""
+        with self._cond:
+            self._prune()
+            stores = [store for _, store in self._stores]
+            merged = {key: dict(counts) for key, counts in self._retired.items()}
+        for store in stores:
+            # Another thread may add a key meanwhile; copying first keeps iteration safe
+            for key, counts in list(store.items()):
+                merge(merged.setdefault(key, {}), dict(counts))
+        return merged
+
+    def summary(self):
+        """One row per view, method and status with request count and p50/p95/p99 in milliseconds"""
+        rows = []
+        for (view, method, status), counts in sorted(self.snapshot().items()):
+            quantiles = percentiles(counts)
+            rows.append({
+                'view': view,
+                'method': method,
+                'status': status,
+                'count': sum(counts.values()),
+                'p50_ms': quantiles[50],
+                'p95_ms': quantiles[95],
+                'p99_ms': quantiles[99],
+            })
+        return rows
+
+    def flush(self):
+        """Publish the latency histogram of the requests recorded since the last flush"""
+        from .cloudwatch_utils import cloudwatch_manager
+
+        current = self.snapshot()
+        for key, counts in current.items():
+            previous = self._published.get(key, {})
+            delta = {index: count - previous.get(index, 0) for index, count in counts.items()
+                     if count > previous.get(index, 0)}
+            if not delta:
+                continue
+            view, method, status = key
+            dimensions = [
+                {'Name': 'View', 'Value': view},
+                {'Name': 'Method', 'Value': method},
+                {'Name': 'Status', 'Value': str(status)},
+            ]
+            cloudwatch_manager.put_metric('RequestCount', sum(delta.values()), 'Count', dimensions=dimensions)
+            for index, count in sorted(delta.items()):
+                cloudwatch_manager.put_metric('RequestLatency', bucket_midpoint_ms(index), 'Milliseconds',
+                                              dimensions=dimensions, count=count)
+        self._published = current
+
+
+class LatencyHistogramMiddleware:
+    """Times every request, from the top of the middleware stack, into latency_recorder"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        match = request.resolver_match
+        latency_recorder.record(
+            match.view_name if match else 'unresolved',
+            request.method,
+            response.status_code,
+            time.perf_counter() - started
+        )
+        return response
+
+
+latency_recorder = LatencyRecorder(
+    flush_interval=settings.LATENCY_PUBLISH_INTERVAL,
+    publish=settings.LATENCY_PUBLISH_INTERVAL > 0
+)
@@ -0,0 +1,446 @@
+import bisect
+import contextlib
+import copy
+import json
+import re
+import sqlite3
+import threading
+import zlib
+from decimal import Decimal
+from boto3.dynamodb.conditions import Size
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+# How long a SQLite writer waits for another process's transaction before giving up
+SQLITE_BUSY_TIMEOUT_SECONDS = 30
+
+_COMPARISONS = {
+    '=': lambda a, b: a == b,
+    '<>': lambda a, b: a != b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+}
+
+
+def _normalize(item):
+    """Round-trip an item through the DynamoDB type system (ints become Decimal, floats are rejected)"""
+    return {key: _deserializer.deserialize(_serializer.serialize(value)) for key, value in item.items()}
+
+
+def _client_error(code, message, operation):
+    return ClientError({'Error': {'Code': code, 'Message': message}}, operation)
+
+
+def _type_code(value):
+    """DynamoDB type descriptor ('S', 'N', 'SS', 'M', ...) of a plain value"""
+    return next(iter(_serializer.serialize(value)))
+
+
+def evaluate_condition(condition, item, operation='Query'):
+    """Evaluate a boto3.dynamodb.conditions Key/Attr condition against a plain item"""
+    expression = condition.get_expression()
+    operator = expression['operator']
+    values = expression['values']
+
+    if operator == 'AND':
+        return all(evaluate_condition(value, item, operation) for value in values)
+    if operator == 'OR':
+        return any(evaluate_condition(value, item, operation) for value in values)
+    if operator == 'NOT':
+        return not evaluate_condition(values[0], item, operation)
+
+    name = values[0].name
+    if operator == 'attribute_exists':
+        return name in item
+    if operator == 'attribute_not_exists':
+        return name not in item
+    if name not in item:
+        return False
+
+    actual = item[name]
+    if isinstance(values[0], Size):
+        # size() is defined for strings, binary, sets, lists and maps, not numbers
+        if isinstance(actual, Decimal):
+            return False
+        actual = Decimal(len(actual.encode('utf-8') if isinstance(actual, str) else actual))
+    try:
+        if operator in _COMPARISONS:
+            return _COMPARISONS[operator](actual, values[1])
+        if operator == 'BETWEEN':
+            return values[1] <= actual <= values[2]
+        if operator == 'IN':
+            return actual in values[1]
+        if operator == 'begins_with':
+            return isinstance(actual, str) and actual.startswith(values[1])
+        if operator == 'contains':
+            return values[1] in actual
+        if operator == 'attribute_type':
+            return _type_code(actual) == values[1]
+    except TypeError:
+        # DynamoDB treats comparisons between mismatched types as false
+        return False
+    # Rejected like DynamoDB rejects an expression it cannot parse
+    raise _client_error('ValidationException', f'Invalid ConditionExpression: unsupported operator {operator}',
+                        operation)
+
+
+def _split_top_level(text):
+    """Split on commas that are not inside parentheses"""
+    parts, depth, current = [], 0, ''
+    for char in text:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        if char == ',' and depth == 0:
+            parts.append(current.strip())
+            current = ''
+        else:
+            current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def _find_top_level_operator(text):
+    """Index of a + or - outside parentheses, or None"""
+    depth = 0
+    for index, char in enumerate(text):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char in '+-' and depth == 0:
+            return index
+    return None
+
+
+# DynamoDB stops a Scan/Query page once it has read 1 MB of data
+MAX_PAGE_BYTES = 1024 * 1024
+
+
+def _item_size(item):
+    """Approximate DynamoDB item size: attribute names plus value lengths"""
+    return sum(len(name) + len(str(value)) for name, value in item.items())
+
+
+class MemoryItemStore:
+    """Items kept in a dict with a sorted key list for ordered scans"""
+
+    def __init__(self):
+        self._items = {}
+        self._keys = []
+
+    def transaction(self):
+        """Nothing to do: the owning table's lock already makes read-modify-write atomic"""
+        return contextlib.nullcontext()
+
+    def get(self, key):
+        return self._items.get(key)
+
+    def put(self, key, item):
+        if key not in self._items:
+            bisect.insort(self._keys, key)
+        self._items[key] = item
+
+    def delete(self, key):
+        if self._items.pop(key, None) is not None:
+            del self._keys[bisect.bisect_left(self._keys, key)]
+
+    def scan_from(self, after=None):
+        """Yield items in key order, starting just after `after`"""
+        start = bisect.bisect_right(self._keys, after) if after is not None else 0
+        for key in self._keys[start:]:
+            item = self._items.get(key)
+            if item is not None:
+                yield item
+
+    def values(self):
+        return list(self._items.values())
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SQLiteItemStore:
+    """Items persisted to a SQLite file as DynamoDB-JSON, ordered by key"""
+
+    def __init__(self, path, table_name):
+        self.table_name = re.sub(r'\W', '_', table_name)
+        # Threads are serialized by the owning table's lock; other processes by transaction()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                           timeout=SQLITE_BUSY_TIMEOUT_SECONDS)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            f'CREATE TABLE IF NOT EXISTS "{self.table_name}" (pk TEXT PRIMARY KEY, body TEXT NOT NULL)'
+        )
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Hold the database write lock so a read-check-write is atomic across processes.
+
+        BEGIN IMMEDIATE takes the lock before the read, so another process cannot
+        change the item between the condition check and the write; anything raised
+        inside (e.g. a failed condition) rolls back.
+        """
+        self._connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self._connection.execute('ROLLBACK')
+            raise
+        self._connection.execute('COMMIT')
+
+    def _encode(self, item):
+        return json.dumps({key: _serializer.serialize(value) for key, value in item.items()})
+
+    def _decode(self, body):
+        return {key: _deserializer.deserialize(value) for key, value in json.loads(body).items()}
+
+    def get(self, key):
+        row = self._connection.execute(
+            f'SELECT body FROM "{self.table_name}" WHERE pk = ?', (key,)
+        ).fetchone()
+        return self._decode(row[0]) if row else None
+
+    def put(self, key, item):
+        self._connection.execute(
+            f'INSERT OR REPLACE INTO "{self.table_name}" (pk, body) VALUES (?, ?)', (key, self._encode(item))
+        )
+
+    def delete(self, key):
+        self._connection.execute(f'DELETE FROM "{self.table_name}" WHERE pk = ?', (key,))
+
+    def scan_from(self, after=None):
+        """Yield items in key order, starting just after `after`"""
+        if after is None:
+            rows = self._connection.execute(f'SELECT body FROM "{self.table_name}" ORDER BY pk')
+        else:
+            rows = self._connection.execute(
+                f'SELECT body FROM "{self.table_name}" WHERE pk > ? ORDER BY pk', (after,)
+            )
+        for row in rows:
+            yield self._decode(row[0])
+
+    def values(self):
+        return list(self.scan_from())
+
+    def __len__(self):
+        return self._connection.execute(f'SELECT COUNT(*) FROM "{self.table_name}"').fetchone()[0]
+
+
+class LocalTable:
+    """A thread-safe, local stand-in for a boto3 DynamoDB Table.
+
+    It implements the subset of the Table API the inventory uses: get/put/
+    update/delete_item with ConditionExpression and ReturnValues, scan and
+    query pages (Limit, the 1 MB page cap, ExclusiveStartKey/LastEvaluatedKey,
+    FilterExpression, ProjectionExpression, Segment/TotalSegments) and queries
+    against global secondary indexes. Condition arguments must be
+    boto3.dynamodb.conditions objects, not expression strings. Items live in
+    `store` (MemoryItemStore by default).
+    """
+
+    def __init__(self, key_name='batch_id', indexes=None, name='InventoryBatches', store=None):
+        self.name = name
+        self.key_name = key_name
+        # {index_name: (partition_key, sort_key)}
+        self.indexes = dict(indexes or {})
+        self._items = store if store is not None else MemoryItemStore()
+        self._lock = threading.RLock()
+
+    def _key_of(self, key, operation='GetItem'):
+        if set(key) != {self.key_name}:
+            raise _client_error('ValidationException', 'The provided key element does not match the schema', operation)
+        return key[self.key_name]
+
+    def _check_condition(self, condition, existing, operation):
+        if condition is not None and not evaluate_condition(condition, existing or {}, operation):
+            raise _client_error('ConditionalCheckFailedException', 'The conditional request failed', operation)
+
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, **kwargs):
+        with self._lock:
+            item = self._items.get(self._key_of(Key))
+            if item is None:
+                return {}
+            return {'Item': self._project(item, ProjectionExpression, ExpressionAttributeNames)}
+
+    def put_item(self, Item, ConditionExpression=None, ReturnValues='NONE', **kwargs):
+        item = _normalize(Item)
+        if self.key_name not in item:
+            raise _client_error('ValidationException', 'Missing the key in the item', 'PutItem')
+        with self._lock, self._items.transaction():
+            existing = self._items.get(item[self.key_name])
+            self._check_condition(ConditionExpression, existing, 'PutItem')
+            self._items.put(item[self.key_name], item)
+        if ReturnValues == 'ALL_OLD' and existing is not None:
+            return {'Attributes': copy.deepcopy(existing)}
+        return {}
+
+    def delete_item(self, Key, ConditionExpression=None, ReturnValues='NONE', **kwargs):
+        with self._lock, self._items.transaction():
+            key = self._key_of(Key, 'DeleteItem')
+            existing = self._items.get(key)
+            self._check_condition(ConditionExpression, existing, 'DeleteItem')
+            self._items.delete(key)
+        if ReturnValues == 'ALL_OLD' and existing is not None:
+            return {'Attributes': copy.deepcopy(existing)}
+        return {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ConditionExpression=None,
+                    ReturnValues='NONE', **kwargs):
+        names = ExpressionAttributeNames or {}
+        values = _normalize(ExpressionAttributeValues or {})
+        with self._lock, self._items.transaction():
+            key = self._key_of(Key, 'UpdateItem')
+            existing = self._items.get(key)
+            self._check_condition(ConditionExpression, existing, 'UpdateItem')
+
+            item = copy.deepcopy(existing) if existing else dict(Key)
+            self._apply_update(item, UpdateExpression, names, values)
+            self._items.put(key, item)
+
+        if ReturnValues == 'ALL_NEW':
+            return {'Attributes': copy.deepcopy(item)}
+        if ReturnValues == 'ALL_OLD' and existing is not None:
+            return {'Attributes': copy.deepcopy(existing)}
+        return {}
+
+    def _apply_update(self, item, expression, names, values):
+        """Apply SET/REMOVE/ADD clauses of an UpdateExpression to item in place"""
+        def name(token):
+            return names.get(token, token)
+
+        def operand(token):
+            token = token.strip()
+            match = re.fullmatch(r'if_not_exists\(\s*([^,]+?)\s*,\s*(.+?)\s*\)', token)
+            if match:
+                current = name(match.group(1))
+                return item[current] if current in item else operand(match.group(2))
+            if token.startswith(':'):
+                return values[token]
+            return item[name(token)]
+
+        clauses = re.split(r'\b(SET|REMOVE|ADD|DELETE)\b', expression.strip())
+        for action, body in zip(clauses[1::2], clauses[2::2]):
+            for part in _split_top_level(body):
+                if action == 'SET':
+                    target, value = (piece.strip() for piece in part.split('=', 1))
+                    split = _find_top_level_operator(value)
+                    if split is not None:
+                        left, right = operand(value[:split]), operand(value[split + 1:])
+                        item[name(target)] = left + right if value[split] == '+' else left - right
+                    else:
+                        item[name(target)] = copy.deepcopy(operand(value))
+                elif action == 'REMOVE':
+                    item.pop(name(part), None)
+                elif action == 'ADD':
+                    target, value = part.split(None, 1)
+                    added = operand(value)
+                    if isinstance(added, set):
+                        item[name(target)] = item.get(name(target), set()) | added
+                    else:
+                        item[name(target)] = item.get(name(target), Decimal(0)) + added
+                else:
+                    # DELETE removes elements from a set; an emptied set attribute disappears
+                    target, value = part.split(None, 1)
+                    remaining = item.get(name(target), set()) - operand(value)
+                    if remaining:
+                        item[name(target)] = remaining
+                    else:
+                        item.pop(name(target), None)
+
+    def _project(self, item, projection, names):
+        if not projection:
+            return copy.deepcopy(item)
+        names = names or {}
+        fields = [names.get(field.strip(), field.strip()) for field in projection.split(',')]
+        return {field: copy.deepcopy(item[field]) for field in fields if field in item}
+
+    def _page(self, ordered, key_fields, Limit, FilterExpression, ProjectionExpression,
+              ExpressionAttributeNames, Select, operation):
+        """Read one page from an ordered item iterator, stopping at Limit or the 1 MB cap"""
+        evaluated, size, last, more = 0, 0, None, False
+        matched = []
+        for item in ordered:
+            if (Limit and evaluated >= Limit) or size >= MAX_PAGE_BYTES:
+                more = True
+                break
+            evaluated += 1
+            size += _item_size(item)
+            last = item
+            if FilterExpression is None or evaluate_condition(FilterExpression, item, operation):
+                matched.append(item)
+
+        response = {'Count': len(matched), 'ScannedCount': evaluated}
+        if Select != 'COUNT':
+            response['Items'] = [self._project(item, ProjectionExpression, ExpressionAttributeNames)
+                                 for item in matched]
+        if more:
+            response['LastEvaluatedKey'] = {field: last[field] for field in key_fields if field in last}
+        return response
+
+    def scan(self, Limit=None, ExclusiveStartKey=None, FilterExpression=None, Segment=None,
+             TotalSegments=None, ProjectionExpression=None, ExpressionAttributeNames=None,
+             Select=None, **kwargs):
+        with self._lock:
+            after = ExclusiveStartKey[self.key_name] if ExclusiveStartKey else None
+            ordered = self._items.scan_from(after)
+            if TotalSegments:
+                ordered = (item for item in ordered
+                           if zlib.crc32(str(item[self.key_name]).encode('utf-8')) % TotalSegments == Segment)
+
+            return self._page(ordered, (self.key_name,), Limit, FilterExpression,
+                              ProjectionExpression, ExpressionAttributeNames, Select, 'Scan')
+
+    def query(self, KeyConditionExpression, IndexName=None, Limit=None, ExclusiveStartKey=None,
+              ScanIndexForward=True, FilterExpression=None, ProjectionExpression=None,
+              ExpressionAttributeNames=None, Select=None, **kwargs):
+        if IndexName:
+            if IndexName not in self.indexes:
+                raise _client_error('ValidationException',
+                                    'The table does not have the specified index: ' + IndexName, 'Query')
+            partition_key, range_key = self.indexes[IndexName]
+        else:
+            partition_key, range_key = self.key_name, None
+
+        def sort_key(item):
+            order = (item[range_key], item[self.key_name]) if range_key else (item[self.key_name],)
+            return order if ScanIndexForward else tuple(_Reversed(value) for value in order)
+
+        with self._lock:
+            candidates = [item for item in self._items.values()
+                          if partition_key in item and (range_key is None or range_key in item)
+                          and evaluate_condition(KeyConditionExpression, item)]
+            ordered = sorted(candidates, key=sort_key)
+            if ExclusiveStartKey:
+                position = sort_key(ExclusiveStartKey)
+                ordered = [item for item in ordered if sort_key(item) > position]
+
+            key_fields = tuple(field for field in (self.key_name, partition_key, range_key) if field)
+            return self._page(iter(ordered), key_fields, Limit, FilterExpression,
+                              ProjectionExpression, ExpressionAttributeNames, Select, 'Query')
+
+
+class _Reversed:
+    """Sort wrapper that inverts the ordering of the wrapped value"""
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return self.value > other.value
+
+    def __gt__(self, other):
+        return self.value < other.value
@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from django.conf import settings
+from .aws_clients import get_client
+from .background_flush import BackgroundFlusher
+
+# PutLogEvents limits: events and bytes per call (each event counts its UTF-8
+# message plus 26 bytes), the largest single event, and the time span of one call
+MAX_BATCH_EVENTS = 10000
+MAX_BATCH_BYTES = 1048576
+EVENT_OVERHEAD = 26
+MAX_EVENT_BYTES = 262144 - EVENT_OVERHEAD
+MAX_BATCH_SPAN_MS = 24 * 3600 * 1000
+
+OVERFLOW_POLICIES = ('drop_newest', 'drop_oldest', 'block')
+
+
+def _batches(events, max_events=MAX_BATCH_EVENTS):
+    """Split one stream's (timestamp_ms, message) events into PutLogEvents-sized, time-ordered batches"""
+    batch, size = [], 0
+    for timestamp, message in sorted(events, key=lambda event: event[0]):
+        encoded = message.encode('utf-8')
+        if len(encoded) > MAX_EVENT_BYTES:
+            message = encoded[:MAX_EVENT_BYTES].decode('utf-8', 'ignore')
+            encoded = message.encode('utf-8')
+        event_size = len(encoded) + EVENT_OVERHEAD
+        if batch and (len(batch) >= max_events or size + event_size > MAX_BATCH_BYTES
+                      or timestamp - batch[0]['timestamp'] > MAX_BATCH_SPAN_MS):
+            yield batch
+            batch, size = [], 0
+        batch.append({'timestamp': timestamp, 'message': message})
+        size += event_size
+    if batch:
+        yield batch
+
+
+class LogShipper(BackgroundFlusher):
+    """Ships CloudWatch Logs events from a background thread.
+
+    emit() only appends to an in-memory queue. A daemon thread, started on
+    the first event, wakes every `flush_interval` seconds (or once `flush_at`
+    events are waiting), groups the events per log stream and sends them in
+    as few PutLogEvents calls as the service limits allow. Groups and streams
+    are created once and remembered. When `max_queue` events are waiting, the
+    overflow policy drops the new event, drops the oldest one, or blocks the
+    caller for up to `block_timeout` seconds before dropping.
+    """
+
+    thread_name = 'cloudwatch-logs'
+
+    def __init__(self, flush_interval=5.0, max_queue=10000, overflow='drop_newest', flush_at=None,
+                 block_timeout=1.0, max_batch_events=MAX_BATCH_EVENTS, client_factory=None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f'overflow must be one of {OVERFLOW_POLICIES}')
+        super().__init__(flush_interval)
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.flush_at = flush_at or max(1, min(max_queue // 2, max_batch_events))
+        self.block_timeout = block_timeout
+        self.max_batch_events = max_batch_events
+        self.client_factory = client_factory or (lambda: get_client('logs'))
+        self._events = deque()
+        self._ship_lock = threading.Lock()
+        self._groups = set()
+        self._streams = set()
+        self._stats = {'queued': 0, 'sent': 0, 'dropped': 0, 'failed': 0, 'calls': 0}
+
+    def emit(self, group, stream, message, level='INFO'):
+        """Queue one log event; returns False if the overflow policy dropped it"""
+        event = (group, stream, time.time(), level, message)
+        with self._cond:
+            if len(self._events) >= self.max_queue:
+                if self.overflow == 'block':
+                    self._cond.notify_all()
+                    self._cond.wait_for(lambda: len(self._events) < self.max_queue, timeout=self.block_timeout)
+                if len(self._events) >= self.max_queue:
+                    self._stats['dropped'] += 1
+                    if self.overflow != 'drop_oldest':
+                        return False
+                    self._events.popleft()
+            self._events.append(event)
+            self._stats['queued'] += 1
+            self._started()
+        return True
+
+    def _flush_due(self):
+        return len(self._events) >= self.flush_at
+
+    def flush(self):
+        """Send every queued event now, on the calling thread"""
+        with self._cond:
+            events, self._events = self._events, deque()
+            self._cond.notify_all()
+        if not events:
+            return
+
+        streams = {}
+        for group, stream, created, level, message in events:
+            # Formatting happens here, off the request thread
+            text = f"[{level}] {datetime.utcfromtimestamp(created).isoformat()} - {message}"
+            streams.setdefault((group, stream), []).append((int(created * 1000), text))
+
+        with self._ship_lock:
+            client = self.client_factory()
+            for (group, stream), stream_events in streams.items():
+                for batch in _batches(stream_events, self.max_batch_events):
+                    self._put(client, group, stream, batch)
+
+    def _put(self, client, group, stream, batch):
+        try:
+            if (group, stream) not in self._streams:
+                self._ensure_stream(client, group, stream)
+            try:
+                client.put_log_events(logGroupName=group, logStreamName=stream, logEvents=batch)
+            except client.exceptions.ResourceNotFoundException:
+                # Deleted since we created it: create it again and retry once
+                self._groups.discard(group)
+                self._streams.discard((group, stream))
+                self._ensure_stream(client, group, stream)
+                client.put_log_events(logGroupName=group, logStreamName=stream, logEvents=batch)
+            self._count(calls=1, sent=len(batch))
+        except Exception as e:
+            self._count(failed=len(batch))
+            print(f"Error logging to CloudWatch: {str(e)}")
+
+    def _ensure_stream(self, client, group, stream):
+        if group not in self._groups:
+            try:
+                client.create_log_group(logGroupName=group)
+            except client.exceptions.ResourceAlreadyExistsException:
+                pass
+            self._groups.add(group)
+        try:
+            client.create_log_stream(logGroupName=group, logStreamName=stream)
+        except client.exceptions.ResourceAlreadyExistsException:
+            pass
+        self._streams.add((group, stream))
+
+    def _count(self, **increments):
+        with self._cond:
+            for name, value in increments.items():
+                self._stats[name] += value
+
+    def stats(self):
+        """Queued/sent/dropped/failed event counters, PutLogEvents calls and the current backlog"""
+        with self._cond:
+            return dict(self._stats, pending=len(self._events))
+
+
+log_shipper = LogShipper(
+    flush_interval=settings.CLOUDWATCH_LOG_FLUSH_INTERVAL,
+    max_queue=settings.CLOUDWATCH_LOG_MAX_QUEUE,
+    overflow=settings.CLOUDWATCH_LOG_OVERFLOW
+)
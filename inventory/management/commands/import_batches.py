@@ -0,0 +1,87 @@
+import csv
+import json
+import sys
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from inventory.dynamodb_models import RetriesExhausted, batch_from_record
+from inventory.inventory_cache import CachedDynamoDBInventory
+
+
+class Command(BaseCommand):
+    help = 'Bulk import batches from a CSV or JSON Lines file (use - for stdin)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file, or - to read from stdin')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Input format (defaults to the file extension)')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Records validated and written per round (bounds memory use)')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Concurrent BatchWriteItem calls')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+        if path == '-' and not options['format']:
+            raise CommandError('--format is required when reading from stdin')
+
+        try:
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(str(e))
+        try:
+            self._import(self._records(stream, input_format), options)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+    def _records(self, stream, input_format):
+        """Yield raw records one at a time without reading the whole file"""
+        if input_format == 'csv':
+            for record in csv.DictReader(stream):
+                yield record
+            return
+
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                raise CommandError(f'Invalid JSON on line {line_number}')
+
+    def _import(self, records, options):
+        db = CachedDynamoDBInventory()
+        written, failed, invalid, seen = 0, [], 0, 0
+
+        while True:
+            chunk = list(islice(records, options['chunk_size']))
+            if not chunk:
+                break
+
+            batches = []
+            for record in chunk:
+                seen += 1
+                try:
+                    batches.append(batch_from_record(record))
+                except (ValueError, AttributeError) as e:
+                    invalid += 1
+                    self.stderr.write(f"Skipping record {seen}: {str(e)}")
+
+            if batches:
+                try:
+                    result = db.bulk_create_batches(batches, max_workers=options['workers'])
+                except RetriesExhausted as e:
+                    raise CommandError(f"DynamoDB is throttling after {written} batches were written: {str(e)}")
+                written += result['written']
+                failed.extend(result['failed'])
+            self.stdout.write(f"Processed {seen} records ({written} written)")
+
+        if failed:
+            self.stdout.write(self.style.ERROR(
+                f"{len(failed)} batches were not written: {', '.join(failed[:20])}"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {written} batches ({invalid} invalid, {len(failed)} failed)"
+        ))
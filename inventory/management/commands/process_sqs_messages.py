@@ -1,10 +1,10 @@
-import boto3
 import json
 from django.core.management.base import BaseCommand
 from django.conf import settings
 from django.core.mail import send_mail
 from datetime import datetime
 import time
+from inventory.aws_clients import get_client
 
 class Command(BaseCommand):
     help = 'Process messages from SQS queue for expiry notifications'
@@ -20,12 +20,7 @@ class Command(BaseCommand):
             return
 
         # Initialize SQS client
-        sqs = boto3.client('sqs',
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            aws_session_token=settings.AWS_SESSION_TOKEN,
-            region_name=settings.AWS_S3_REGION_NAME
-        )
+        sqs = get_client('sqs')
         
         queue_url = settings.SQS_QUEUE_URL
         
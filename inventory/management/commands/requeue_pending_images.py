@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from inventory.inventory_cache import CachedDynamoDBInventory
+from inventory.media_jobs import media_worker, queue_image
+
+
+class Command(BaseCommand):
+    help = ("Re-process batch images stuck in 'pending', e.g. after the worker that queued them died. "
+            "Run it periodically (cron); images whose original is missing end up 'failed'.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=15,
+                            help='Minutes an image must have been pending (default 15)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='List the stuck images without processing them')
+
+    def handle(self, *args, **options):
+        db = CachedDynamoDBInventory()
+        stale = db.stale_pending_images(options['older_than'] * 60)
+        for batch_id, image_path in stale:
+            self.stdout.write(f"{batch_id}: {image_path}")
+        if options['dry_run'] or not stale:
+            self.stdout.write(f"{len(stale)} pending images found")
+            return
+
+        for batch_id, image_path in stale:
+            queue_image(db, batch_id, image_path)
+        # Jobs retry and mark the batch 'failed' themselves, so waiting for them is enough
+        media_worker.shutdown(wait=True)
+        self.stdout.write(self.style.SUCCESS(f"Re-processed {len(stale)} pending images"))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from inventory.storage_backends import STATUS_EXPIRY_INDEX, get_storage_backend
+
+
+class Command(BaseCommand):
+    help = 'Create the InventoryBatches table, its status/expiry index and the aggregates table if they are missing'
+
+    def handle(self, *args, **options):
+        backend = get_storage_backend()
+        table_name = backend.table.name
+        result = backend.ensure_table()
+
+        if result == 'created':
+            self.stdout.write(self.style.SUCCESS(
+                f"Created table {table_name} with index {STATUS_EXPIRY_INDEX}"
+            ))
+        elif result == 'index_created':
+            self.stdout.write(self.style.SUCCESS(
+                f"Started building index {STATUS_EXPIRY_INDEX} on {table_name}; "
+                "filtered views are available once it becomes ACTIVE"
+            ))
+        else:
+            self.stdout.write(f"Table {table_name} and index {STATUS_EXPIRY_INDEX} already exist")
+
+        aggregates_table_name = backend.aggregates_table.name
+        if backend.ensure_aggregates_table() == 'created':
+            self.stdout.write(self.style.SUCCESS(
+                f"Created table {aggregates_table_name}; run reconcile_aggregates to build the counters"
+            ))
+        else:
+            self.stdout.write(f"Table {aggregates_table_name} already exists")
@@ -0,0 +1,191 @@
+import atexit
+import multiprocessing
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from django.conf import settings
+from .aws_clients import get_client
+from .cloudwatch_utils import cloudwatch_manager
+from .dynamodb_models import DynamoDBInventory
+from .image_derivatives import render_image_bytes, upload_derivatives, upload_token, variant_paths
+
+
+class MediaWorker:
+    """Bounded background executor for product image work.
+
+    Jobs run on a small thread pool, since they mostly wait on S3, and hand
+    Pillow rendering to a process pool so it does not hold the GIL of the
+    web process (cpu_workers=0 renders on the job's thread instead). At most
+    `max_pending` jobs are queued or running; submit() blocks beyond that.
+    A failing job is retried with jittered exponential backoff and then
+    handed to its on_failure callback. Nothing starts until the first
+    submit, and queued jobs are drained when the process exits.
+    """
+
+    def __init__(self, io_workers=4, cpu_workers=2, max_pending=100, retries=3, backoff=0.5):
+        self.io_workers = io_workers
+        self.cpu_workers = cpu_workers
+        self.retries = retries
+        self.backoff = backoff
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._io = None
+        self._cpu = None
+        self._closed = False
+
+    def _executor(self):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('Media worker has been shut down')
+            if self._io is None:
+                self._io = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix='media')
+                if self.cpu_workers:
+                    # spawn, not fork: forking a threaded web process can copy held locks
+                    self._cpu = ProcessPoolExecutor(
+                        max_workers=self.cpu_workers, mp_context=multiprocessing.get_context('spawn')
+                    )
+                atexit.register(self.shutdown)
+            return self._io
+
+    def submit(self, job, *args, on_failure=None):
+        """Run job(*args) in the background, retrying it; on_failure(*args) runs if every attempt fails"""
+        executor = self._executor()
+        self._slots.acquire()
+        try:
+            future = executor.submit(self._run, job, args, on_failure)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _run(self, job, args, on_failure):
+        for attempt in range(self.retries + 1):
+            try:
+                return job(*args)
+            except Exception as e:
+                if attempt == self.retries:
+                    print(f"Media job {job.__name__} failed after {attempt + 1} attempts: {str(e)}")
+                    break
+                print(f"Media job {job.__name__} failed, retrying: {str(e)}")
+                time.sleep(self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+        if on_failure is not None:
+            try:
+                on_failure(*args)
+            except Exception as e:
+                print(f"Error handling failed media job {job.__name__}: {str(e)}")
+
+    def render(self, data):
+        """Thumbnails for raw image bytes, rendered in the process pool when there is one"""
+        render_args = (data, settings.PRODUCT_IMAGE_SIZES, settings.PRODUCT_IMAGE_FORMATS,
+                       settings.PRODUCT_IMAGE_QUALITY)
+        if self._cpu is not None:
+            try:
+                return self._cpu.submit(render_image_bytes, *render_args).result()
+            except RuntimeError:
+                # The pool is broken or, during interpreter shutdown, refuses new work; render here instead
+                pass
+        return render_image_bytes(*render_args)
+
+    def shutdown(self, wait=True):
+        """Stop accepting jobs and, with wait, block until every queued job has finished"""
+        with self._lock:
+            self._closed = True
+            io, cpu = self._io, self._cpu
+        if io is not None:
+            io.shutdown(wait=wait)
+        if cpu is not None:
+            cpu.shutdown(wait=wait)
+
+
+media_worker = MediaWorker(
+    io_workers=settings.MEDIA_IO_WORKERS,
+    cpu_workers=settings.MEDIA_CPU_WORKERS,
+    max_pending=settings.MEDIA_MAX_PENDING_JOBS,
+    retries=settings.MEDIA_JOB_RETRIES
+)
+
+
+def current_image(db, batch_id):
+    """The image path the batch points at now, read past any cache; None if it is gone or has none"""
+    batch = DynamoDBInventory.get_batch(db, batch_id, fields=['image_url'])
+    return batch.image_url if batch else None
+
+
+def discard_unused(db, batch_id, paths):
+    """Delete objects a job wrote for an image its batch no longer uses.
+
+    Thumbnail keys carry their upload's token, so no other image's job writes
+    them; only the original is kept if the batch (again) points at its key.
+    """
+    in_use = current_image(db, batch_id)
+    unused = [path for path in paths if path != in_use]
+    if unused:
+        delete_media(unused)
+
+
+def process_image(db, batch_id, image_path):
+    """Build the thumbnails of an uploaded original (media/<image_path>) and mark the batch ready"""
+    if current_image(db, batch_id) != image_path:
+        # Deleted or re-imaged while the job waited: drop the original instead of rendering it
+        print(f"Batch {batch_id} no longer uses {image_path}; discarding it")
+        discard_unused(db, batch_id, [image_path])
+        return
+
+    data = get_client('s3').get_object(
+        Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=f'media/{image_path}'
+    )['Body'].read()
+
+    variants = upload_derivatives(image_path, upload_token(image_path, data), media_worker.render(data))
+    if not db.set_image_state(batch_id, image_path, 'ready', image_variants=variants):
+        # It moved on while we rendered; the conditional write kept it intact, so clean up after ourselves
+        print(f"Batch {batch_id} no longer uses {image_path}; discarding it")
+        discard_unused(db, batch_id, [image_path] + variant_paths(variants))
+        return
+
+    cloudwatch_manager.log_event(
+        'FoodInventory/S3',
+        'uploads',
+        f"Image processed: {image_path} ({len(data)} bytes, {len(variants)} sizes)"
+    )
+
+
+def mark_image_failed(db, batch_id, image_path):
+    db.set_image_state(batch_id, image_path, 'failed')
+    cloudwatch_manager.log_event(
+        'FoodInventory/S3',
+        'errors',
+        f"Image processing failed: {image_path}",
+        'ERROR'
+    )
+
+
+def queue_image(db, batch_id, image_path):
+    """Process a batch image in the background.
+
+    The original must already be in S3 and the batch should say
+    image_state='pending'. Only the key is queued, so a job lost with its
+    process is picked up again by the requeue_pending_images command.
+    """
+    return media_worker.submit(process_image, db, batch_id, image_path, on_failure=mark_image_failed)
+
+
+def delete_media(paths):
+    """Delete media/<path> for every path with one DeleteObjects call"""
+    get_client('s3').delete_objects(
+        Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+        Delete={'Objects': [{'Key': f'media/{path}'} for path in paths], 'Quiet': True}
+    )
+    cloudwatch_manager.log_event(
+        'FoodInventory/S3',
+        'deletes',
+        f"Image deleted: {paths[0]} ({len(paths)} objects)"
+    )
+
+
+def queue_delete(*paths):
+    """Delete media objects in the background; empty paths are skipped"""
+    paths = [path for path in paths if path]
+    if paths:
+        return media_worker.submit(delete_media, paths)
@@ -0,0 +1,103 @@
+import sys
+import threading
+from django.conf import settings
+from .emf import MAX_VALUES_PER_METRIC, emf_document
+from .metrics_buffer import metrics_buffer
+
+
+class ApiMetricSink:
+    """Publishes through the PutMetricData API, aggregated and batched by metrics_buffer"""
+
+    name = 'api'
+
+    def put(self, metric_name, value, unit='Count', namespace='FoodInventory', dimensions=None, count=1):
+        return metrics_buffer.add(metric_name, value, unit, namespace, dimensions, count=count)
+
+    def stats(self):
+        return dict(metrics_buffer.stats(), sink=self.name)
+
+
+class EmfMetricSink:
+    """Writes each point as an Embedded Metric Format JSON line.
+
+    Lines go to stdout (path=None) or are appended to `path`, line-buffered
+    so several worker processes can share one file. Whatever ships that
+    output to CloudWatch Logs (the Lambda runtime, the CloudWatch agent)
+    turns the lines into metrics, so emitting costs one local write. EMF has
+    no per-value counts, so a point observed `count` times is written as that
+    many values, up to MAX_VALUES_PER_METRIC per line.
+    """
+
+    name = 'emf'
+
+    def __init__(self, path=None, stream=None):
+        self.path = path
+        self._stream = stream
+        self._lock = threading.Lock()
+        self._lines = 0
+
+    @property
+    def stream(self):
+        # The file is opened on first use so importing settings never creates it
+        if self._stream is None:
+            self._stream = open(self.path, 'a', buffering=1) if self.path else sys.stdout
+        return self._stream
+
+    def put(self, metric_name, value, unit='Count', namespace='FoodInventory', dimensions=None, count=1):
+        dimensions = {d['Name']: d['Value'] for d in dimensions} if dimensions else None
+        if count == 1:
+            lines = [emf_document(namespace, {metric_name: (value, unit)}, dimensions)]
+        else:
+            lines = [
+                emf_document(namespace, {metric_name: ([value] * min(MAX_VALUES_PER_METRIC, count - sent), unit)},
+                             dimensions)
+                for sent in range(0, count, MAX_VALUES_PER_METRIC)
+            ]
+        try:
+            with self._lock:
+                for line in lines:
+                    self.stream.write(line + '\n')
+                self._lines += len(lines)
+        except Exception as e:
+            print(f"Error writing EMF metric {metric_name}: {str(e)}")
+            return False
+        return True
+
+    def stats(self):
+        return {'sink': self.name, 'lines': self._lines}
+
+
+class NullMetricSink:
+    """Discards every metric, e.g. for local development without AWS"""
+
+    name = 'none'
+
+    def put(self, metric_name, value, unit='Count', namespace='FoodInventory', dimensions=None, count=1):
+        return True
+
+    def stats(self):
+        return {'sink': self.name}
+
+
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+
+def get_metric_sink(name=None):
+    """Return the shared metric sink named by `name` or CLOUDWATCH_METRICS_SINK ('api', 'emf' or 'none')"""
+    name = name or settings.CLOUDWATCH_METRICS_SINK
+    sink = _sinks.get(name)
+    if sink is None:
+        with _sinks_lock:
+            sink = _sinks.get(name)
+            if sink is None:
+                if name == 'api':
+                    sink = ApiMetricSink()
+                elif name == 'emf':
+                    sink = EmfMetricSink(path=settings.CLOUDWATCH_EMF_PATH or None)
+                elif name == 'none':
+                    sink = NullMetricSink()
+                else:
+                    raise ValueError(f'Unknown metric sink: {name}')
+                _sinks[name] = sink
+    return sink
@@ -0,0 +1,157 @@
+import time
+from datetime import datetime
+from django.conf import settings
+from .aws_clients import get_client
+from .background_flush import BackgroundFlusher
+
+# PutMetricData limits: datums per call, distinct values per Values/Counts datum,
+# and the request size (estimated from the form-encoded datum and value lengths)
+MAX_DATUMS_PER_CALL = 1000
+MAX_VALUES_PER_DATUM = 150
+MAX_PAYLOAD_BYTES = 1000000
+DATUM_BYTES = 400
+VALUE_BYTES = 80
+
+
+class MetricAggregate:
+    """All points recorded for one metric series in one time bucket.
+
+    Distinct values are kept with their counts, so the datum still carries
+    the distribution (percentiles work); past MAX_VALUES_PER_DATUM distinct
+    values only the statistic set (count, sum, min, max) remains.
+    """
+
+    __slots__ = ('counts', 'count', 'total', 'minimum', 'maximum')
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.minimum = float('inf')
+        self.maximum = float('-inf')
+
+    def add(self, value, count=1):
+        self.count += count
+        self.total += value * count
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+        if self.counts is not None:
+            self.counts[value] = self.counts.get(value, 0) + count
+            if len(self.counts) > MAX_VALUES_PER_DATUM:
+                self.counts = None
+
+    def datum_values(self):
+        """The Values/Counts or StatisticValues part of a MetricDatum"""
+        if self.counts is not None:
+            return {'Values': list(self.counts), 'Counts': list(self.counts.values())}
+        return {'StatisticValues': {
+            'SampleCount': self.count,
+            'Sum': self.total,
+            'Minimum': self.minimum,
+            'Maximum': self.maximum,
+        }}
+
+
+class MetricsBuffer(BackgroundFlusher):
+    """Aggregates metric points in memory and publishes them in batches.
+
+    add() folds a point into the aggregate for its namespace, name,
+    dimensions, unit and `resolution`-second bucket. A daemon thread, started
+    with the first point, sends everything every `flush_interval` seconds as
+    PutMetricData calls of up to 1000 datums each, so the call count depends
+    on the number of series rather than on traffic. At most `max_series`
+    aggregates are held; points for new series beyond that are dropped.
+    """
+
+    thread_name = 'cloudwatch-metrics'
+
+    def __init__(self, flush_interval=60.0, resolution=60, max_series=10000, client_factory=None):
+        super().__init__(flush_interval)
+        self.resolution = resolution
+        self.max_series = max_series
+        self.client_factory = client_factory or (lambda: get_client('cloudwatch'))
+        self._aggregates = {}
+        self._stats = {'points': 0, 'dropped': 0, 'datums': 0, 'calls': 0, 'failed': 0}
+
+    def add(self, metric_name, value, unit='Count', namespace='FoodInventory', dimensions=None,
+            timestamp=None, count=1):
+        """Record `count` observations of `value`; returns False if the point was dropped"""
+        bucket = int((timestamp or time.time()) // self.resolution) * self.resolution
+        dimension_key = tuple((d['Name'], d['Value']) for d in dimensions) if dimensions else ()
+        key = (namespace, metric_name, dimension_key, unit, bucket)
+        with self._cond:
+            aggregate = self._aggregates.get(key)
+            if aggregate is None:
+                if len(self._aggregates) >= self.max_series:
+                    self._stats['dropped'] += 1
+                    return False
+                aggregate = self._aggregates[key] = MetricAggregate()
+            aggregate.add(value, count)
+            self._stats['points'] += 1
+            self._started()
+        return True
+
+    def _flush_due(self):
+        # Flush early rather than start dropping new series
+        return len(self._aggregates) >= self.max_series // 2
+
+    def flush(self):
+        """Publish every buffered aggregate now, on the calling thread"""
+        with self._cond:
+            aggregates, self._aggregates = self._aggregates, {}
+        if not aggregates:
+            return
+
+        namespaces = {}
+        for (namespace, metric_name, dimension_key, unit, bucket), aggregate in aggregates.items():
+            datum = {
+                'MetricName': metric_name,
+                'Unit': unit,
+                'Timestamp': datetime.utcfromtimestamp(bucket),
+            }
+            if dimension_key:
+                datum['Dimensions'] = [{'Name': name, 'Value': value} for name, value in dimension_key]
+            if self.resolution < 60:
+                datum['StorageResolution'] = 1
+            datum.update(aggregate.datum_values())
+            namespaces.setdefault(namespace, []).append(datum)
+
+        client = self.client_factory()
+        for namespace, datums in namespaces.items():
+            for chunk in _chunks(datums):
+                try:
+                    client.put_metric_data(Namespace=namespace, MetricData=chunk)
+                    self._count(calls=1, datums=len(chunk))
+                except Exception as e:
+                    self._count(failed=len(chunk))
+                    print(f"Error putting {len(chunk)} metrics to {namespace}: {str(e)}")
+
+    def _count(self, **increments):
+        with self._cond:
+            for name, value in increments.items():
+                self._stats[name] += value
+
+    def stats(self):
+        """Points recorded and dropped, datums and PutMetricData calls sent, failures and open series"""
+        with self._cond:
+            return dict(self._stats, series=len(self._aggregates))
+
+
+def _chunks(datums):
+    """Split datums into PutMetricData-sized lists"""
+    chunk, size = [], 0
+    for datum in datums:
+        datum_size = DATUM_BYTES + VALUE_BYTES * len(datum.get('Values', ()))
+        if chunk and (len(chunk) >= MAX_DATUMS_PER_CALL or size + datum_size > MAX_PAYLOAD_BYTES):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(datum)
+        size += datum_size
+    if chunk:
+        yield chunk
+
+
+metrics_buffer = MetricsBuffer(
+    flush_interval=settings.CLOUDWATCH_METRICS_FLUSH_INTERVAL,
+    max_series=settings.CLOUDWATCH_METRICS_MAX_SERIES
+)
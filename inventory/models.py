@@ -1,19 +1,11 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
+from .presigned_urls import presigned_media_url
 from .expiry_tracker import ExpiryTracker
-import boto3
 import uuid
 import os
 
-def get_s3_client():
-    return boto3.client('s3',
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-        aws_session_token=settings.AWS_SESSION_TOKEN,
-        region_name=settings.AWS_S3_REGION_NAME
-    )
-
 class User(AbstractUser):
     ROLE_CHOICES = [
         ('manufacturer', 'Manufacturer'),
@@ -77,20 +69,7 @@ class InventoryBatch(models.Model):
     def image_url(self):
         """Get a pre-signed URL for the image"""
         if self.image:
-            try:
-                s3_client = get_s3_client()
-                url = s3_client.generate_presigned_url(
-                    'get_object',
-                    Params={
-                        'Bucket': settings.AWS_STORAGE_BUCKET_NAME,
-                        'Key': f'media/{self.image}'
-                    },
-                    ExpiresIn=3600  # URL valid for 1 hour
-                )
-                return url
-            except Exception as e:
-                print(f"Error generating pre-signed URL: {str(e)}")
-                return None
+            return presigned_media_url(str(self.image))
         return None
 
     def __str__(self):
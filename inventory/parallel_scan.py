@@ -0,0 +1,106 @@
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from django.conf import settings
+
+POOL_THREAD_PREFIX = 'dynamodb'
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """The process-wide DynamoDB worker pool, created on first use.
+
+    Scans and batch reads/writes all run on these long-lived threads, so each
+    builds its thread's boto3 resource once (see get_thread_resource) instead
+    of once per call as a fresh executor per call would.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=settings.DYNAMODB_POOL_THREADS,
+                                       thread_name_prefix=POOL_THREAD_PREFIX)
+        return _pool
+
+
+def run_bounded(fn, items, max_workers):
+    """fn(item) for every item on the shared pool, at most max_workers at a time; results in item order.
+
+    The first exception is raised once the calls already running finish;
+    the remaining items are not started. Calls made from a pool thread run
+    inline, since waiting on the pool from inside it could deadlock.
+    """
+    items = list(items)
+    if len(items) <= 1 or max_workers <= 1 or threading.current_thread().name.startswith(POOL_THREAD_PREFIX):
+        return [fn(item) for item in items]
+
+    pool = get_pool()
+    results = [None] * len(items)
+    running, next_index, error = {}, 0, None
+    while running or next_index < len(items):
+        while next_index < len(items) and len(running) < max_workers:
+            running[pool.submit(fn, items[next_index])] = next_index
+            next_index += 1
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            index = running.pop(future)
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                error = error or e
+                next_index = len(items)
+    if error is not None:
+        raise error
+    return results
+
+
+class ParallelScanner:
+    """Run a full-table DynamoDB scan as Segment/TotalSegments on the shared worker pool.
+
+    `table` is a Table, or a zero-argument callable returning the Table to use
+    on the calling thread (boto3 resources must not be shared across threads).
+    """
+
+    def __init__(self, table, total_segments=4, max_workers=None):
+        if total_segments < 1:
+            raise ValueError('total_segments must be at least 1')
+        self._table = table
+        self.total_segments = total_segments
+        self.max_workers = max_workers or total_segments
+
+    def scan_segment(self, segment, callback=None, **scan_kwargs):
+        """Scan one segment page by page, streaming pages to callback or collecting them"""
+        collected = []
+        scan_kwargs = dict(scan_kwargs)
+        table = self._table() if callable(self._table) else self._table
+        if self.total_segments > 1:
+            scan_kwargs['Segment'] = segment
+            scan_kwargs['TotalSegments'] = self.total_segments
+
+        while True:
+            response = table.scan(**scan_kwargs)
+            items = response.get('Items', [])
+            if callback:
+                callback(segment, items)
+            else:
+                collected.extend(items)
+
+            start_key = response.get('LastEvaluatedKey')
+            if not start_key:
+                return collected
+            scan_kwargs['ExclusiveStartKey'] = start_key
+
+    def scan(self, callback=None, **scan_kwargs):
+        """Scan every segment concurrently.
+
+        Without a callback the items are returned merged in segment order.
+        With a callback, callback(segment, items) is called once per page from
+        the worker threads and nothing is materialized; callbacks for different
+        segments may run at the same time.
+        """
+        if self.total_segments == 1:
+            return self.scan_segment(0, callback, **scan_kwargs)
+
+        pages = run_bounded(lambda segment: self.scan_segment(segment, callback, **scan_kwargs),
+                            range(self.total_segments), self.max_workers)
+        return [item for page in pages for item in page]
@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from .aws_clients import get_client, get_credentials
+from .s3_presigner import S3BatchPresigner
+
+
+class PresignedUrlCache:
+    """Bounded LRU of pre-signed GET URLs.
+
+    A URL is reused until `margin` seconds before it expires, so callers never
+    hand out a link that dies moments later. Entries are keyed by bucket,
+    object key and expiry window; the least recently used entry is evicted
+    once `max_entries` is reached.
+    """
+
+    def __init__(self, max_entries=10000, margin=300, clock=time.time):
+        self.max_entries = max_entries
+        self.margin = margin
+        self.clock = clock
+        self._urls = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, bucket, key, expires_in, sign):
+        """Return a cached URL for the object, calling sign() for a fresh one when needed"""
+        cache_key = (bucket, key, expires_in)
+        now = self.clock()
+        with self._lock:
+            entry = self._urls.get(cache_key)
+            if entry is not None and now < entry[1]:
+                self._urls.move_to_end(cache_key)
+                self._stats['hits'] += 1
+                return entry[0]
+            self._stats['misses'] += 1
+
+        url = sign()
+        if url is not None:
+            self._store({cache_key: url}, now + expires_in - self.margin)
+        return url
+
+    def get_many(self, bucket, keys, expires_in, sign_many):
+        """Return {key: url} for many objects, signing all misses with one sign_many(missing_keys) call"""
+        now = self.clock()
+        urls, missing = {}, []
+        with self._lock:
+            for key in keys:
+                entry = self._urls.get((bucket, key, expires_in))
+                if entry is not None and now < entry[1]:
+                    self._urls.move_to_end((bucket, key, expires_in))
+                    urls[key] = entry[0]
+                else:
+                    missing.append(key)
+            self._stats['hits'] += len(urls)
+            self._stats['misses'] += len(missing)
+
+        if missing:
+            signed = {key: url for key, url in sign_many(missing).items() if url is not None}
+            self._store({(bucket, key, expires_in): url for key, url in signed.items()},
+                        now + expires_in - self.margin)
+            urls.update(signed)
+        return urls
+
+    def _store(self, urls, reuse_until):
+        with self._lock:
+            for cache_key, url in urls.items():
+                self._urls[cache_key] = (url, reuse_until)
+                self._urls.move_to_end(cache_key)
+            while len(self._urls) > self.max_entries:
+                self._urls.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._urls.clear()
+
+    def stats(self):
+        """Return hit/miss/eviction counters, the current size and the hit ratio"""
+        with self._lock:
+            stats = dict(self._stats, size=len(self._urls))
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+presigned_url_cache = PresignedUrlCache(
+    max_entries=settings.PRESIGNED_URL_CACHE_MAX_ENTRIES,
+    margin=settings.PRESIGNED_URL_CACHE_MARGIN
+)
+
+
+_presigners = {}
+_presigners_lock = threading.Lock()
+
+
+def get_batch_presigner(bucket):
+    """Shared S3BatchPresigner for `bucket`, built from the registry's S3 client and credentials.
+
+    reset_clients() replaces the client along with the session, so a
+    presigner holding another client is rebuilt with the new credentials.
+    """
+    client = get_client('s3')
+    presigner = _presigners.get(bucket)
+    if presigner is None or presigner.client is not client:
+        with _presigners_lock:
+            presigner = _presigners.get(bucket)
+            if presigner is None or presigner.client is not client:
+                presigner = _presigners[bucket] = S3BatchPresigner(client, bucket, get_credentials())
+    return presigner
+
+
+def presigned_media_urls(image_paths, expires_in=None):
+    """Pre-signed GET URLs for many media/<image_path> objects as {image_path: url}.
+
+    Cache misses are signed together by the batch presigner; if it cannot be
+    used (no credentials, non-SigV4 client) they fall back to one
+    generate_presigned_url call each.
+    """
+    image_paths = [path for path in dict.fromkeys(image_paths) if path]
+    if not image_paths:
+        return {}
+    expires_in = expires_in or settings.PRESIGNED_URL_EXPIRES_IN
+    bucket = settings.AWS_STORAGE_BUCKET_NAME
+    keys = {f'media/{path}': path for path in image_paths}
+
+    def sign_many(missing):
+        try:
+            return get_batch_presigner(bucket).presign(missing, expires_in)
+        except Exception as e:
+            print(f"Error batch signing URLs, signing one by one: {str(e)}")
+            return {key: _sign(bucket, key, expires_in) for key in missing}
+
+    urls = presigned_url_cache.get_many(bucket, list(keys), expires_in, sign_many)
+    return {keys[key]: url for key, url in urls.items()}
+
+
+def presigned_media_url(image_path, expires_in=None):
+    """Pre-signed GET URL for media/<image_path>, served from presigned_url_cache when still fresh"""
+    if not image_path:
+        return None
+    expires_in = expires_in or settings.PRESIGNED_URL_EXPIRES_IN
+    bucket = settings.AWS_STORAGE_BUCKET_NAME
+    key = f'media/{image_path}'
+    return presigned_url_cache.get(bucket, key, expires_in, lambda: _sign(bucket, key, expires_in))
+
+
+def _sign(bucket, key, expires_in):
+    """One URL through botocore's generate_presigned_url; None on failure"""
+    try:
+        return get_client('s3').generate_presigned_url(
+            'get_object',
+            Params={'Bucket': bucket, 'Key': key},
+            ExpiresIn=expires_in
+        )
+    except Exception as e:
+        print(f"Error generating pre-signed URL: {str(e)}")
+        return None
@@ -0,0 +1,108 @@
+import hashlib
+import hmac
+from datetime import datetime
+from urllib.parse import quote, urlsplit
+
+ALGORITHM = 'AWS4-HMAC-SHA256'
+UNSIGNED_PAYLOAD = 'UNSIGNED-PAYLOAD'
+PROBE_KEY = 'presign-probe'
+
+
+def _hmac(key, message):
+    return hmac.new(key, message.encode('utf-8'), hashlib.sha256).digest()
+
+
+def _quote_param(value):
+    # Matches botocore.utils.percent_encode: keys and values use '-_~' as the only extra safe chars
+    return quote(str(value).encode('utf-8'), safe='-_~')
+
+
+class S3BatchPresigner:
+    """Pre-sign many S3 GET URLs for one bucket with SigV4 query-string auth.
+
+    botocore runs its full request pipeline (event hooks, endpoint rules,
+    request serialization) for every URL. This signer asks botocore for one
+    probe URL per bucket to learn the endpoint, then builds every URL from a
+    canonical-request template and a derived signing key that is cached per
+    day, region and secret. The URLs are byte-identical to what
+    client.generate_presigned_url('get_object', ...) returns for an s3v4
+    client at the same timestamp.
+    """
+
+    def __init__(self, client, bucket, credentials):
+        if client.meta.config.signature_version != 's3v4':
+            raise ValueError('S3BatchPresigner requires an s3v4 client')
+        if credentials is None:
+            raise ValueError('No AWS credentials available for signing')
+        self.client = client
+        self.bucket = bucket
+        self.credentials = credentials
+        self.region = client.meta.region_name
+        self._endpoint = None
+        self._signing_keys = {}
+
+    def _endpoint_parts(self):
+        """(scheme://host, host, key path prefix) as botocore resolves them for this bucket"""
+        if self._endpoint is None:
+            url = self.client.generate_presigned_url(
+                'get_object', Params={'Bucket': self.bucket, 'Key': PROBE_KEY}, ExpiresIn=60
+            )
+            parts = urlsplit(url)
+            if not parts.path.endswith('/' + PROBE_KEY):
+                raise ValueError(f'Unexpected presigned URL layout: {url}')
+            self._endpoint = (
+                f'{parts.scheme}://{parts.netloc}',
+                parts.netloc,
+                parts.path[:-len(PROBE_KEY)],
+            )
+        return self._endpoint
+
+    def _signing_key(self, secret_key, date_stamp):
+        """kSigning for the day, derived once and reused for every URL signed that day"""
+        cache_key = (secret_key, date_stamp, self.region)
+        signing_key = self._signing_keys.get(cache_key)
+        if signing_key is None:
+            k_date = _hmac(f'AWS4{secret_key}'.encode('utf-8'), date_stamp)
+            k_region = _hmac(k_date, self.region)
+            k_service = _hmac(k_region, 's3')
+            signing_key = _hmac(k_service, 'aws4_request')
+            # Keys for earlier days (or rotated secrets) are never needed again
+            self._signing_keys = {cache_key: signing_key}
+        return signing_key
+
+    def presign(self, keys, expires_in=3600, now=None):
+        """Return {key: url} for every object key, all signed with one timestamp"""
+        credentials = self.credentials.get_frozen_credentials()
+        base_url, host, path_prefix = self._endpoint_parts()
+
+        now = now or datetime.utcnow()
+        amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+        date_stamp = amz_date[:8]
+        scope = f'{date_stamp}/{self.region}/s3/aws4_request'
+        signing_key = self._signing_key(credentials.secret_key, date_stamp)
+
+        params = [
+            ('X-Amz-Algorithm', ALGORITHM),
+            ('X-Amz-Credential', f'{credentials.access_key}/{scope}'),
+            ('X-Amz-Date', amz_date),
+            ('X-Amz-Expires', expires_in),
+            ('X-Amz-SignedHeaders', 'host'),
+        ]
+        if credentials.token is not None:
+            params.append(('X-Amz-Security-Token', credentials.token))
+        encoded = [(_quote_param(name), _quote_param(value)) for name, value in params]
+        # URL keeps botocore's parameter order; the canonical form is sorted
+        query = '&'.join(f'{name}={value}' for name, value in encoded)
+        canonical_query = '&'.join(f'{name}={value}' for name, value in sorted(encoded))
+
+        request_tail = f'\n{canonical_query}\nhost:{host}\n\nhost\n{UNSIGNED_PAYLOAD}'
+        string_to_sign_head = f'{ALGORITHM}\n{amz_date}\n{scope}\n'
+
+        urls = {}
+        for key in keys:
+            path = path_prefix + quote(key.encode('utf-8'), safe='/~')
+            canonical_request = 'GET\n' + path + request_tail
+            string_to_sign = string_to_sign_head + hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()
+            signature = hmac.new(signing_key, string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+            urls[key] = f'{base_url}{path}?{query}&X-Amz-Signature={signature}'
+        return urls
@@ -1,9 +1,9 @@
-import boto3
 import json
 import threading
 import time
 from django.conf import settings
 from datetime import datetime
+from .aws_clients import get_client
 
 class SQSProcessor(threading.Thread):
     def __init__(self):
@@ -12,12 +12,7 @@ class SQSProcessor(threading.Thread):
         
     def setup_sqs(self):
         """Initialize SQS client"""
-        return boto3.client('sqs',
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            aws_session_token=settings.AWS_SESSION_TOKEN,
-            region_name=settings.AWS_S3_REGION_NAME
-        )
+        return get_client('sqs')
     
     def process_expired_items(self, items):
         """Handle expired items"""
@@ -99,14 +94,16 @@ class SQSProcessor(threading.Thread):
 
 # Global processor instance
 processor = None
+_processor_lock = threading.Lock()
 
 def start_processor():
     """Start the SQS processor"""
     global processor
-    if processor is None:
-        processor = SQSProcessor()
-        processor.start()
-        print("SQS Processor started successfully")
+    with _processor_lock:
+        if processor is None:
+            processor = SQSProcessor()
+            processor.start()
+            print("SQS Processor started successfully")
 
 def stop_processor():
     """Stop the SQS processor"""
@@ -0,0 +1,249 @@
+import threading
+from django.conf import settings
+from .aws_clients import get_thread_resource
+from .local_dynamodb import LocalTable, MemoryItemStore, SQLiteItemStore, _client_error
+
+# Global secondary index keyed on (status, expiry_date) for filtered, expiry-ordered reads
+STATUS_EXPIRY_INDEX = 'StatusExpiryIndex'
+INDEXES = {STATUS_EXPIRY_INDEX: ('status', 'expiry_date')}
+
+# Service limits for the batch APIs
+MAX_BATCH_WRITE_REQUESTS = 25
+MAX_BATCH_GET_KEYS = 100
+
+
+def ensure_inventory_table(dynamodb, table_name):
+    """Create the inventory table and its status/expiry index if they are missing.
+
+    Returns 'created', 'index_created' or 'exists'.
+    """
+    client = dynamodb.meta.client
+    index_definitions = [
+        {'AttributeName': 'status', 'AttributeType': 'S'},
+        {'AttributeName': 'expiry_date', 'AttributeType': 'S'},
+    ]
+    index = {
+        'IndexName': STATUS_EXPIRY_INDEX,
+        'KeySchema': [
+            {'AttributeName': 'status', 'KeyType': 'HASH'},
+            {'AttributeName': 'expiry_date', 'KeyType': 'RANGE'},
+        ],
+        'Projection': {'ProjectionType': 'ALL'},
+    }
+
+    try:
+        description = client.describe_table(TableName=table_name)['Table']
+    except client.exceptions.ResourceNotFoundException:
+        client.create_table(
+            TableName=table_name,
+            KeySchema=[{'AttributeName': 'batch_id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'batch_id', 'AttributeType': 'S'}] + index_definitions,
+            GlobalSecondaryIndexes=[index],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        client.get_waiter('table_exists').wait(TableName=table_name)
+        return 'created'
+
+    existing = {i['IndexName'] for i in description.get('GlobalSecondaryIndexes', [])}
+    if STATUS_EXPIRY_INDEX in existing:
+        return 'exists'
+
+    # Provisioned tables need explicit throughput for the new index
+    if description.get('BillingModeSummary', {}).get('BillingMode') != 'PAY_PER_REQUEST':
+        throughput = description['ProvisionedThroughput']
+        index['ProvisionedThroughput'] = {
+            'ReadCapacityUnits': throughput['ReadCapacityUnits'],
+            'WriteCapacityUnits': throughput['WriteCapacityUnits'],
+        }
+    client.update_table(
+        TableName=table_name,
+        AttributeDefinitions=index_definitions,
+        GlobalSecondaryIndexUpdates=[{'Create': index}]
+    )
+    return 'index_created'
+
+
+def ensure_aggregates_table(dynamodb, table_name):
+    """Create the single-item aggregates table if it is missing. Returns 'created' or 'exists'."""
+    client = dynamodb.meta.client
+    try:
+        client.describe_table(TableName=table_name)
+        return 'exists'
+    except client.exceptions.ResourceNotFoundException:
+        client.create_table(
+            TableName=table_name,
+            KeySchema=[{'AttributeName': 'aggregate_id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'aggregate_id', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        client.get_waiter('table_exists').wait(TableName=table_name)
+        return 'created'
+
+
+class DynamoDBBackend:
+    """The real thing: boto3 DynamoDB resources and tables.
+
+    boto3 resources are not thread-safe, so `dynamodb`, `table` and
+    `aggregates_table` resolve to the calling thread's own objects; all of
+    them share one session and its credentials.
+    """
+
+    name = 'dynamodb'
+
+    def __init__(self, table_name, aggregates_table_name, endpoint_url=None):
+        self.table_name = table_name
+        self.aggregates_table_name = aggregates_table_name
+        self.endpoint_url = endpoint_url
+        self._local = threading.local()
+
+    @property
+    def dynamodb(self):
+        return get_thread_resource('dynamodb', self.endpoint_url)
+
+    def _thread_table(self, table_name):
+        dynamodb = self.dynamodb
+        tables = getattr(self._local, 'tables', None)
+        if tables is None or self._local.dynamodb is not dynamodb:
+            tables = self._local.tables = {}
+            self._local.dynamodb = dynamodb
+        table = tables.get(table_name)
+        if table is None:
+            table = tables[table_name] = dynamodb.Table(table_name)
+        return table
+
+    @property
+    def table(self):
+        return self._thread_table(self.table_name)
+
+    @property
+    def aggregates_table(self):
+        return self._thread_table(self.aggregates_table_name)
+
+    def batch_write_item(self, RequestItems):
+        return self.dynamodb.batch_write_item(RequestItems=RequestItems)
+
+    def batch_get_item(self, RequestItems):
+        return self.dynamodb.batch_get_item(RequestItems=RequestItems)
+
+    def ensure_table(self):
+        return ensure_inventory_table(self.dynamodb, self.table_name)
+
+    def ensure_aggregates_table(self):
+        return ensure_aggregates_table(self.dynamodb, self.aggregates_table_name)
+
+
+class LocalBackend:
+    """Offline backend built on LocalTable, with DynamoDB's batch API semantics.
+
+    Batch calls enforce the 25-request / 100-key limits and reject duplicate
+    keys like DynamoDB does; they never return unprocessed items.
+    """
+
+    name = 'local'
+
+    def __init__(self, table, aggregates_table):
+        self.table = table
+        self.aggregates_table = aggregates_table
+
+    def _table_named(self, table_name, operation):
+        if table_name != self.table.name:
+            raise _client_error('ResourceNotFoundException', f'Requested resource not found: {table_name}', operation)
+        return self.table
+
+    def batch_write_item(self, RequestItems):
+        if sum(len(requests) for requests in RequestItems.values()) > MAX_BATCH_WRITE_REQUESTS:
+            raise _client_error('ValidationException',
+                                'Too many items requested for the BatchWriteItem call', 'BatchWriteItem')
+
+        for table_name, requests in RequestItems.items():
+            table = self._table_named(table_name, 'BatchWriteItem')
+            keys = [
+                request['PutRequest']['Item'][table.key_name] if 'PutRequest' in request
+                else request['DeleteRequest']['Key'][table.key_name]
+                for request in requests
+            ]
+            if len(set(keys)) != len(keys):
+                raise _client_error('ValidationException',
+                                    'Provided list of item keys contains duplicates', 'BatchWriteItem')
+            for request in requests:
+                if 'PutRequest' in request:
+                    table.put_item(Item=request['PutRequest']['Item'])
+                else:
+                    table.delete_item(Key=request['DeleteRequest']['Key'])
+        return {'UnprocessedItems': {}}
+
+    def batch_get_item(self, RequestItems):
+        if sum(len(request['Keys']) for request in RequestItems.values()) > MAX_BATCH_GET_KEYS:
+            raise _client_error('ValidationException',
+                                'Too many items requested for the BatchGetItem call', 'BatchGetItem')
+
+        responses = {}
+        for table_name, request in RequestItems.items():
+            table = self._table_named(table_name, 'BatchGetItem')
+            keys = [key[table.key_name] for key in request['Keys']]
+            if len(set(keys)) != len(keys):
+                raise _client_error('ValidationException',
+                                    'Provided list of item keys contains duplicates', 'BatchGetItem')
+            projection = {
+                name: request[name] for name in ('ProjectionExpression', 'ExpressionAttributeNames') if name in request
+            }
+            responses[table_name] = [
+                response['Item'] for response in (table.get_item(Key=key, **projection) for key in request['Keys'])
+                if 'Item' in response
+            ]
+        return {'Responses': responses, 'UnprocessedKeys': {}}
+
+    def ensure_table(self):
+        return 'exists'
+
+    def ensure_aggregates_table(self):
+        return 'exists'
+
+
+class InMemoryBackend(LocalBackend):
+    """Process-local, non-persistent storage for tests and load tests"""
+
+    name = 'memory'
+
+    def __init__(self, table_name='InventoryBatches', aggregates_table_name='InventoryAggregates'):
+        super().__init__(
+            LocalTable(indexes=INDEXES, name=table_name, store=MemoryItemStore()),
+            LocalTable(key_name='aggregate_id', name=aggregates_table_name, store=MemoryItemStore())
+        )
+
+
+class SQLiteBackend(LocalBackend):
+    """Single-file persistent storage for offline development and benchmarks"""
+
+    name = 'sqlite'
+
+    def __init__(self, table_name='InventoryBatches', aggregates_table_name='InventoryAggregates', path=':memory:'):
+        super().__init__(
+            LocalTable(indexes=INDEXES, name=table_name, store=SQLiteItemStore(path, table_name)),
+            LocalTable(key_name='aggregate_id', name=aggregates_table_name,
+                       store=SQLiteItemStore(path, aggregates_table_name))
+        )
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_storage_backend(name=None):
+    """Return the process-wide backend selected by INVENTORY_STORAGE_BACKEND (or `name`)"""
+    name = name or settings.INVENTORY_STORAGE_BACKEND
+    with _backends_lock:
+        backend = _backends.get(name)
+        if backend is None:
+            if name == 'dynamodb':
+                backend = DynamoDBBackend(settings.DYNAMODB_TABLE_NAME, settings.DYNAMODB_AGGREGATES_TABLE_NAME,
+                                          settings.DYNAMODB_ENDPOINT_URL)
+            elif name == 'memory':
+                backend = InMemoryBackend(settings.DYNAMODB_TABLE_NAME, settings.DYNAMODB_AGGREGATES_TABLE_NAME)
+            elif name == 'sqlite':
+                backend = SQLiteBackend(settings.DYNAMODB_TABLE_NAME, settings.DYNAMODB_AGGREGATES_TABLE_NAME,
+                                        settings.INVENTORY_SQLITE_PATH)
+            else:
+                raise ValueError(f'Unknown INVENTORY_STORAGE_BACKEND: {name}')
+            _backends[name] = backend
+        return backend
@@ -1,3 +1,1011 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+import boto3
+from boto3.dynamodb.conditions import Attr
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from . import api_views, views
+from .aws_clients import get_client, reset_clients
+from .batch_record import BatchRecord
+from .dashboard_metrics import DashboardMetrics
+from .direct_uploads import presigned_upload, verify_upload
+from .dynamodb_models import MAX_PAGE_SIZE, DynamoDBInventory, BatchNotFound, VersionConflict, batch_from_record
+from .image_derivatives import derivative_path, pick_variant, render_derivatives, upload_token
+from .inventory_cache import CachedDynamoDBInventory, InventoryCache
+from .latency import LatencyRecorder, bucket_bounds, bucket_index, bucket_midpoint_ms, percentiles
+from .local_dynamodb import LocalTable, SQLiteItemStore
+from .log_shipper import LogShipper
+from .media_jobs import MediaWorker, process_image
+from .metric_sinks import EmfMetricSink, get_metric_sink
+from .metrics_buffer import MetricsBuffer
+from .parallel_scan import get_pool, run_bounded
+from .presigned_urls import PresignedUrlCache, get_batch_presigner
+from .s3_presigner import S3BatchPresigner
+from .storage_backends import DynamoDBBackend, InMemoryBackend, SQLiteBackend
+
+
+def make_inventory(count=0, backend=None):
+    """A DynamoDBInventory backed by the in-memory DynamoDB stand-in"""
+    backend = backend or InMemoryBackend()
+    for i in range(count):
+        backend.table.put_item(Item={
+            'batch_id': f'B{i:04d}',
+            'product_name': f'Product {i}',
+            'production_date': '2024-01-01',
+            'expiry_date': f'2024-{(i % 12) + 1:02d}-{(i % 28) + 1:02d}',
+            'quantity': i,
+            'status': ['Safe', 'Expiring Soon', 'Expired'][i % 3],
+        })
+    return DynamoDBInventory(backend=backend)
+
+
+class BatchListingTests(SimpleTestCase):
+    def test_cursor_pages_cover_the_table_once(self):
+        db = make_inventory(23)
+        seen, cursor = [], None
+        while True:
+            items, cursor = db.list_batches_page(limit=5, cursor=cursor)
+            self.assertLessEqual(len(items), 5)
+            seen.extend(item.batch_id for item in items)
+            if not cursor:
+                break
+        self.assertEqual(sorted(seen), [f'B{i:04d}' for i in range(23)])
+
+    def test_status_query_is_sorted_by_expiry_and_paginated(self):
+        db = make_inventory(30)
+        first, cursor = db.list_batches_page(limit=4, status='Expiring Soon')
+        rest, end = db.list_batches_page(limit=100, cursor=cursor, status='Expiring Soon')
+        self.assertIsNone(end)
+
+        items = first + rest
+        self.assertEqual(len(items), 10)
+        self.assertTrue(all(item.status == 'Expiring Soon' for item in items))
+        expiry_dates = [item.expiry_date for item in items]
+        self.assertEqual(expiry_dates, sorted(expiry_dates))
+
+    def test_status_query_expiring_before(self):
+        db = make_inventory(30)
+        items, _ = db.query_by_status('Safe', expiring_before='2024-03-31')
+        self.assertTrue(items)
+        self.assertTrue(all(item.expiry_date.isoformat() <= '2024-03-31' for item in items))
+
+    def test_invalid_cursor_is_rejected(self):
+        db = make_inventory(3)
+        with self.assertRaises(ValueError):
+            db.list_batches_page(cursor='not-a-cursor')
+
+
+class InventoryCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = InventoryCache(timeouts={'batch': 60, 'list': 60})
+        self.cache.cache.clear()
+        self.db = CachedDynamoDBInventory(backend=make_inventory(6).backend, cache=self.cache)
+
+    def test_reads_are_cached_and_writes_invalidate(self):
+        self.db.list_batches_page(limit=3)
+        self.db.list_batches_page(limit=3)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+        self.db.delete_batch('B0000')
+        items, _ = self.db.list_batches_page(limit=10)
+        self.assertNotIn('B0000', [item.batch_id for item in items])
+        self.assertIsNone(self.db.get_batch('B0000'))
+
+    def test_concurrent_misses_load_once(self):
+        calls = []
+        release = threading.Event()
+
+        def slow_loader():
+            calls.append(1)
+            release.wait(1)
+            return {'batch_id': 'B0001'}
+
+        threads = [
+            threading.Thread(target=self.cache.get_or_load, args=('slow-key', slow_loader, 'batch'))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+
+
+class PatchBatchTests(SimpleTestCase):
+    def test_patch_sets_only_given_fields_and_bumps_version(self):
+        db = make_inventory(2)
+        before = db.get_batch('B0001')
+        item = db.patch_batch('B0001', {'quantity': 99, 'presigned_url': 'x', 'expiry_date': '2000-01-01'})
+        self.assertEqual(item.quantity, 99)
+        self.assertEqual(item.status, 'Expired')
+        self.assertEqual(item.product_name, before.product_name)
+        self.assertNotIn('presigned_url', db.table.get_item(Key={'batch_id': 'B0001'})['Item'])
+        self.assertEqual(item.version, 1)
+
+    def test_patch_conditions(self):
+        db = make_inventory(1)
+        db.patch_batch('B0000', {'quantity': 1}, expected_version=None)
+        with self.assertRaises(VersionConflict):
+            db.patch_batch('B0000', {'quantity': 2}, expected_version=5)
+        db.patch_batch('B0000', {'quantity': 2}, expected_version=1)
+        with self.assertRaises(BatchNotFound):
+            db.patch_batch('missing', {'quantity': 2})
+
+    def test_api_rejects_a_malformed_version(self):
+        db = make_inventory(1)
+        patch = lambda body: api_views.api_batch_update(RequestFactory().patch(
+            '/api/batches/B0000/', json.dumps(body), content_type='application/json'), 'B0000')
+        with mock.patch.object(api_views, 'db', db):
+            for version in ('abc', 1.5, True, [1]):
+                self.assertEqual(patch({'quantity': 3, 'version': version}).status_code, 400)
+            self.assertEqual(db.get_batch('B0000').quantity, 0)
+            self.assertEqual(patch({'quantity': 3, 'version': '0'}).status_code, 409)
+            self.assertEqual(patch({'quantity': 3}).status_code, 200)
+            self.assertEqual(patch({'quantity': 4, 'version': 1}).status_code, 200)
+
+    def test_form_edits_bump_the_version_and_lose_to_newer_writes(self):
+        db = make_inventory(1)
+        db.update_batch('B0000', {'quantity': 5})
+        self.assertEqual(db.get_batch('B0000').version, 1)
+        # A stale API client must not overwrite the form edit...
+        with self.assertRaises(VersionConflict):
+            db.patch_batch('B0000', {'quantity': 6}, expected_version=0)
+        db.patch_batch('B0000', {'quantity': 6}, expected_version=1)
+        # ...and a form loaded before that PATCH must not overwrite it either
+        with self.assertRaises(VersionConflict):
+            db.update_batch('B0000', {'quantity': 7}, expected_version=1)
+        self.assertEqual(db.get_batch('B0000').quantity, 6)
+        db.update_batch('B0000', {'quantity': 7, 'version': 0}, expected_version=2)
+        self.assertEqual(db.get_batch('B0000').version, 3)
+
+
+class ProjectionTests(SimpleTestCase):
+    def test_fields_limit_returned_attributes(self):
+        db = make_inventory(5)
+        items, _ = db.list_batches_page(limit=5, fields=['status'])
+        self.assertTrue(all(set(item.to_dict()) == {'batch_id', 'status'} for item in items))
+        self.assertEqual(set(db.get_batch('B0001', fields=['quantity']).to_dict()), {'batch_id', 'quantity'})
+        self.assertEqual(db.summarize_batches()['total_quantity'], 10)
+
+
+class AggregateTests(SimpleTestCase):
+    def test_counters_follow_writes_and_match_a_scan(self):
+        db = make_inventory()
+        db.aggregates.replace(db.scan_summary())
+        batch = {'product_name': 'Eggs', 'production_date': '2024-01-01', 'expiry_date': '2999-01-01', 'status': 'Safe'}
+        db.create_batch(dict(batch, batch_id='A', quantity=5))
+        db.create_batch(dict(batch, batch_id='A', quantity=7))
+        db.bulk_create_batches([dict(batch, batch_id=f'K{i}', quantity=1) for i in range(30)])
+        db.patch_batch('A', {'expiry_date': '2000-01-01'})
+        db.update_batch('K0', {'quantity': 4, 'status': 'Expiring Soon'})
+        db.delete_batch('K1')
+        db.delete_batch('missing')
+
+        summary = db.summarize_batches()
+        self.assertEqual(summary, db.scan_summary())
+        self.assertEqual(summary['total_batches'], 30)
+        self.assertEqual(summary['total_quantity'], 7 + 4 + 28)
+        self.assertEqual(summary['status_counts'], {'Safe': 28, 'Expiring Soon': 1, 'Expired': 1})
+        self.assertEqual(db.aggregates.read(), summary)
+
+    def test_writes_never_start_counters_before_reconcile(self):
+        db = make_inventory(30)
+        db.create_batch({'batch_id': 'new', 'product_name': 'Eggs', 'production_date': '2024-01-01',
+                         'expiry_date': '2999-01-01', 'quantity': 5, 'status': 'Safe'})
+        self.assertIsNone(db.aggregates.read())
+        summary = db.summarize_batches()
+        self.assertEqual((summary['total_batches'], summary['total_quantity']), (31, 440))
+
+        missing = ClientError({'Error': {'Code': 'ResourceNotFoundException', 'Message': 'no table'}}, 'GetItem')
+        with mock.patch.object(db.backend.aggregates_table, 'get_item', side_effect=missing):
+            self.assertEqual(db.summarize_batches(), summary)
+
+
+SQLITE_COUNTER_PROBE = """
+import sys
+from boto3.dynamodb.conditions import Attr
+from inventory.local_dynamodb import LocalTable, SQLiteItemStore
+table = LocalTable(key_name='aggregate_id', store=SQLiteItemStore(sys.argv[1], 'Counters'))
+for _ in range(int(sys.argv[2])):
+    table.update_item(Key={'aggregate_id': 'total'}, UpdateExpression='ADD hits :one',
+                      ExpressionAttributeValues={':one': 1})
+    try:
+        table.put_item(Item={'aggregate_id': 'claim'}, ConditionExpression=Attr('aggregate_id').not_exists())
+        print('claimed')
+    except Exception:
+        pass
+"""
+
+
+class StorageBackendTests(SimpleTestCase):
+    def test_sqlite_writes_are_atomic_across_processes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'counters.sqlite3')
+            workers = [subprocess.Popen([sys.executable, '-c', SQLITE_COUNTER_PROBE, path, '200'],
+                                        stdout=subprocess.PIPE, text=True) for _ in range(4)]
+            claims = sum(worker.communicate(timeout=120)[0].count('claimed') for worker in workers)
+            self.assertEqual([worker.returncode for worker in workers], [0] * 4)
+            table = LocalTable(key_name='aggregate_id', store=SQLiteItemStore(path, 'Counters'))
+            # No ADD is lost and exactly one conditional put wins
+            self.assertEqual(table.get_item(Key={'aggregate_id': 'total'})['Item']['hits'], 800)
+            self.assertEqual(claims, 1)
+
+    def test_sqlite_backend_round_trips_batches(self):
+        db = make_inventory(backend=SQLiteBackend())
+        result = db.bulk_create_batches([
+            {'batch_id': f'S{i}', 'product_name': 'Cheese', 'production_date': '2024-01-01',
+             'expiry_date': '2024-02-01', 'quantity': i, 'status': 'Safe'}
+            for i in range(30)
+        ])
+        self.assertEqual(result, {'written': 30, 'failed': []})
+        found = db.get_batches(['S3', 'missing', 'S29'])
+        self.assertEqual(list(found), ['S3', 'S29'])
+        self.assertEqual(found['S29'].quantity, 29)
+        items, _ = db.query_by_status('Safe', limit=100)
+        self.assertEqual(len(items), 30)
+
+    def test_stand_in_rejects_what_it_cannot_evaluate_like_dynamodb(self):
+        table = InMemoryBackend().table
+        table.put_item(Item={'batch_id': 'B1', 'tags': {'a', 'b'}, 'quantity': 1})
+        table.update_item(Key={'batch_id': 'B1'}, UpdateExpression='ADD tags :add DELETE #t :gone',
+                          ExpressionAttributeNames={'#t': 'tags'},
+                          ExpressionAttributeValues={':add': {'c'}, ':gone': {'a'}})
+        self.assertEqual(table.get_item(Key={'batch_id': 'B1'})['Item']['tags'], {'b', 'c'})
+        table.update_item(Key={'batch_id': 'B1'}, UpdateExpression='DELETE tags :all',
+                          ExpressionAttributeValues={':all': {'b', 'c'}})
+        self.assertNotIn('tags', table.get_item(Key={'batch_id': 'B1'})['Item'])
+
+        self.assertEqual(table.scan(FilterExpression=Attr('quantity').attribute_type('N'))['Count'], 1)
+        self.assertEqual(table.scan(FilterExpression=Attr('batch_id').size().eq(2))['Count'], 1)
+        self.assertEqual(table.scan(FilterExpression=Attr('quantity').size().eq(1))['Count'], 0)
+        unknown = mock.Mock()
+        unknown.get_expression.return_value = {'operator': 'matches', 'values': (Attr('batch_id'), 'B.*')}
+        with self.assertRaises(ClientError) as raised:
+            table.scan(FilterExpression=unknown)
+        self.assertEqual(raised.exception.response['Error']['Code'], 'ValidationException')
+
+
+
+def batch_json(batch_id, quantity=1, **extra):
+    return dict({'batch_id': batch_id, 'product_name': 'Milk', 'production_date': '2024-01-01',
+                 'expiry_date': '2030-01-01', 'quantity': quantity}, **extra)
+
+
+class BulkIngestionTests(SimpleTestCase):
+    def test_unprocessed_items_are_retried_and_reported(self):
+        db = make_inventory()
+        real_write = db.backend.batch_write_item
+        calls = []
+
+        def throttled_write(RequestItems):
+            # The first call only gets half of each chunk through
+            calls.append(RequestItems)
+            (table_name, requests), = RequestItems.items()
+            if len(calls) > 1:
+                return real_write(RequestItems=RequestItems)
+            real_write(RequestItems={table_name: requests[::2]})
+            return {'UnprocessedItems': {table_name: requests[1::2]}}
+
+        with mock.patch.object(db.backend, 'batch_write_item', throttled_write), mock.patch('time.sleep'):
+            result = db.bulk_create_batches(
+                [batch_from_record(batch_json(f'X{i:02d}', i)) for i in range(20)] +
+                [batch_from_record(batch_json('X00', 99))],
+                max_workers=1
+            )
+        self.assertEqual(result, {'written': 20, 'failed': []})
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(db.get_batch('X00').quantity, 99)
+
+        with mock.patch.object(db.backend, 'batch_write_item',
+                               side_effect=lambda RequestItems: {'UnprocessedItems': RequestItems}), \
+                mock.patch('time.sleep'):
+            result = db.bulk_create_batches([batch_from_record(batch_json('Y1'))], max_retries=2)
+        self.assertEqual(result, {'written': 0, 'failed': ['Y1']})
+        self.assertEqual(db.summarize_batches()['total_batches'], 20)
+
+    def test_bulk_api_validates_everything_before_writing(self):
+        db = make_inventory()
+        post = lambda body: api_views.api_batch_bulk_create(
+            RequestFactory().post('/api/batches/bulk/', json.dumps(body), content_type='application/json'))
+        with mock.patch.object(api_views, 'db', db):
+            response = post([batch_json('A1'), batch_json('A2', quantity='many')])
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('Batch 1', json.loads(response.content)['message'])
+            self.assertEqual(db.summarize_batches()['total_batches'], 0)
+
+            response = post({'batches': [batch_json('A1'), batch_json('A2')]})
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(json.loads(response.content)['data'], {'written': 2, 'failed': []})
+
+    def test_import_command_streams_jsonl_and_skips_invalid_records(self):
+        db = make_inventory()
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as source:
+            for i in range(7):
+                source.write(json.dumps(batch_json(f'I{i}', i)) + '\n')
+            source.write(json.dumps({'batch_id': 'broken'}) + '\n')
+        self.addCleanup(os.remove, source.name)
+
+        out, err = StringIO(), StringIO()
+        with mock.patch('inventory.management.commands.import_batches.CachedDynamoDBInventory', return_value=db):
+            call_command('import_batches', source.name, chunk_size=3, stdout=out, stderr=err)
+        self.assertIn('Imported 7 batches (1 invalid, 0 failed)', out.getvalue())
+        self.assertIn('Skipping record 8', err.getvalue())
+        self.assertEqual(db.summarize_batches()['total_batches'], 7)
+
+
+class MultiGetTests(SimpleTestCase):
+    def test_get_batches_chunks_keeps_request_order_and_retries_unprocessed_keys(self):
+        db = make_inventory(150)
+        real_get = db.backend.batch_get_item
+        calls = []
+
+        def throttled_get(RequestItems):
+            # Every first request of a chunk leaves its last key unprocessed
+            calls.append(RequestItems)
+            (table_name, request), = RequestItems.items()
+            if len(request['Keys']) == 1:
+                return real_get(RequestItems=RequestItems)
+            response = real_get(RequestItems={table_name: dict(request, Keys=request['Keys'][:-1])})
+            response['UnprocessedKeys'] = {table_name: dict(request, Keys=request['Keys'][-1:])}
+            return response
+
+        ids = [f'B{i:04d}' for i in range(149, -1, -1)] + ['missing', 'B0149']
+        with mock.patch.object(db.backend, 'batch_get_item', throttled_get), mock.patch('time.sleep'):
+            found = db.get_batches(ids, fields=['batch_id', 'quantity'])
+        self.assertEqual(list(found), ids[:150])
+        self.assertEqual(found['B0007'].quantity, 7)
+        # 151 distinct keys: two 100-key chunks, each retried once for its last key
+        self.assertEqual(sorted(len(call[db.table.name]['Keys']) for call in calls), [1, 1, 51, 100])
+
+    def test_ids_api_reports_missing_ids_and_throttling(self):
+        db = make_inventory(3)
+        get = lambda query: api_views.api_batch_list(RequestFactory().get('/api/batches/', query))
+        with mock.patch.object(api_views, 'db', db):
+            body = json.loads(get({'ids': 'B0002, nope,B0000', 'fields': 'batch_id'}).content)
+            self.assertEqual([batch['batch_id'] for batch in body['data']], ['B0002', 'B0000'])
+            self.assertEqual(body['missing'], ['nope'])
+            self.assertEqual(get({'ids': ','.join(str(i) for i in range(MAX_PAGE_SIZE + 1))}).status_code, 400)
+
+            with mock.patch.object(db.backend, 'batch_get_item',
+                                   side_effect=lambda RequestItems: {'UnprocessedKeys': RequestItems}), \
+                    mock.patch('time.sleep'):
+                response = get({'ids': 'B0001'})
+                self.assertEqual(response.status_code, 503)
+                self.assertEqual(response['Retry-After'], '1')
+                post = RequestFactory().post('/api/batches/bulk/', json.dumps([batch_json('B0001')]),
+                                             content_type='application/json')
+                self.assertEqual(api_views.api_batch_bulk_create(post).status_code, 503)
+
+class ThreadSafetyTests(SimpleTestCase):
+    def test_each_thread_gets_its_own_dynamodb_table(self):
+        backend = DynamoDBBackend('InventoryBatches', 'InventoryAggregates', endpoint_url='http://localhost:8000')
+        tables = {}
+
+        def grab(name):
+            tables[name] = (backend.table, backend.table, backend.dynamodb)
+
+        worker = threading.Thread(target=grab, args=('worker',))
+        worker.start()
+        worker.join()
+        grab('main')
+
+        self.assertIs(tables['main'][0], tables['main'][1])
+        self.assertIsNot(tables['main'][0], tables['worker'][0])
+        self.assertIsNot(tables['main'][2], tables['worker'][2])
+        self.assertEqual(tables['worker'][0].name, 'InventoryBatches')
+
+    def test_batch_calls_share_long_lived_pool_threads(self):
+        db = make_inventory(300)
+        real_get = db.backend.batch_get_item
+        seen, running, peak = [], [0], [0]
+        lock = threading.Lock()
+
+        def counting_get(RequestItems):
+            with lock:
+                seen.append(threading.current_thread())
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            try:
+                return real_get(RequestItems=RequestItems)
+            finally:
+                with lock:
+                    running[0] -= 1
+
+        ids = [f'B{i:04d}' for i in range(300)]
+        with mock.patch.object(db.backend, 'batch_get_item', counting_get):
+            for _ in range(3):
+                self.assertEqual(len(db.get_batches(ids, max_workers=2)), 300)
+        self.assertLessEqual(peak[0], 2)
+        # Every call ran on the pool's threads, which outlive the call (and their boto3 resources with them)
+        self.assertTrue(set(seen) <= set(get_pool()._threads))
+
+        def fail_on_two(n):
+            if n == 2:
+                raise ValueError(n)
+            return n
+        with self.assertRaises(ValueError):
+            run_bounded(fail_on_two, range(5), 2)
+        self.assertEqual(run_bounded(lambda n: n * n, range(5), 3), [0, 1, 4, 9, 16])
+
+    def test_concurrent_writers_stay_consistent(self):
+        for backend in (InMemoryBackend(), SQLiteBackend()):
+            db = make_inventory(backend=backend)
+            batch = {'product_name': 'Rice', 'production_date': '2024-01-01', 'expiry_date': '2999-01-01',
+                     'status': 'Safe'}
+            db.create_batch(dict(batch, batch_id='hot', quantity=0))
+            errors = []
+
+            def worker(n):
+                try:
+                    for i in range(20):
+                        db.create_batch(dict(batch, batch_id=f'T{n}-{i}', quantity=1))
+                        # Optimistic increment of a shared batch, retried on conflicts
+                        while True:
+                            current = db.get_batch('hot')
+                            try:
+                                db.patch_batch('hot', {'quantity': current.quantity + 1}, current.version)
+                                break
+                            except VersionConflict:
+                                continue
+                        if i % 2:
+                            db.delete_batch(f'T{n}-{i}')
+                    db.list_batches_page(limit=25)
+                except Exception as e:
+                    errors.append(e)
+
+            threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(errors, [])
+            self.assertEqual(db.get_batch('hot').quantity, 160)
+            self.assertEqual(db.summarize_batches(), db.scan_summary())
+            self.assertEqual(db.summarize_batches()['total_batches'], 81)
+
+
+STARTUP_PROBE = """
+import json, os, sys, threading, django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'food_inventory.settings')
+django.setup()
+booted = {'boto3': 'boto3' in sys.modules, 'threads': threading.active_count()}
+import food_inventory.urls
+from inventory import aws_clients
+from django.test import Client
+imported = {'clients': len(aws_clients._clients), 'threads': threading.active_count()}
+Client().get('/login/')
+served = {'threads': threading.active_count()}
+print(json.dumps({'booted': booted, 'imported': imported, 'served': served}))
+"""
+
+
+class StartupTests(SimpleTestCase):
+    def test_startup_has_no_side_effects_until_first_request(self):
+        env = dict(os.environ, INVENTORY_STORAGE_BACKEND='memory', SQS_QUEUE_URL='https://sqs.invalid/queue')
+        result = subprocess.run([sys.executable, '-c', STARTUP_PROBE], capture_output=True, text=True,
+                                env=env, timeout=60)
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+
+        # Management commands (setup only) do not even import boto3 or start threads
+        self.assertEqual(probe['booted'], {'boto3': False, 'threads': 1})
+        self.assertEqual(probe['imported'], {'clients': 0, 'threads': 1})
+        # The SQS consumer and the latency publisher start with the first request
+        self.assertEqual(probe['served']['threads'], 3)
+
+
+class AWSClientRegistryTests(SimpleTestCase):
+    def tearDown(self):
+        reset_clients()
+
+    @override_settings(AWS_CLIENT_CONFIG={'default': {'max_pool_connections': 7}, 's3': {'read_timeout': 3}})
+    def test_clients_are_shared_and_configured_per_service(self):
+        reset_clients()
+        s3 = get_client('s3')
+        self.assertIs(get_client('s3'), s3)
+        self.assertEqual(s3.meta.config.max_pool_connections, 7)
+        self.assertEqual(s3.meta.config.read_timeout, 3)
+        self.assertEqual(get_client('sqs').meta.config.read_timeout, 60)
+
+
+class PresignedUrlCacheTests(SimpleTestCase):
+    def test_urls_are_reused_until_the_margin_and_evicted_lru(self):
+        now = [1000.0]
+        cache = PresignedUrlCache(max_entries=2, margin=300, clock=lambda: now[0])
+        signed = []
+
+        def signer(key):
+            return lambda: signed.append(key) or f'https://signed/{key}/{len(signed)}'
+
+        first = cache.get('bucket', 'a', 3600, signer('a'))
+        self.assertEqual(cache.get('bucket', 'a', 3600, signer('a')), first)
+        now[0] += 3600 - 300
+        self.assertNotEqual(cache.get('bucket', 'a', 3600, signer('a')), first)
+
+        cache.get('bucket', 'b', 3600, signer('b'))
+        cache.get('bucket', 'a', 3600, signer('a'))
+        cache.get('bucket', 'c', 3600, signer('c'))
+        cache.get('bucket', 'a', 3600, signer('a'))
+        cache.get('bucket', 'b', 3600, signer('b'))
+        self.assertEqual(signed, ['a', 'a', 'b', 'c', 'b'])
+        self.assertEqual(cache.stats()['evictions'], 2)
+
+
+class S3BatchPresignerTests(SimpleTestCase):
+    def test_urls_match_botocore_byte_for_byte(self):
+        now = datetime(2024, 5, 1, 12, 30, 5)
+        keys = ['media/product_images/B1.jpg', 'media/product_images/a b+c~\u00fc(1)&=?.png']
+        for region, token, bucket in [('us-east-1', None, 'inventory-media'), ('eu-west-1', 'tok/en+=', 'my.dotted.bucket')]:
+            session = boto3.Session(aws_access_key_id='AKIDEXAMPLE', aws_secret_access_key='secret',
+                                    aws_session_token=token, region_name=region)
+            client = session.client('s3', config=Config(signature_version='s3v4'))
+            urls = S3BatchPresigner(client, bucket, session.get_credentials()).presign(keys, 3600, now=now)
+
+            with mock.patch('botocore.auth.datetime') as botocore_datetime:
+                botocore_datetime.datetime.utcnow.return_value = now
+                expected = {
+                    key: client.generate_presigned_url('get_object', Params={'Bucket': bucket, 'Key': key},
+                                                       ExpiresIn=3600)
+                    for key in keys
+                }
+            self.assertEqual(urls, expected)
+
+    def test_reset_clients_rebuilds_the_shared_presigner(self):
+        self.addCleanup(reset_clients)
+        aws = {'AWS_SECRET_ACCESS_KEY': 'secret', 'AWS_SESSION_TOKEN': None, 'AWS_S3_REGION_NAME': 'us-east-1',
+               'AWS_CLIENT_CONFIG': {'s3': {'signature_version': 's3v4'}}}
+        with override_settings(AWS_ACCESS_KEY_ID='AKIDOLD', **aws):
+            reset_clients()
+            presigner = get_batch_presigner('inventory-media')
+            self.assertIs(get_batch_presigner('inventory-media'), presigner)
+        with override_settings(AWS_ACCESS_KEY_ID='AKIDNEW', **aws):
+            reset_clients()
+            rotated = get_batch_presigner('inventory-media')
+        self.assertIsNot(rotated, presigner)
+        self.assertEqual(rotated.credentials.access_key, 'AKIDNEW')
+
+
+class BatchRecordTests(SimpleTestCase):
+    def test_record_round_trips_to_json_shape(self):
+        record = BatchRecord.from_item({
+            'batch_id': 'B1', 'product_name': 'Milk', 'production_date': '2024-01-01',
+            'expiry_date': '2024-01-09', 'quantity': Decimal('12'), 'status': 'Safe',
+        })
+        self.assertEqual(record.expiry_date, date(2024, 1, 9))
+        self.assertEqual(record.days_to_expiry(today=date(2024, 1, 2)), 7)
+        self.assertEqual(record.to_dict()['quantity'], 12)
+        self.assertEqual(record.to_dict()['production_date'], '2024-01-01')
+        self.assertEqual(pickle.loads(pickle.dumps(record)), record)
+
+
+class BatchImageTests(SimpleTestCase):
+    def test_listing_skips_signing_and_the_image_view_redirects(self):
+        db = make_inventory(2)
+        db.table.update_item(Key={'batch_id': 'B0001'}, UpdateExpression='SET image_url = :u',
+                             ExpressionAttributeValues={':u': 'product_images/B0001.jpg'})
+        with mock.patch('inventory.dynamodb_models.presigned_media_urls') as sign:
+            items, _ = db.list_batches_page(limit=10)
+        sign.assert_not_called()
+        self.assertTrue(all(item.presigned_url is None for item in items))
+
+        request = RequestFactory().get('/batch/B0001/image/')
+        request.user = mock.Mock(is_authenticated=True)
+        with mock.patch.object(views, 'db', db), \
+                mock.patch.object(views, 'presigned_media_url', return_value='https://signed/B0001') as sign:
+            response = views.batch_image(request, 'B0001')
+            sign.assert_called_once_with('product_images/B0001.jpg')
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(response['Location'], 'https://signed/B0001')
+            self.assertIn('private', response['Cache-Control'])
+            with self.assertRaises(Http404):
+                views.batch_image(request, 'B0000')
+
+
+class ImageDerivativeTests(SimpleTestCase):
+    def test_thumbnails_are_upright_bounded_and_stripped(self):
+        # A 1600x800 photo stored sideways: EXIF orientation 6 means "rotate 90 degrees to view"
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Camera Maker'
+        upload = BytesIO()
+        Image.new('RGB', (1600, 800), 'red').save(upload, format='JPEG', exif=exif)
+
+        derivatives = render_derivatives(upload, sizes=[64, 256, 1024], formats=['webp', 'jpeg'])
+        self.assertEqual([(size, fmt) for size, fmt, _ in derivatives],
+                         [(size, fmt) for size in (1024, 256, 64) for fmt in ('webp', 'jpeg')])
+        for size, fmt, data in derivatives:
+            with Image.open(BytesIO(data)) as image:
+                self.assertEqual(image.format, fmt.upper())
+                self.assertEqual(image.size, (size // 2, size))
+                self.assertEqual(len(image.getexif()), 0)
+
+        variants = {str(size): {fmt: derivative_path('product_images/B1.png', size, fmt, 'c0ffee')
+                                for fmt in ('webp', 'jpeg')}
+                    for size in (64, 256, 1024)}
+        self.assertEqual(pick_variant(variants, 100), 'product_images/B1_c0ffee_256.webp')
+        self.assertEqual(pick_variant(variants, 64, accept_webp=False), 'product_images/B1_c0ffee_64.jpg')
+        self.assertEqual(pick_variant(variants, 4000), 'product_images/B1_c0ffee_1024.webp')
+        self.assertIsNone(pick_variant({}, 64))
+
+
+@override_settings(AWS_STORAGE_BUCKET_NAME='inventory-media', PRODUCT_IMAGE_MAX_BYTES=1000)
+class DirectUploadTests(SimpleTestCase):
+    def test_policy_is_scoped_to_the_batch_and_uploads_are_verified(self):
+        session = boto3.Session(aws_access_key_id='AKIDEXAMPLE', aws_secret_access_key='secret',
+                                region_name='us-east-1')
+        client = session.client('s3', config=Config(signature_version='s3v4'))
+        with mock.patch('inventory.direct_uploads.get_client', return_value=client):
+            upload = presigned_upload('B1', 'image/png')
+        self.assertEqual(upload['key'], 'media/product_images/B1.png')
+        policy = json.loads(base64.b64decode(upload['fields']['policy']))
+        self.assertIn({'key': 'media/product_images/B1.png'}, policy['conditions'])
+        self.assertIn({'Content-Type': 'image/png'}, policy['conditions'])
+        self.assertIn(['content-length-range', 1, 1000], policy['conditions'])
+        for batch_id, content_type in [('../B1', 'image/png'), ('B1', 'text/html')]:
+            with self.assertRaises(ValueError):
+                presigned_upload(batch_id, content_type)
+
+        s3 = mock.Mock()
+        s3.head_object.return_value = {'ContentLength': 500, 'ContentType': 'image/png'}
+        with mock.patch('inventory.direct_uploads.get_client', return_value=s3):
+            self.assertEqual(verify_upload('B1', 'media/product_images/B1.png'), 'product_images/B1.png')
+            with self.assertRaises(ValueError):
+                verify_upload('B2', 'media/product_images/B1.png')
+            s3.head_object.return_value = {'ContentLength': 5000, 'ContentType': 'image/png'}
+            with self.assertRaises(ValueError):
+                verify_upload('B1', 'media/product_images/B1.png')
+
+
+class MediaJobTests(SimpleTestCase):
+    def test_jobs_retry_then_fail_over_and_drain_on_shutdown(self):
+        worker = MediaWorker(io_workers=2, cpu_workers=0, max_pending=2, retries=2, backoff=0)
+        attempts, done, failed = [], [], []
+
+        def flaky(name):
+            attempts.append(name)
+            if name == 'broken' or attempts.count(name) == 1:
+                raise IOError('S3 unavailable')
+            done.append(name)
+
+        for name in ['flaky', 'broken', 'flaky-2']:
+            worker.submit(flaky, name, on_failure=failed.append)
+        worker.shutdown(wait=True)
+
+        self.assertEqual(sorted(done), ['flaky', 'flaky-2'])
+        self.assertEqual(failed, ['broken'])
+        self.assertEqual(attempts.count('broken'), 3)
+        with self.assertRaises(RuntimeError):
+            worker.submit(flaky, 'late')
+
+    @override_settings(PRODUCT_IMAGE_SIZES=[64], PRODUCT_IMAGE_FORMATS=['webp'])
+    def test_processing_marks_the_batch_ready_unless_it_moved_on(self):
+        db = make_inventory(2)
+        db.update_batch('B0000', {'image': 'product_images/B0000.png', 'image_state': 'pending'})
+        upload = BytesIO()
+        Image.new('RGB', (640, 480), 'blue').save(upload, format='PNG')
+
+        s3 = mock.Mock()
+        s3.get_object.side_effect = lambda **kwargs: {'Body': BytesIO(upload.getvalue())}
+        with mock.patch('inventory.media_jobs.get_client', return_value=s3), \
+                mock.patch('inventory.image_derivatives.get_client', return_value=s3), \
+                mock.patch('inventory.media_jobs.cloudwatch_manager'):
+            process_image(db, 'B0000', 'product_images/B0000.png')
+            process_image(db, 'B0001', 'product_images/B0001.png')
+
+        batch = db.get_batch('B0000')
+        self.assertEqual(batch.image_state, 'ready')
+        token = upload_token('product_images/B0000.png', upload.getvalue())
+        self.assertEqual(batch.image_variants, {'64': {'webp': f'product_images/B0000_{token}_64.webp'}})
+        self.assertEqual(s3.get_object.call_args_list[0].kwargs['Key'], 'media/product_images/B0000.png')
+        # Only B0000's thumbnail is rendered: B0001's job stops before touching the image
+        self.assertEqual(s3.put_object.call_count, 1)
+        # B0001 never pointed at that image, so its state is untouched and the stray original is removed
+        self.assertIsNone(db.get_batch('B0001').image_state)
+        self.assertEqual(s3.delete_objects.call_args.kwargs['Delete']['Objects'],
+                         [{'Key': 'media/product_images/B0001.png'}])
+
+    @override_settings(PRODUCT_IMAGE_SIZES=[64], PRODUCT_IMAGE_FORMATS=['webp'])
+    def test_jobs_overtaken_while_rendering_delete_what_they_wrote(self):
+        upload = BytesIO()
+        Image.new('RGB', (64, 64), 'red').save(upload, format='PNG')
+        s3 = mock.Mock()
+        s3.get_object.side_effect = lambda **kwargs: {'Body': BytesIO(upload.getvalue())}
+
+        def deleted_meanwhile(db):
+            db.delete_batch('B0000')
+
+        def reimaged_meanwhile(db):
+            db.update_batch('B0000', {'image': 'product_images/B0000.jpg', 'image_state': 'pending'})
+
+        deleted = {}
+        for name, overtake in (('deleted', deleted_meanwhile), ('reimaged', reimaged_meanwhile)):
+            db = make_inventory(1)
+            db.update_batch('B0000', {'image': 'product_images/B0000.png', 'image_state': 'pending'})
+            real_set_state = db.set_image_state
+
+            def set_state_late(*args, **kwargs):
+                overtake(db)
+                return real_set_state(*args, **kwargs)
+
+            s3.delete_objects.reset_mock()
+            with mock.patch('inventory.media_jobs.get_client', return_value=s3), \
+                    mock.patch('inventory.image_derivatives.get_client', return_value=s3), \
+                    mock.patch('inventory.media_jobs.cloudwatch_manager'), \
+                    mock.patch.object(db, 'set_image_state', set_state_late):
+                process_image(db, 'B0000', 'product_images/B0000.png')
+            deleted[name] = [obj['Key'] for obj in s3.delete_objects.call_args.kwargs['Delete']['Objects']]
+
+        token = upload_token('product_images/B0000.png', upload.getvalue())
+        written = ['media/product_images/B0000.png', f'media/product_images/B0000_{token}_64.webp']
+        # Thumbnail keys are unique to the upload, so they go whether the batch was deleted or re-imaged
+        self.assertEqual(deleted['deleted'], written)
+        self.assertEqual(deleted['reimaged'], written)
+
+    @override_settings(PRODUCT_IMAGE_SIZES=[64], PRODUCT_IMAGE_FORMATS=['webp'])
+    def test_a_stale_job_finishing_last_cannot_clobber_the_new_thumbnails(self):
+        images = {}
+        for name, colour in (('png', 'red'), ('jpg', 'green')):
+            upload = BytesIO()
+            Image.new('RGB', (64, 64), colour).save(upload, format='PNG')
+            images[f'media/product_images/B0000.{name}'] = upload.getvalue()
+        db = make_inventory(1)
+        db.update_batch('B0000', {'image': 'product_images/B0000.png', 'image_state': 'pending'})
+        s3 = mock.Mock()
+
+        def get_object(Bucket, Key):
+            if Key.endswith('.png'):
+                # Re-imaged after the stale job's check, and the new job completes before it uploads
+                db.update_batch('B0000', {'image': 'product_images/B0000.jpg', 'image_state': 'pending'})
+                process_image(db, 'B0000', 'product_images/B0000.jpg')
+            return {'Body': BytesIO(images[Key])}
+
+        s3.get_object.side_effect = get_object
+        with mock.patch('inventory.media_jobs.get_client', return_value=s3), \
+                mock.patch('inventory.image_derivatives.get_client', return_value=s3), \
+                mock.patch('inventory.media_jobs.cloudwatch_manager'):
+            process_image(db, 'B0000', 'product_images/B0000.png')
+
+        batch = db.get_batch('B0000')
+        self.assertEqual(batch.image_state, 'ready')
+        fresh = batch.image_variants['64']['webp']
+        stale = [call.kwargs['Key'] for call in s3.put_object.call_args_list if call.kwargs['Key'] != f'media/{fresh}']
+        self.assertEqual(len(stale), 1)
+        # The stale job wrote beside the live thumbnail, never over it, and removed what it wrote
+        self.assertEqual(s3.put_object.call_count, 2)
+        self.assertEqual([obj['Key'] for obj in s3.delete_objects.call_args.kwargs['Delete']['Objects']],
+                         ['media/product_images/B0000.png'] + stale)
+
+    @override_settings(PRODUCT_IMAGE_MAX_BYTES=100)
+    def test_form_uploads_reach_s3_before_the_job_is_queued(self):
+        s3 = mock.Mock()
+
+        def submit(name, data, content_type='image/png'):
+            request = RequestFactory().post('/batch/create/', {
+                'image': SimpleUploadedFile(name, data, content_type=content_type)
+            })
+            with mock.patch.object(views, 'get_client', return_value=s3), mock.patch.object(views, 'messages'):
+                return views.pending_image(request, 'B1')
+
+        self.assertEqual(submit('big.png', b'x' * 101), ({}, None))
+        self.assertEqual(submit('notes.txt', b'hello', 'text/plain'), ({}, None))
+        s3.upload_fileobj.assert_not_called()
+
+        fields, job = submit('photo.png', b'x' * 100)
+        self.assertEqual(job, ('B1', 'product_images/B1.png'))
+        self.assertEqual(fields['image_state'], 'pending')
+        self.assertEqual(s3.upload_fileobj.call_args.args[2], 'media/product_images/B1.png')
+
+    def test_images_left_pending_are_found_and_requeued(self):
+        db = make_inventory(3)
+        db.update_batch('B0000', {'image': 'product_images/B0000.png', 'image_state': 'pending'})
+        db.update_batch('B0001', {'image': 'product_images/B0001.png', 'image_state': 'pending'})
+        db.table.update_item(Key={'batch_id': 'B0000'}, UpdateExpression='SET updated_at = :t',
+                             ExpressionAttributeValues={':t': '2024-01-01 08:00:00'})
+        self.assertEqual(db.stale_pending_images(600), [('B0000', 'product_images/B0000.png')])
+
+        out = StringIO()
+        with mock.patch('inventory.management.commands.requeue_pending_images.CachedDynamoDBInventory',
+                        return_value=db), \
+                mock.patch('inventory.management.commands.requeue_pending_images.queue_image') as queue, \
+                mock.patch('inventory.management.commands.requeue_pending_images.media_worker'):
+            call_command('requeue_pending_images', stdout=out)
+        queue.assert_called_once_with(db, 'B0000', 'product_images/B0000.png')
+        self.assertIn('Re-processed 1 pending images', out.getvalue())
+
+
+class LogShipperTests(SimpleTestCase):
+    def test_events_are_batched_per_stream_and_overflow_is_dropped(self):
+        client = mock.Mock()
+        client.exceptions.ResourceAlreadyExistsException = type('ResourceAlreadyExists', (Exception,), {})
+        client.exceptions.ResourceNotFoundException = type('ResourceNotFound', (Exception,), {})
+        client.create_log_group.side_effect = [None, client.exceptions.ResourceAlreadyExistsException()]
+        shipper = LogShipper(flush_interval=60, max_queue=7, flush_at=100, max_batch_events=2,
+                             client_factory=lambda: client)
+
+        for i in range(5):
+            self.assertTrue(shipper.emit('FoodInventory/Batches', 'operations', f'created B{i}'))
+        shipper.emit('FoodInventory/Batches', 'errors', 'failed', 'ERROR')
+        shipper.emit('FoodInventory/S3', 'uploads', 'uploaded')
+        self.assertFalse(shipper.emit('FoodInventory/S3', 'uploads', 'over the limit'))
+        shipper.shutdown()
+
+        calls = [(call.kwargs['logStreamName'], len(call.kwargs['logEvents']))
+                 for call in client.put_log_events.call_args_list]
+        self.assertEqual(calls, [('operations', 2), ('operations', 2), ('operations', 1), ('errors', 1), ('uploads', 1)])
+        self.assertIn('[ERROR]', client.put_log_events.call_args_list[3].kwargs['logEvents'][0]['message'])
+        self.assertEqual(client.create_log_group.call_count, 2)
+        self.assertEqual(client.create_log_stream.call_count, 3)
+        self.assertEqual(shipper.stats(), {'queued': 7, 'sent': 7, 'dropped': 1, 'failed': 0, 'calls': 5, 'pending': 0})
+
+
+class MetricsBufferTests(SimpleTestCase):
+    def test_points_are_aggregated_per_series_and_published_in_batches(self):
+        client = mock.Mock()
+        metrics = MetricsBuffer(flush_interval=60, client_factory=lambda: client)
+        current = [{'Name': 'Type', 'Value': 'CurrentCount'}]
+        for _ in range(500):
+            metrics.add('PageViews', 1, timestamp=120)
+        metrics.add('TotalSafeBatches', 40, dimensions=current, timestamp=130)
+        metrics.add('TotalSafeBatches', 41, dimensions=current, timestamp=179)
+        for ms in range(200):
+            metrics.add('Latency', ms, unit='Milliseconds', timestamp=150)
+        for i in range(1200):
+            metrics.add(f'Series{i}', 1, namespace='Other', timestamp=120)
+        metrics.shutdown()
+
+        calls = client.put_metric_data.call_args_list
+        self.assertEqual([(call.kwargs['Namespace'], len(call.kwargs['MetricData'])) for call in calls],
+                         [('FoodInventory', 3), ('Other', 1000), ('Other', 200)])
+        datums = {datum['MetricName']: datum for datum in calls[0].kwargs['MetricData']}
+        self.assertEqual(datums['PageViews']['Values'], [1])
+        self.assertEqual(datums['PageViews']['Counts'], [500])
+        self.assertEqual(datums['PageViews']['Timestamp'], datetime(1970, 1, 1, 0, 2))
+        self.assertEqual(datums['TotalSafeBatches']['Values'], [40, 41])
+        self.assertEqual(datums['TotalSafeBatches']['Dimensions'], current)
+        self.assertEqual(datums['Latency']['StatisticValues'],
+                         {'SampleCount': 200, 'Sum': 19900.0, 'Minimum': 0, 'Maximum': 199})
+        self.assertEqual(metrics.stats()['calls'], 3)
+
+
+class MetricSinkTests(SimpleTestCase):
+    def test_emf_sink_writes_one_document_per_point(self):
+        output = StringIO()
+        sink = EmfMetricSink(stream=output)
+        sink.put('PageViews', 1)
+        sink.put('TotalExpiredBatches', 3, dimensions=[{'Name': 'Type', 'Value': 'CurrentCount'}])
+
+        first, second = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(first['PageViews'], 1)
+        self.assertEqual(first['_aws']['CloudWatchMetrics'],
+                         [{'Namespace': 'FoodInventory', 'Dimensions': [[]], 'Metrics': [{'Name': 'PageViews', 'Unit': 'Count'}]}])
+        self.assertEqual(second['Type'], 'CurrentCount')
+        self.assertEqual(second['_aws']['CloudWatchMetrics'][0]['Dimensions'], [['Type']])
+        self.assertEqual(sink.stats(), {'sink': 'emf', 'lines': 2})
+
+        sink.put('RequestLatency', 4.0, 'Milliseconds', count=250)
+        values = [json.loads(line)['RequestLatency'] for line in output.getvalue().splitlines()[2:]]
+        self.assertEqual([len(line) for line in values], [100, 100, 50])
+        self.assertEqual({value for line in values for value in line}, {4.0})
+
+        self.assertIs(get_metric_sink('none'), get_metric_sink('none'))
+        with self.assertRaises(ValueError):
+            get_metric_sink('statsd')
+
+
+class DashboardMetricsTests(SimpleTestCase):
+    def test_one_request_feeds_every_series_and_is_shared_until_stale(self):
+        hour = datetime(2024, 5, 1, 12)
+        pages = [
+            {'MetricDataResults': [
+                {'Id': 'total_expired_batches', 'Timestamps': [hour.replace(minute=55), hour], 'Values': [4.0, 2.0]},
+                {'Id': 'page_views', 'Timestamps': [hour], 'Values': [30.0]},
+            ], 'NextToken': 'more'},
+            {'MetricDataResults': [{'Id': 'page_views', 'Timestamps': [hour.replace(hour=11)], 'Values': [12.0]}]},
+        ]
+        client = mock.Mock()
+        client.get_metric_data.side_effect = lambda **params: dict(pages[1] if 'NextToken' in params else pages[0])
+        now = [1000.0]
+        dashboard = DashboardMetrics(ttl=60, stale_ttl=600, clock=lambda: now[0], client_factory=lambda: client)
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(dashboard.get())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        metrics = results[0]
+        self.assertEqual(metrics['total_expired_batches'], 4.0)
+        self.assertEqual(metrics['total_safe_batches'], 0)
+        self.assertEqual(metrics['page_views'], 42.0)
+        queries = client.get_metric_data.call_args_list[0].kwargs['MetricDataQueries']
+        self.assertEqual(len(queries), 5)
+        # 8 concurrent viewers, one request of two pages
+        self.assertEqual(client.get_metric_data.call_count, 2)
+
+        now[0] += 120
+        self.assertIs(dashboard.get(), metrics)
+        for thread in threading.enumerate():
+            if thread.name == 'dashboard-refresh':
+                thread.join()
+        self.assertEqual(client.get_metric_data.call_count, 4)
+        self.assertIsNot(dashboard.get(), metrics)
+
+
+class LatencyHistogramTests(SimpleTestCase):
+    def test_buckets_bound_every_value_within_a_sixteenth(self):
+        for micros in list(range(100)) + [1000, 4095, 4096, 123456, 10 ** 7]:
+            low, high = bucket_bounds(bucket_index(micros))
+            self.assertLessEqual(low, micros)
+            self.assertGreaterEqual(high, micros)
+            self.assertLessEqual(high - low, max(low, 1) / 16)
+
+    def test_percentiles_merge_threads_and_publish_only_new_requests(self):
+        recorder = LatencyRecorder(publish=False)
+
+        def worker(offset):
+            for ms in range(offset, 1000, 4):
+                recorder.record('batch_list', 'GET', 200, (ms + 1) / 1000)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        recorder.record('batch_list', 'GET', 500, 0.002)
+
+        rows = recorder.summary()
+        self.assertEqual([(row['status'], row['count']) for row in rows], [(200, 1000), (500, 1)])
+        for q, exact in ((50, 500), (95, 950), (99, 990)):
+            self.assertAlmostEqual(rows[0][f'p{q}_ms'], exact, delta=exact / 16)
+        self.assertEqual(percentiles({}), {50: None, 95: None, 99: None})
+
+        with mock.patch('inventory.cloudwatch_utils.cloudwatch_manager') as manager:
+            recorder.flush()
+            # The whole histogram goes out as bucket midpoints with counts, so CloudWatch can merge workers
+            latency = [c for c in manager.put_metric.call_args_list if c.args[0] == 'RequestLatency']
+            self.assertEqual(sum(c.kwargs['count'] for c in latency), 1001)
+            published = {}
+            for c in latency:
+                if c.kwargs['dimensions'][-1]['Value'] == '200':
+                    published[bucket_index(int(c.args[1] * 1000))] = c.kwargs['count']
+            self.assertEqual(percentiles(published), percentiles(recorder.snapshot()[('batch_list', 'GET', 200)]))
+            recorder.record('batch_list', 'GET', 500, 0.004)
+            manager.put_metric.reset_mock()
+            recorder.flush()
+        self.assertEqual([c.args for c in manager.put_metric.call_args_list],
+                         [('RequestCount', 1, 'Count'), ('RequestLatency', bucket_midpoint_ms(bucket_index(4000)), 'Milliseconds')])
+        self.assertEqual(manager.put_metric.call_args.kwargs['count'], 1)
+        dimensions = manager.put_metric.call_args.kwargs['dimensions']
+        self.assertEqual(dimensions[-1], {'Name': 'Status', 'Value': '500'})
+
+    def test_exited_threads_are_folded_away(self):
+        recorder = LatencyRecorder(publish=False)
+        for n in range(150):
+            # A thread per request, as runserver does
+            thread = threading.Thread(target=recorder.record, args=('batch_list', 'GET', 200, 0.001 * (n % 3 + 1)))
+            thread.start()
+            thread.join()
+        self.assertLess(len(recorder._stores), 64)
+
+        self.assertEqual(recorder.summary()[0]['count'], 150)
+        self.assertEqual(recorder._stores, [])
+        recorder.record('batch_list', 'GET', 200, 0.002)
+        self.assertEqual(recorder.summary()[0]['count'], 151)
@@ -6,6 +6,8 @@ urlpatterns = [
     # Web UI URLs
     path('', views.batch_list, name='batch_list'),
     path('batch/create/', views.batch_create, name='batch_create'),
+    path('batch/upload-policy/', views.batch_upload_policy, name='batch_upload_policy'),
+    path('batch/<str:batch_id>/image/', views.batch_image, name='batch_image'),
     path('batch/<str:batch_id>/update/', views.batch_update, name='batch_update'),
     path('batch/<str:batch_id>/delete/', views.batch_delete, name='batch_delete'),
     path('users/', views.user_list, name='user_list'),
@@ -16,9 +18,11 @@ urlpatterns = [
     
     # API Endpoints
     path('api/batches/', api_views.api_batch_list, name='api_batch_list'),
+    path('api/batches/bulk/', api_views.api_batch_bulk_create, name='api_batch_bulk_create'),
     path('api/batches/<str:batch_id>/', api_views.api_batch_detail, name='api_batch_detail'),
     path('api/batches/create/', api_views.api_batch_create, name='api_batch_create'),
     path('api/batches/<str:batch_id>/update/', api_views.api_batch_update, name='api_batch_update'),
     path('api/batches/<str:batch_id>/delete/', api_views.api_batch_delete, name='api_batch_delete'),
     path('api/metrics/', api_views.api_metrics, name='api_metrics'),
+    path('api/metrics/latency/', api_views.api_latency, name='api_latency'),
 ] 
\ No newline at end of file
@@ -4,92 +4,68 @@ from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.core.paginator import Paginator
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
 from .models import InventoryBatch, User
 from .forms import InventoryBatchForm, CustomUserCreationForm, UserProfileForm
-import boto3
 import uuid
-import os
-from .dynamodb_models import DynamoDBInventory
+from .aws_clients import get_client
+from .direct_uploads import presigned_upload, upload_path, verify_upload
+from .dashboard_metrics import dashboard_metrics
+from .dynamodb_models import VersionConflict, clamp_page_size
+from .image_derivatives import pick_variant, variant_paths
+from .inventory_cache import CachedDynamoDBInventory
+from .media_jobs import queue_delete, queue_image
+from .presigned_urls import presigned_media_url
 from datetime import datetime
 from .cloudwatch_utils import cloudwatch_manager
-from django.http import JsonResponse
+from django.http import Http404, HttpResponseRedirect, JsonResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from django.views.decorators.csrf import ensure_csrf_cookie
 from .models import SupplyRequest
 
-def get_s3_client():
-    return boto3.client('s3',
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-        aws_session_token=settings.AWS_SESSION_TOKEN,
-        region_name=settings.AWS_S3_REGION_NAME
-    )
+def pending_image(request, batch_id):
+    """Batch fields and media job arguments for the image submitted with a batch form.
 
-def upload_to_s3(file, filename):
-    s3_client = get_s3_client()
-    try:
-        # Reset file pointer
-        file.seek(0)
-        
-        # Upload to S3
-        s3_client.upload_fileobj(
-            file,
-            settings.AWS_STORAGE_BUCKET_NAME,
-            f'media/product_images/{filename}',
-            ExtraArgs={
-                'ContentType': file.content_type
-            }
-        )
-        print(f"File uploaded to S3: media/product_images/{filename}")
-        
-        # Log to CloudWatch
-        cloudwatch_manager.log_event(
-            'FoodInventory/S3', 
-            'uploads', 
-            f"Image uploaded: {filename}"
-        )
-        
-        return f'product_images/{filename}'
-    except Exception as e:
-        print(f"Error uploading to S3: {str(e)}")
-        
-        # Log error to CloudWatch
-        cloudwatch_manager.log_event(
-            'FoodInventory/S3', 
-            'errors', 
-            f"S3 upload failed: {str(e)}", 
-            'ERROR'
-        )
-        
-        return None
+    A direct browser upload (image_key) is verified here; a file posted through
+    the form is checked against the same type and size limits and uploaded to
+    S3 before the batch is saved, so the queued job only carries its key.
+    Thumbnails are built in the background once the batch is saved (see
+    queue_image). Returns ({}, None) when there is no usable image.
+    """
+    image_key = request.POST.get('image_key')
+    if image_key:
+        try:
+            image_path = verify_upload(batch_id, image_key)
+        except ValueError as e:
+            messages.error(request, f'Image upload rejected: {str(e)}')
+            print(f"Image upload rejected: {str(e)}")
+            return {}, None
+    elif 'image' in request.FILES:
+        image_file = request.FILES['image']
+        try:
+            image_path = upload_path(batch_id, image_file.content_type)
+            if not 0 < image_file.size <= settings.PRODUCT_IMAGE_MAX_BYTES:
+                raise ValueError('Image is empty or too large')
+        except ValueError as e:
+            messages.error(request, f'Image upload rejected: {str(e)}')
+            return {}, None
+        try:
+            # Streams from Django's upload (a temporary file past FILE_UPLOAD_MAX_MEMORY_SIZE)
+            get_client('s3').upload_fileobj(
+                image_file,
+                settings.AWS_STORAGE_BUCKET_NAME,
+                f'media/{image_path}',
+                ExtraArgs={'ContentType': image_file.content_type}
+            )
+        except Exception as e:
+            messages.error(request, f'Image upload failed: {str(e)}')
+            print(f"Error uploading image: {str(e)}")
+            return {}, None
+    else:
+        return {}, None
 
-def delete_from_s3(file_path):
-    if not file_path:
-        return
-    
-    s3_client = get_s3_client()
-    try:
-        s3_client.delete_object(
-            Bucket=settings.AWS_STORAGE_BUCKET_NAME,
-            Key=f'media/{file_path}'
-        )
-        
-        # Log to CloudWatch
-        cloudwatch_manager.log_event(
-            'FoodInventory/S3', 
-            'deletes', 
-            f"Image deleted: {file_path}"
-        )
-        
-    except Exception as e:
-        print(f"Error deleting from S3: {str(e)}")
-        
-        # Log error to CloudWatch
-        cloudwatch_manager.log_event(
-            'FoodInventory/S3', 
-            'errors', 
-            f"S3 delete failed: {str(e)}", 
-            'ERROR'
-        )
+    # An empty map also hides the thumbnails of a previous image until the new ones exist
+    return {'image': image_path, 'image_state': 'pending', 'image_variants': {}}, (batch_id, image_path)
 
 def is_manufacturer(user):
     return user.is_authenticated and user.is_manufacturer()
@@ -145,13 +121,28 @@ def profile(request):
         form = UserProfileForm(instance=request.user)
     return render(request, 'registration/profile.html', {'form': form})
 
-# Initialize DynamoDB
-db = DynamoDBInventory()
+# Built on first use so importing the URLconf has no side effects
+db = SimpleLazyObject(CachedDynamoDBInventory)
+
+# Only the attributes the batch list template renders; images load through batch_image
+BATCH_LIST_FIELDS = ['batch_id', 'product_name', 'expiry_date', 'quantity', 'status', 'image_url', 'image_state']
 
 @login_required
 def batch_list(request):
-    # Get all batches from DynamoDB
-    batches = db.list_batches()
+    # Filter by status if specified
+    status_filter = request.GET.get('status', '')
+    status = status_filter if status_filter and status_filter != 'All' else None
+
+    # Fetch one page of batches from DynamoDB
+    cursor = request.GET.get('cursor') or None
+    try:
+        limit = clamp_page_size(request.GET.get('limit'))
+        batches, next_cursor = db.list_batches_page(
+            limit=limit, cursor=cursor, status=status, fields=BATCH_LIST_FIELDS
+        )
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect('batch_list')
     
     # Log page view
     cloudwatch_manager.log_event(
@@ -163,25 +154,16 @@ def batch_list(request):
     # Put metric for page views
     cloudwatch_manager.put_metric('PageViews', 1)
     
-    # Filter by status if specified
-    status_filter = request.GET.get('status', '')
-    if status_filter and status_filter != 'All':
-        batches = [b for b in batches if b['status'] == status_filter]
-    
-    # Convert date strings to datetime objects for template
-    for batch in batches:
-        batch['expiry_date'] = datetime.strptime(batch['expiry_date'], '%Y-%m-%d').date()
-        batch['production_date'] = datetime.strptime(batch['production_date'], '%Y-%m-%d').date()
-        # Add edit permission flag
-        batch['can_edit'] = request.user.is_manufacturer()
-    
-    # Update batch status metrics
-    cloudwatch_manager.update_batch_status_metrics(batches)
+    # Update batch status metrics from the materialized counters (a parallel scan only if they are missing)
+    cloudwatch_manager.put_status_count_metrics(db.summarize_batches()['status_counts'])
     
     context = {
         'batches': batches,
         'status_filter': status_filter,
         'status_choices': ['All', 'Safe', 'Expiring Soon', 'Expired'],
+        'cursor': cursor,
+        'next_cursor': next_cursor,
+        'limit': limit,
         'AWS_STORAGE_BUCKET_NAME': settings.AWS_STORAGE_BUCKET_NAME,
         'AWS_S3_REGION_NAME': settings.AWS_S3_REGION_NAME,
         'debug': settings.DEBUG,
@@ -189,6 +171,45 @@ def batch_list(request):
     }
     return render(request, 'inventory/batch_list.html', context)
 
+@login_required
+def batch_image(request, batch_id):
+    """Redirect to a pre-signed URL for the batch image, signed only when the browser asks for it.
+
+    With ?size=N the smallest thumbnail covering N pixels is served instead of
+    the original, as WebP when the browser accepts it.
+    """
+    batch = db.get_batch(batch_id, fields=['image_url', 'image_variants'])
+    if not batch or not batch.image_url:
+        raise Http404('Batch has no image')
+
+    image_path = batch.image_url
+    size = request.GET.get('size', '')
+    if size.isdigit():
+        accept_webp = 'image/webp' in request.headers.get('Accept', '')
+        image_path = pick_variant(batch.image_variants, int(size), accept_webp) or image_path
+    url = presigned_media_url(image_path)
+    if not url:
+        raise Http404('Image URL could not be signed')
+
+    response = HttpResponseRedirect(url)
+    # The signed URL stays valid for at least the cache margin, so browsers may reuse the redirect that long
+    patch_cache_control(response, private=True, max_age=settings.PRESIGNED_URL_CACHE_MARGIN)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+@login_required
+@user_passes_test(is_manufacturer)
+def batch_upload_policy(request):
+    """Presigned POST for uploading a batch image from the browser straight to S3"""
+    try:
+        upload = presigned_upload(request.GET.get('batch_id'), request.GET.get('content_type'))
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except Exception as e:
+        print(f"Error creating upload policy: {str(e)}")
+        return JsonResponse({'status': 'error', 'message': 'Could not create an upload policy'}, status=500)
+    return JsonResponse({'status': 'success', 'data': upload})
+
 @login_required
 @user_passes_test(is_manufacturer)
 def batch_create(request):
@@ -212,19 +233,14 @@ def batch_create(request):
             batch_data['status'] = 'Safe'
         
         # Handle image upload
-        if 'image' in request.FILES:
-            image_file = request.FILES['image']
-            filename = f"{batch_data['batch_id']}{os.path.splitext(image_file.name)[1]}"
-            s3_path = upload_to_s3(image_file, filename)
-            if s3_path:
-                batch_data['image'] = s3_path
-                print(f"Image uploaded successfully. Path: {s3_path}")
-            else:
-                print("Failed to upload image to S3")
+        image_fields, image_job = pending_image(request, batch_data['batch_id'])
+        batch_data.update(image_fields)
         
         # Save to DynamoDB
         try:
             db.create_batch(batch_data)
+            if image_job:
+                queue_image(db, *image_job)
             
             # Log successful batch creation
             cloudwatch_manager.log_event(
@@ -260,8 +276,8 @@ def batch_create(request):
 @login_required
 @user_passes_test(is_manufacturer)
 def batch_update(request, batch_id):
-    # Get existing batch
-    batch = db.get_batch(batch_id)
+    # Get existing batch; its version goes into the form, so read past the cache
+    batch = db.get_batch(batch_id, consistent=True)
     if not batch:
         messages.error(request, 'Batch not found!')
         return redirect('batch_list')
@@ -285,24 +301,25 @@ def batch_update(request, batch_id):
             update_data['status'] = 'Safe'
         
         # Handle image upload
-        if 'image' in request.FILES:
-            image_file = request.FILES['image']
-            s3_path = upload_to_s3(image_file, f"{batch_id}{os.path.splitext(image_file.name)[1]}")
-            if s3_path:
-                update_data['image'] = s3_path
+        image_fields, image_job = pending_image(request, batch_id)
+        update_data.update(image_fields)
+        
+        # The version the form was loaded with makes the write conditional (optimistic concurrency)
+        version = request.POST.get('version', '')
         
         # Update in DynamoDB
         try:
-            db.update_batch(batch_id, update_data)
+            db.update_batch(batch_id, update_data, expected_version=int(version) if version.isdigit() else None)
+            if image_job:
+                queue_image(db, *image_job)
             messages.success(request, 'Batch updated successfully!')
             return redirect('batch_list')
+        except VersionConflict:
+            messages.error(request, 'This batch was changed by someone else; review the current values and save again.')
+            batch = db.get_batch(batch_id, consistent=True) or batch
         except Exception as e:
             messages.error(request, f'Error updating batch: {str(e)}')
     
-    # Convert date strings to date objects for form
-    batch['expiry_date'] = datetime.strptime(batch['expiry_date'], '%Y-%m-%d').date()
-    batch['production_date'] = datetime.strptime(batch['production_date'], '%Y-%m-%d').date()
-    
     return render(request, 'inventory/batch_form.html', {
         'title': 'Update Batch',
         'batch': batch
@@ -322,8 +339,8 @@ def batch_delete(request, batch_id):
             db.delete_batch(batch_id)
             
             # Delete image from S3 if exists
-            if batch.get('image'):
-                delete_from_s3(batch['image'])
+            if batch.image_url:
+                queue_delete(batch.image_url, *variant_paths(batch.image_variants))
             
             messages.success(request, 'Batch deleted successfully!')
         except Exception as e:
@@ -343,38 +360,17 @@ def user_list(request):
 def cloudwatch_dashboard(request):
     """Display CloudWatch metrics dashboard"""
     try:
-        from datetime import timedelta
-        
-        # Get current metrics
-        metrics_data = {
-            'total_expired_batches': [{
-                'Maximum': cloudwatch_manager.get_current_metrics('TotalExpiredBatches')
-            }],
-            'total_expiring_soon_batches': [{
-                'Maximum': cloudwatch_manager.get_current_metrics('TotalExpiringSoonBatches')
-            }],
-            'total_safe_batches': [{
-                'Maximum': cloudwatch_manager.get_current_metrics('TotalSafeBatches')
-            }],
-        }
-        
-        # Get historical metrics for trends (last 24 hours)
-        end_time = datetime.utcnow()
-        start_time = end_time - timedelta(hours=24)
-        
-        metrics_data.update({
-            'page_views': cloudwatch_manager.get_metrics('PageViews', start_time, end_time),
-            'batch_created': cloudwatch_manager.get_metrics('BatchCreated', start_time, end_time),
-        })
+        # Every series comes from one cached GetMetricData request
+        metrics = dashboard_metrics.get()
         
-        # Calculate summary statistics
-        total_batches = len(db.list_batches())
+        # The batch total is read from the materialized counters, not a scan
+        total_batches = db.summarize_batches()['total_batches']
         
         context = {
-            'metrics_data': metrics_data,
+            'metrics': metrics,
             'total_batches': total_batches,
-            'start_time': start_time,
-            'end_time': end_time,
+            'start_time': metrics['start_time'],
+            'end_time': metrics['end_time'],
         }
         
         return render(request, 'inventory/cloudwatch_dashboard.html', context)
@@ -0,0 +1,72 @@
+import os
+from collections import Counter
+
+# Lambda-side copy of the counter layout in inventory/aggregates.py; keep the two in sync
+AGGREGATES_TABLE = os.environ.get('AGGREGATES_TABLE', 'InventoryAggregates')
+AGGREGATE_ID = 'inventory'
+STATUSES = ('Safe', 'Expiring Soon', 'Expired')
+
+
+def status_move(old_status, new_status):
+    """Counter changes for one batch moving from old_status to new_status"""
+    delta = Counter()
+    if old_status in STATUSES:
+        delta[f'status_count:{old_status}'] -= 1
+    if new_status in STATUSES:
+        delta[f'status_count:{new_status}'] += 1
+    return delta
+
+
+def apply_delta(aggregates_table, delta):
+    """ADD every non-zero counter in delta to the aggregate item with one UpdateItem.
+
+    Does nothing until reconcile_aggregates has created the item; an ADD on a
+    missing item would start partial counters that readers then trust.
+    """
+    changes = [(attribute, value) for attribute, value in delta.items() if value]
+    if not changes:
+        return
+
+    try:
+        aggregates_table.update_item(
+            Key={'aggregate_id': AGGREGATE_ID},
+            UpdateExpression='ADD ' + ', '.join(f'#a{i} :v{i}' for i in range(len(changes))),
+            ConditionExpression='attribute_exists(aggregate_id)',
+            ExpressionAttributeNames={f'#a{i}': attribute for i, (attribute, _) in enumerate(changes)},
+            ExpressionAttributeValues={f':v{i}': value for i, (_, value) in enumerate(changes)}
+        )
+    except aggregates_table.meta.client.exceptions.ConditionalCheckFailedException:
+        print("Inventory aggregates not built yet; run reconcile_aggregates")
+
+
+def update_status_if_unchanged(table, batch_id, current_status, new_status, extra_set=None):
+    """Move a batch to new_status only if it still has current_status.
+
+    Returns False when another writer changed the status first, so counters
+    are only moved for transitions this run actually made.
+    """
+    update_expression = 'SET #status = :status'
+    names = {'#status': 'status'}
+    values = {':status': new_status}
+    for index, (attribute, value) in enumerate((extra_set or {}).items()):
+        update_expression += f', #x{index} = :x{index}'
+        names[f'#x{index}'] = attribute
+        values[f':x{index}'] = value
+
+    if current_status is None:
+        condition = 'attribute_not_exists(#status)'
+    else:
+        condition = '#status = :current'
+        values[':current'] = current_status
+
+    try:
+        table.update_item(
+            Key={'batch_id': batch_id},
+            UpdateExpression=update_expression,
+            ConditionExpression=condition,
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values
+        )
+        return True
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        return False
@@ -2,8 +2,13 @@ import boto3
 import os
 from datetime import datetime, timedelta
 import json
+from collections import Counter
+from parallel_scan import parallel_scan, DEFAULT_TOTAL_SEGMENTS
+from aggregates import AGGREGATES_TABLE, apply_delta, status_move, update_status_if_unchanged
+from emf import put_metrics
 
 def lambda_handler(event, context):
+    started = datetime.now()
     try:
         session = boto3.Session(
             aws_access_key_id=os.environ['AWS_ACCESS_KEY_ID'],
@@ -14,53 +19,73 @@ def lambda_handler(event, context):
         
         # Initialize DynamoDB and SQS
         dynamodb = session.resource('dynamodb')
-        table = dynamodb.Table('InventoryBatches')
+        aggregates_table = dynamodb.Table(AGGREGATES_TABLE)
+        # Each scan segment's thread gets its own resource; resources are not thread-safe
+        tables = [
+            session.resource('dynamodb').Table('InventoryBatches')
+            for _ in range(DEFAULT_TOTAL_SEGMENTS)
+        ]
         sqs = session.client('sqs')
         
         # Get the SQS queue URL from environment variable
         queue_url = os.environ['SQS_QUEUE_URL']
         
-        # Scan DynamoDB for all batches
-        response = table.scan()
-        items = response.get('Items', [])
-        updates_made = 0
-        notifications = []
+        # Scan DynamoDB for all batches, one result slot per segment
+        results = [
+            {'checked': 0, 'updates': 0, 'notifications': [], 'moves': Counter()}
+            for _ in range(DEFAULT_TOTAL_SEGMENTS)
+        ]
+        today = datetime.now().date()
 
-        for item in items:
-            current_status = item.get('status')
-            expiry_date = datetime.strptime(item['expiry_date'], '%Y-%m-%d').date()
-            days_to_expiry = (expiry_date - datetime.now().date()).days
-            
-            # Calculate new status
-            if days_to_expiry < 0:
-                new_status = 'Expired'
-            elif days_to_expiry <= 7:
-                new_status = 'Expiring Soon'
-            else:
-                new_status = 'Safe'
-            
-            # Update status if changed
-            if current_status != new_status:
-                table.update_item(
-                    Key={'batch_id': item['batch_id']},
-                    UpdateExpression='SET #status = :status, updated_at = :updated_at',
-                    ExpressionAttributeNames={'#status': 'status'},
-                    ExpressionAttributeValues={
-                        ':status': new_status,
-                        ':updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    }
-                )
-                updates_made += 1
+        def check_items(segment, items):
+            result = results[segment]
+            result['checked'] += len(items)
+            for item in items:
+                current_status = item.get('status')
+                expiry_date = datetime.strptime(item['expiry_date'], '%Y-%m-%d').date()
+                days_to_expiry = (expiry_date - today).days
+                
+                # Calculate new status
+                if days_to_expiry < 0:
+                    new_status = 'Expired'
+                elif days_to_expiry <= 7:
+                    new_status = 'Expiring Soon'
+                else:
+                    new_status = 'Safe'
                 
-                # Add to notifications if expired or expiring soon
-                if new_status in ['Expired', 'Expiring Soon']:
-                    notifications.append({
-                        'batch_id': item['batch_id'],
-                        'product_name': item['product_name'],
-                        'expiry_date': item['expiry_date'],
-                        'status': new_status,
-                        'days_to_expiry': days_to_expiry
-                    })
+                # Update status if changed (and nobody else changed it meanwhile)
+                if current_status != new_status and update_status_if_unchanged(
+                    tables[segment], item['batch_id'], current_status, new_status,
+                    {'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+                ):
+                    result['updates'] += 1
+                    result['moves'].update(status_move(current_status, new_status))
+                    
+                    # Add to notifications if expired or expiring soon
+                    if new_status in ['Expired', 'Expiring Soon']:
+                        result['notifications'].append({
+                            'batch_id': item['batch_id'],
+                            'product_name': item['product_name'],
+                            'expiry_date': item['expiry_date'],
+                            'status': new_status,
+                            'days_to_expiry': days_to_expiry
+                        })
+
+        parallel_scan(tables, check_items)
+
+        # Merge per-segment results in segment order
+        items_checked = sum(r['checked'] for r in results)
+        updates_made = sum(r['updates'] for r in results)
+        notifications = [n for r in results for n in r['notifications']]
+
+        # One ADD moves the status counters for every transition made in this run
+        moves = Counter()
+        for r in results:
+            moves.update(r['moves'])
+        try:
+            apply_delta(aggregates_table, moves)
+        except Exception as e:
+            print(f"Error updating inventory aggregates: {str(e)}")
         
         # Send notifications to SQS if there are any
         if notifications:
@@ -88,11 +113,18 @@ def lambda_handler(event, context):
                 }
             )
             print(f"Sent notification to SQS for {len(notifications)} items")
+
+        put_metrics('FoodInventory', {
+            'BatchesChecked': (items_checked, 'Count'),
+            'StatusUpdates': (updates_made, 'Count'),
+            'NotificationsSent': (len(notifications), 'Count'),
+            'ExpiryCheckDuration': ((datetime.now() - started).total_seconds() * 1000, 'Milliseconds'),
+        }, {'Function': 'check_expiry'})
         
         return {
             'statusCode': 200,
             'body': json.dumps({
-                'message': f'Successfully checked {len(items)} batches. Updated {updates_made} items.',
+                'message': f'Successfully checked {items_checked} batches. Updated {updates_made} items.',
                 'notifications_sent': len(notifications)
             })
         }
@@ -2,12 +2,21 @@ import boto3
 import os
 from datetime import datetime
 from botocore.exceptions import ClientError
+from collections import Counter
+from parallel_scan import parallel_scan, DEFAULT_TOTAL_SEGMENTS
+from aggregates import AGGREGATES_TABLE, apply_delta, status_move, update_status_if_unchanged
+from emf import put_metrics
 
 def get_dynamodb_table():
     """Get DynamoDB table resource"""
     dynamodb = boto3.resource('dynamodb')
     return dynamodb.Table(os.environ['DYNAMODB_TABLE'])
 
+def get_aggregates_table():
+    """Get the aggregate counters table resource"""
+    dynamodb = boto3.resource('dynamodb')
+    return dynamodb.Table(AGGREGATES_TABLE)
+
 def send_email(subject, body, recipient):
     """Send email using SES"""
     ses = boto3.client('ses')
@@ -41,37 +50,51 @@ def check_expiry_status(expiry_date):
 
 def lambda_handler(event, context):
     """Main Lambda function handler"""
+    started = datetime.now()
     try:
-        # Get DynamoDB table
-        table = get_dynamodb_table()
+        # One table resource per scan segment; resources are not thread-safe
+        tables = [get_dynamodb_table() for _ in range(DEFAULT_TOTAL_SEGMENTS)]
         
-        # Scan all items
-        response = table.scan()
-        items = response.get('Items', [])
+        # Scan all items in parallel, tracking results per segment
+        results = [
+            {'checked': 0, 'expiring_soon': [], 'expired': [], 'moves': Counter()}
+            for _ in range(DEFAULT_TOTAL_SEGMENTS)
+        ]
         
-        # Track items needing attention
-        expiring_soon = []
-        expired = []
+        def check_items(segment, items):
+            result = results[segment]
+            result['checked'] += len(items)
+            for item in items:
+                current_status = item.get('status')
+                new_status = check_expiry_status(item['expiry_date'])
+                
+                # Update status if changed (and nobody else changed it meanwhile)
+                if current_status != new_status and update_status_if_unchanged(
+                    tables[segment], item['batch_id'], current_status, new_status
+                ):
+                    result['moves'].update(status_move(current_status, new_status))
+                
+                # Track items needing attention
+                if new_status == "Expiring Soon":
+                    result['expiring_soon'].append(item)
+                elif new_status == "Expired":
+                    result['expired'].append(item)
         
-        # Check each batch
-        for item in items:
-            current_status = item.get('status')
-            new_status = check_expiry_status(item['expiry_date'])
-            
-            # Update status if changed
-            if current_status != new_status:
-                table.update_item(
-                    Key={'batch_id': item['batch_id']},
-                    UpdateExpression='SET #status = :status',
-                    ExpressionAttributeNames={'#status': 'status'},
-                    ExpressionAttributeValues={':status': new_status}
-                )
-            
-            # Track items needing attention
-            if new_status == "Expiring Soon":
-                expiring_soon.append(item)
-            elif new_status == "Expired":
-                expired.append(item)
+        parallel_scan(tables, check_items)
+        
+        # Merge per-segment results in segment order
+        items_checked = sum(r['checked'] for r in results)
+        expiring_soon = [item for r in results for item in r['expiring_soon']]
+        expired = [item for r in results for item in r['expired']]
+
+        # One ADD moves the status counters for every transition made in this run
+        moves = Counter()
+        for r in results:
+            moves.update(r['moves'])
+        try:
+            apply_delta(get_aggregates_table(), moves)
+        except Exception as e:
+            print(f"Error updating inventory aggregates: {str(e)}")
 
         if expiring_soon or expired:
 
@@ -91,10 +114,18 @@ def lambda_handler(event, context):
             
 
             send_email(subject, body, os.environ['NOTIFICATION_EMAIL'])
+
+        put_metrics('FoodInventory', {
+            'BatchesChecked': (items_checked, 'Count'),
+            'StatusUpdates': (sum(value for value in moves.values() if value > 0), 'Count'),
+            'ExpiringSoonFound': (len(expiring_soon), 'Count'),
+            'ExpiredFound': (len(expired), 'Count'),
+            'ExpiryCheckDuration': ((datetime.now() - started).total_seconds() * 1000, 'Milliseconds'),
+        }, {'Function': 'daily_expiry_check'})
         
         return {
             'statusCode': 200,
-            'body': f'Successfully checked {len(items)} batches. Found {len(expiring_soon)} expiring soon and {len(expired)} expired.'
+            'body': f'Successfully checked {items_checked} batches. Found {len(expiring_soon)} expiring soon and {len(expired)} expired.'
         }
         
     except Exception as e:
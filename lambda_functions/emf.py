@@ -0,0 +1,41 @@
+import json
+import time
+
+# Lambda-side copy of inventory/emf.py; keep the two in sync
+
+# CloudWatch Embedded Metric Format limits per document
+MAX_METRICS_PER_DOCUMENT = 100
+MAX_VALUES_PER_METRIC = 100
+
+
+def emf_document(namespace, metrics, dimensions=None, timestamp=None):
+    """One EMF log line publishing `metrics` ({name: (value or [values], unit)}).
+
+    `dimensions` ({name: value}) become one dimension set shared by every
+    metric in the document; CloudWatch Logs extracts the metrics when the
+    line reaches a log group, so no metrics API call is made.
+    """
+    if len(metrics) > MAX_METRICS_PER_DOCUMENT:
+        raise ValueError(f'An EMF document holds at most {MAX_METRICS_PER_DOCUMENT} metrics')
+    dimensions = dimensions or {}
+    document = {
+        '_aws': {
+            'Timestamp': int((timestamp or time.time()) * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': namespace,
+                'Dimensions': [list(dimensions)],
+                'Metrics': [{'Name': name, 'Unit': unit} for name, (_, unit) in metrics.items()],
+            }],
+        },
+    }
+    document.update(dimensions)
+    for name, (value, _) in metrics.items():
+        if isinstance(value, (list, tuple)) and len(value) > MAX_VALUES_PER_METRIC:
+            raise ValueError(f'An EMF metric holds at most {MAX_VALUES_PER_METRIC} values')
+        document[name] = value
+    return json.dumps(document, separators=(',', ':'), default=str)
+
+
+def put_metrics(namespace, metrics, dimensions=None):
+    """Print one EMF line; Lambda ships stdout to CloudWatch Logs, which extracts the metrics"""
+    print(emf_document(namespace, metrics, dimensions))
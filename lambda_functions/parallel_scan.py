@@ -0,0 +1,43 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Lambda-side copy of inventory/parallel_scan.py; the Lambda bundle cannot import the Django app
+DEFAULT_TOTAL_SEGMENTS = max(1, int(os.environ.get('SCAN_TOTAL_SEGMENTS', '4')))
+
+
+def scan_segment(table, segment, total_segments, callback, **scan_kwargs):
+    """Scan one segment page by page and pass every page to callback(segment, items)"""
+    if total_segments > 1:
+        scan_kwargs['Segment'] = segment
+        scan_kwargs['TotalSegments'] = total_segments
+
+    while True:
+        response = table.scan(**scan_kwargs)
+        callback(segment, response.get('Items', []))
+
+        start_key = response.get('LastEvaluatedKey')
+        if not start_key:
+            return
+        scan_kwargs['ExclusiveStartKey'] = start_key
+
+
+def parallel_scan(tables, callback, max_workers=None, **scan_kwargs):
+    """Scan the whole table with Segment/TotalSegments over a thread pool.
+
+    `tables` holds one Table per segment (boto3 resources must not be shared
+    across threads), all created on the calling thread; segment n is scanned
+    with tables[n]. callback(segment, items) runs on the worker threads;
+    callbacks for different segments may run concurrently.
+    """
+    total_segments = len(tables)
+    if total_segments <= 1:
+        scan_segment(tables[0], 0, 1, callback, **scan_kwargs)
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers or total_segments) as executor:
+        futures = [
+            executor.submit(scan_segment, table, segment, total_segments, callback, **scan_kwargs)
+            for segment, table in enumerate(tables)
+        ]
+        for future in futures:
+            future.result()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""Micro-benchmark: per-item generate_presigned_url vs S3BatchPresigner.
+
+Signs the same N object keys both ways with throwaway credentials (signing
+is local, nothing is sent to AWS), checks that the URLs are identical for a
+fixed timestamp and prints URLs per second for each path.
+
+    python scripts/bench_presign.py --keys 2000 --repeat 5
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from unittest import mock
+
+import boto3
+from botocore.config import Config
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from inventory.s3_presigner import S3BatchPresigner  # noqa: E402
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-item and batch S3 URL signing')
+    parser.add_argument('--keys', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--region', default='us-east-1')
+    parser.add_argument('--bucket', default='inventory-media')
+    args = parser.parse_args()
+
+    session = boto3.Session(aws_access_key_id='AKIDEXAMPLE', aws_secret_access_key='bench-secret',
+                            aws_session_token='bench-token', region_name=args.region)
+    client = session.client('s3', config=Config(signature_version='s3v4'))
+    presigner = S3BatchPresigner(client, args.bucket, session.get_credentials())
+    keys = [f'media/product_images/BATCH-{i:06d}.jpg' for i in range(args.keys)]
+
+    def per_item():
+        return {
+            key: client.generate_presigned_url('get_object', Params={'Bucket': args.bucket, 'Key': key},
+                                               ExpiresIn=3600)
+            for key in keys
+        }
+
+    # Same timestamp for both paths, so the URLs must match exactly
+    now = datetime.utcnow().replace(microsecond=0)
+    with mock.patch('botocore.auth.datetime') as botocore_datetime:
+        botocore_datetime.datetime.utcnow.return_value = now
+        if per_item() != presigner.presign(keys, 3600, now=now):
+            print('URL mismatch between botocore and S3BatchPresigner')
+            return 1
+
+    item_seconds = best_of(args.repeat, per_item)
+    batch_seconds = best_of(args.repeat, lambda: presigner.presign(keys, 3600))
+    print(f"keys={args.keys} best of {args.repeat}")
+    print(f"generate_presigned_url: {item_seconds * 1000:8.1f} ms  {args.keys / item_seconds:10.0f} urls/s")
+    print(f"S3BatchPresigner:       {batch_seconds * 1000:8.1f} ms  {args.keys / batch_seconds:10.0f} urls/s")
+    print(f"speedup: {item_seconds / batch_seconds:.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
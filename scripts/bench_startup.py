@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""Benchmark Django startup: `manage.py runserver` boot to first HTTP response.
+
+Each run starts a fresh `manage.py runserver --noreload` on a free port and
+times how long it takes until GET /login/ answers. Runs use the in-memory
+inventory backend and no SQS queue by default, so no AWS access is needed.
+
+    python scripts/bench_startup.py --runs 5 --max-seconds 4
+
+With --max-seconds the script exits with status 1 when the median boot time
+exceeds the budget, so it can guard against startup regressions in CI.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def boot_once(path, timeout):
+    """Seconds from process start to the first response on `path`"""
+    port = free_port()
+    env = dict(os.environ)
+    env.setdefault('INVENTORY_STORAGE_BACKEND', 'memory')
+    env.setdefault('SQS_QUEUE_URL', '')
+
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, 'manage.py', 'runserver', '--noreload', f'127.0.0.1:{port}'],
+        cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f'runserver exited with status {server.returncode}')
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}{path}', timeout=1).read()
+                return time.perf_counter() - started
+            except urllib.error.HTTPError:
+                # Any HTTP answer, even an error page, means the server is up
+                return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError, socket.timeout):
+                time.sleep(0.01)
+        raise RuntimeError(f'No response within {timeout} seconds')
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time manage.py boot to first response')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--path', default='/login/')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--max-seconds', type=float, help='Fail when the median exceeds this budget')
+    args = parser.parse_args()
+
+    timings = [boot_once(args.path, args.timeout) for _ in range(args.runs)]
+    median = statistics.median(timings)
+    print(f"runs={args.runs} min={min(timings):.3f}s median={median:.3f}s max={max(timings):.3f}s")
+
+    if args.max_seconds is not None and median > args.max_seconds:
+        print(f"Median boot time {median:.3f}s exceeds the {args.max_seconds:.3f}s budget")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())